@@ -1,9 +1,193 @@
 import numpy as np
-from OpenGL.GL import *
+try:
+    from OpenGL.GL import *
+except ImportError:  # headless runs don't need OpenGL
+    pass
 import math
-import random
+from Fleet import Fleet, STATE_NAMES, STATE_CODES, ROW_SPACING, lane_bounds
+
+# Body points
+BODY_POINTS = np.array(
+    [
+        [-6.0, 0.0, 12.0],
+        [6.0, 0.0, 12.0],
+        [6.0, 0.0, -12.0],
+        [-6.0, 0.0, -12.0],
+        [-6.0, 12.0, 12.0],
+        [6.0, 12.0, 12.0],
+        [6.0, 12.0, -12.0],
+        [-6.0, 12.0, -12.0],
+    ]
+)
+
+# Front marker
+FRONT_POINTS = np.array(
+    [
+        [0.0, 6.0, 30.0],
+        [-6.0, 6.0, 24.0],
+        [6.0, 6.0, 24.0],
+    ]
+)
+
+
+def build_leg_points():
+    leg_points = []
+    leg_spacing = 4.0
+    leg_length = 10.0
+    leg_height = 2.0
+
+    # Left side legs
+    for i in range(6):
+        x_offset = -8.0
+        z_offset = 12.0 - (i * leg_spacing)
+        leg_points.extend([
+            [x_offset,  leg_height,      z_offset],
+            [x_offset, -leg_height, z_offset - leg_length]
+        ])
+
+    # Right side legs
+    for i in range(6):
+        x_offset = 8.0
+        z_offset = 12.0 - (i * leg_spacing)
+        leg_points.extend([
+            [x_offset,  leg_height,      z_offset],
+            [x_offset, -leg_height, z_offset - leg_length]
+        ])
+
+    return np.array(leg_points)
+
+
+# Legs definition
+LEG_POINTS = build_leg_points()
+
+DUMP_BLOCK_SIZE = 4.0
+
+
+def fleet_field(name):
+    """Property that reads/writes this bot's row of a Fleet column."""
+    def fget(self):
+        return getattr(self.fleet, name)[self.index]
+
+    def fset(self, value):
+        getattr(self.fleet, name)[self.index] = value
+
+    return property(fget, fset)
+
+
+def draw_dump_block(position, rotation, progress, dump_block_size, target=(0.0, 0.0, 0.0)):
+    """Draw the waste block thrown towards the toilet at `target` (inside the bot's transform)."""
+    glColor3f(0.6, 0.3, 0.0)
+    block_size = dump_block_size * (0.3 + progress * 0.7)
+    angle_rad = math.radians(rotation)
+    start_x = position[0] - math.sin(angle_rad) * 12.0
+    start_z = position[2] - math.cos(angle_rad) * 12.0
+    start_y = 12.0
+
+    end_x, end_z, end_y = target[0], target[2], target[1]
+    gravity = 45.0
+    initial_vy = 35.0
+    horizontal_speed = 2.2
+    t = progress
+
+    block_x = start_x + (end_x - start_x) * t * horizontal_speed
+    block_z = start_z + (end_z - start_z) * t * horizontal_speed
+    block_y = start_y + initial_vy * t - 0.5 * gravity * t * t
+
+    curve_factor = math.sin(t * math.pi) * 2.0
+    block_x += curve_factor * math.cos(angle_rad)
+    block_z += curve_factor * math.sin(angle_rad)
+
+    y_scale = 1.0
+    if progress > 0.8:
+        impact_progress = (progress - 0.8) * 5
+        y_scale = (
+            1.0
+            - (impact_progress * 0.3)
+            + (impact_progress * impact_progress * 0.3)
+        )
+
+    glPushMatrix()
+    glTranslatef(block_x, block_y, block_z)
+    glScalef(1.0, y_scale, 1.0)
+
+    def draw_block(s):
+        glBegin(GL_QUADS)
+        # front
+        glVertex3f(-s, 0, s)
+        glVertex3f(s, 0, s)
+        glVertex3f(s, s*2, s)
+        glVertex3f(-s, s*2, s)
+        # back
+        glVertex3f(-s, 0, -s)
+        glVertex3f(s, 0, -s)
+        glVertex3f(s, s*2, -s)
+        glVertex3f(-s, s*2, -s)
+        # top
+        glVertex3f(-s, s*2, s)
+        glVertex3f(s, s*2, s)
+        glVertex3f(s, s*2, -s)
+        glVertex3f(-s, s*2, -s)
+        # bottom
+        glVertex3f(-s, 0, s)
+        glVertex3f(s, 0, s)
+        glVertex3f(s, 0, -s)
+        glVertex3f(-s, 0, -s)
+        # left
+        glVertex3f(-s, 0, -s)
+        glVertex3f(-s, 0, s)
+        glVertex3f(-s, s*2, s)
+        glVertex3f(-s, s*2, -s)
+        # right
+        glVertex3f(s, 0, -s)
+        glVertex3f(s, 0, s)
+        glVertex3f(s, s*2, s)
+        glVertex3f(s, s*2, -s)
+        glEnd()
+
+    draw_block(block_size)
+    glColor3f(0.5, 0.25, 0.0)
+    draw_block(block_size * 1.02)
+    glPopMatrix()
+
 
 class CleaningBot:
+    """A single cleaning bot.
+
+    All mutable state lives in one row of a Fleet, so a whole fleet can be
+    stepped with Fleet.step() while each CleaningBot is still drawable (and
+    updatable on its own) through the same attributes as before.
+    """
+
+    Position = fleet_field("position")
+    spawn_position = fleet_field("spawn_position")
+    rotation = fleet_field("rotation")
+    speed = fleet_field("speed")
+    base_speed = fleet_field("base_speed")
+    map_limit = fleet_field("map_limit")
+    lawnmower_direction = fleet_field("lawnmower_direction")
+    lane_min = fleet_field("lane_min")
+    lane_max = fleet_field("lane_max")
+    lane_done = fleet_field("lane_done")
+    resume_position = fleet_field("resume_position")
+    fatness = fleet_field("fatness")
+    target_fatness = fleet_field("target_fatness")
+    dump_animation_progress = fleet_field("dump_animation_progress")
+    eating_animation_progress = fleet_field("eating_animation_progress")
+    eating_cycles = fleet_field("eating_cycles")
+    leg_animation_phase = fleet_field("leg_animation_phase")
+    notified_toilet = fleet_field("notified_toilet")
+    station = fleet_field("station")
+    hopper_capacity = fleet_field("hopper_capacity")
+    load = fleet_field("load")
+    cargo = fleet_field("cargo")
+    cargo_age = fleet_field("cargo_age")
+    leg_origin = fleet_field("leg_origin")
+    leg_step = fleet_field("leg_step")
+    leg_ticks = fleet_field("leg_ticks")
+    state_ticks = fleet_field("state_ticks")
+    state_distance = fleet_field("state_distance")
+    delivered = fleet_field("delivered")
+
     def __init__(
         self, 
         dim,
@@ -11,108 +195,73 @@ class CleaningBot:
         total_bots=1,
         face_texture=None,
         map_limit=0,
-        toilet=None,
         spawn_position=None,      # NEW param
-        lawnmower_direction=1     # NEW param
+        lawnmower_direction=1,    # NEW param
+        fleet=None,
+        hopper_capacity=1,
     ):
-        # Body points (unchanged)
-        self.body_points = np.array(
-            [
-                [-6.0, 0.0, 12.0],
-                [6.0, 0.0, 12.0],
-                [6.0, 0.0, -12.0],
-                [-6.0, 0.0, -12.0],
-                [-6.0, 12.0, 12.0],
-                [6.0, 12.0, 12.0],
-                [6.0, 12.0, -12.0],
-                [-6.0, 12.0, -12.0],
-            ]
-        )
-
-        # Front marker
-        self.front_points = np.array(
-            [
-                [0.0, 6.0, 30.0],
-                [-6.0, 6.0, 24.0],
-                [6.0, 6.0, 24.0],
-            ]
-        )
-
-        # Legs definition
-        self.leg_points = []
-        leg_spacing = 4.0
-        leg_length = 10.0
-        leg_height = 2.0
-        
-        # Left side legs
-        for i in range(6):
-            x_offset = -8.0
-            z_offset = 12.0 - (i * leg_spacing)
-            self.leg_points.extend([
-                [x_offset,  leg_height,      z_offset],
-                [x_offset, -leg_height, z_offset - leg_length]
-            ])
-        
-        # Right side legs
-        for i in range(6):
-            x_offset = 8.0
-            z_offset = 12.0 - (i * leg_spacing)
-            self.leg_points.extend([
-                [x_offset,  leg_height,      z_offset],
-                [x_offset, -leg_height, z_offset - leg_length]
-            ])
-
-        self.leg_points = np.array(self.leg_points)
+        # Geometry is shared by every bot
+        self.body_points = BODY_POINTS
+        self.front_points = FRONT_POINTS
+        self.leg_points = LEG_POINTS
 
         # Leg animation
-        self.leg_animation_phase = 0.0
-        self.leg_animation_speed = 0.3
+        self.leg_animation_speed = Fleet.leg_animation_speed
         self.leg_max_swing = 3.0
         self.leg_swing_frequency = 2 * math.pi
 
         # Basic params
         self.DimBoard = dim
-        self.map_limit = map_limit
 
-        # New: spawn_position & lawnmower_direction
+        # Each bot sweeps its own strip of rows (its lane)
+        lane = lane_bounds(bot_index, total_bots, map_limit)
         if spawn_position is None:
-            # If no spawn given, default to bottom-left
-            self.spawn_position = [-map_limit + 20, 0, -map_limit + 20]
-        else:
-            self.spawn_position = spawn_position
-
-        # Current position starts at spawn
-        self.Position = [self.spawn_position[0],
-                         self.spawn_position[1],
-                         self.spawn_position[2]]
-        
-        self.lawnmower_direction = lawnmower_direction
-        self.rotation = 0.0
-
-        # Movement & state
-        self.speed = 4
-        self.base_speed = 4
-        self.state = "searching"
-        self.carrying_trash = None
+            # If no spawn given, start at the left end of the lane's first row
+            spawn_position = [-map_limit + 20, 0, lane[0]]
+
+        # Row in the fleet arrays; position starts at spawn
+        if fleet is None:
+            fleet = Fleet(capacity=1)
+        self.fleet = fleet
+        self.index = fleet.add(spawn_position, lawnmower_direction, map_limit, lane, hopper_capacity)
+        # Distance moved in the last update()
+        self.step_distance = 0.0
 
         # Fatness/eating/dumping
-        self.fatness = 1.0
-        self.target_fatness = 1.0
-        self.fatness_change_speed = 0.02
-        self.dump_animation_progress = 0.0
-        self.dump_block_size = 4.0
+        self.fatness_change_speed = Fleet.fatness_change_speed
+        self.dump_block_size = DUMP_BLOCK_SIZE
 
         # Textures
         self.face_texture = face_texture
         self.face_texture_open = None
-        self.eating_animation_progress = 0.0
-        self.eating_animation_state = "closed"
-        self.eating_animation_speed = 0.2
-        self.eating_cycles = 0
+        self.eating_animation_speed = Fleet.eating_animation_speed
+
+    @property
+    def toilet(self):
+        """The toilet of the station this bot is routed to."""
+        return self.fleet.stations[self.station]
+
+    @property
+    def state(self):
+        return STATE_NAMES[self.fleet.state[self.index]]
+
+    @state.setter
+    def state(self, value):
+        self.fleet.state[self.index] = STATE_CODES[value]
+
+    @property
+    def eating_animation_state(self):
+        return "open" if self.fleet.eating_open[self.index] else "closed"
 
-        self.toilet = toilet
+    @eating_animation_state.setter
+    def eating_animation_state(self, value):
+        self.fleet.eating_open[self.index] = value == "open"
+
+    def update(self, trash_grid):
+        """Advance the bot one step and return how many burgers it finished eating (0 or 1)."""
+        start_state = self.fleet.state[self.index]
+        start_x, start_z = self.Position[0], self.Position[2]
 
-    def update(self, trash_objects):
         # Update fatness
         if self.fatness < self.target_fatness:
             self.fatness = min(self.fatness + self.fatness_change_speed, self.target_fatness)
@@ -120,17 +269,32 @@ class CleaningBot:
             self.fatness = max(self.fatness - self.fatness_change_speed, self.target_fatness)
 
         # Speed if carrying trash
-        if self.carrying_trash:
+        if self.load:
             self.speed = self.base_speed * 0.6
+            self.cargo_age += 1
         else:
             self.speed = self.base_speed
 
         is_moving = False
+        eaten = 0
 
         # State machine
-        if self.state == "searching":
-            self.lawnmower_movement()
-            self.check_trash_collision(trash_objects)
+        if self.state == "searching" and self.hopper_due():
+            # Go and dump the hopper instead of searching on
+            self.start_return()
+            is_moving = True
+
+        elif self.state == "searching":
+            # Pickup sweeps the way the bot came
+            start = (self.Position[0], self.Position[2])
+            if self.fleet.targeted:
+                self.seek_target()
+            else:
+                self.lawnmower_movement()
+                # A turn steps over to the next row; only the row itself is swept
+                start = (start[0], self.Position[2])
+            with self.fleet.profiler.scope("pickup"):
+                self.check_trash_collision(trash_grid, start)
             is_moving = True
 
         elif self.state == "eating":
@@ -151,10 +315,17 @@ class CleaningBot:
                 self.eating_cycles += 0.5
 
             if self.eating_cycles >= 3:
-                self.state = "returning"
+                eaten = 1
                 self.eating_animation_progress = 0.0
                 self.eating_animation_state = "closed"
                 self.eating_cycles = 0
+                # Dump once the hopper is full; until then keep searching from here
+                if self.hopper_full():
+                    self.start_return()
+                else:
+                    self.state = "searching"
+                    with self.fleet.profiler.scope("pickup"):
+                        self.check_trash_collision(trash_grid)
 
         elif self.state == "returning":
             self.return_to_base()
@@ -164,15 +335,29 @@ class CleaningBot:
             self.dump_trash()
 
         elif self.state == "dumping_animation":
-            self.dump_animation_progress += 0.03
+            self.dump_animation_progress += Fleet.dump_animation_speed
+            # Near the end of the throw the waste lands in the toilet
+            if self.dump_animation_progress > 0.9 and not self.notified_toilet:
+                for trash in self.cargo:
+                    self.toilet.receive_waste()
+                    trash.delivered_step = self.fleet.now
+                self.delivered += self.load
+                self.notified_toilet = True
             if self.dump_animation_progress >= 1.0:
                 self.dump_animation_progress = 0.0
-                self.carrying_trash = None
-                self.state = "restart_position"
+                self.notified_toilet = False
+                self.cargo = []
+                self.load = 0
+                self.cargo_age = 0
+                self.state = "searching" if self.fleet.targeted else "restart_position"
                 self.target_fatness = 1.0
 
         elif self.state == "restart_position":
             self.restart_position()
+            if self.state == "searching":
+                # Back on the row: look again where the last pickup happened
+                with self.fleet.profiler.scope("pickup"):
+                    self.check_trash_collision(trash_grid)
 
         elif self.state == "align":
             self.align()
@@ -185,51 +370,103 @@ class CleaningBot:
         else:
             self.leg_animation_phase = 0.0
 
+        # The step counts towards the state it started in
+        dx = self.Position[0] - start_x
+        dz = self.Position[2] - start_z
+        self.step_distance = math.sqrt(dx*dx + dz*dz)
+        self.state_ticks[start_state] += 1
+        self.state_distance[start_state] += self.step_distance
+
+        return eaten
+
+    def hopper_full(self):
+        """True when the hopper is full or has been carried for the fleet's hopper_timeout steps."""
+        if self.load >= self.hopper_capacity:
+            return True
+        timeout = self.fleet.hopper_timeout
+        return timeout is not None and self.load > 0 and self.cargo_age >= timeout
+
+    def hopper_due(self):
+        """True when a searching bot should dump now: full, or carrying something while idle."""
+        if not self.load:
+            return False
+        idle = not self.fleet.has_target[self.index] if self.fleet.targeted else self.lane_done
+        return self.hopper_full() or bool(idle)
+
+    def start_return(self):
+        # The sweep resumes from here after the dump
+        self.resume_position = self.Position
+        self.state = "returning"
+        self.leg_ticks = -1
+        # Pick the dump station for this trip
+        self.fleet.stations.route(self.fleet, np.array([self.index]))
+
     def lawnmower_movement(self):
+        # Si el carril ya se barrió, esperamos a que nos asignen otro
+        if self.lane_done:
+            return
+
         # Límites en el eje X (bordes izquierdo y derecho)
         left_bound = -self.map_limit + 20
         right_bound = self.map_limit - 20
 
-        # Distinguimos si el bot está en la parte de arriba (Z > 0) o abajo (Z < 0)
-        # para decidir cómo "avanzar la fila" (saltar en Z).
-        is_top = (self.spawn_position[2] > 0)
-
-        # Si lawnmower_direction == 1, el bot va de IZQUIERDA -> DERECHA
+        # ¿Llegó al borde hacia el que avanza?
         if self.lawnmower_direction == 1:
-            # Checamos si ya llegó al borde derecho
-            if self.Position[0] >= right_bound:
-                # Invertir dirección para ir de derecha -> izquierda
-                self.lawnmower_direction = -1
-                self.rotation = (self.rotation + 180) % 360
-                
-                # Avanzar una "fila" en Z
-                if is_top:
-                    # Si está arriba, "bajamos" en Z
-                    self.Position[2] -= 10
-                else:
-                    # Si está abajo, "subimos" en Z
-                    self.Position[2] += 10
-            else:
-                # Continúa moviéndose a la derecha
-                self.Position[0] += self.speed
+            at_edge = self.Position[0] >= right_bound
+        else:
+            at_edge = self.Position[0] <= left_bound
+
+        if not at_edge:
+            # Continúa moviéndose en su dirección actual
+            self.follow_leg(self.lawnmower_direction * self.speed, 0.0)
+            return
+
+        # Cada vuelta empieza un tramo nuevo
+        self.leg_ticks = -1
+        # Avanzar una "fila" en Z, sin salir del carril
+        next_z = self.Position[2] + ROW_SPACING
+        if next_z > self.lane_max + 1e-6:
+            self.lane_done = True
+            return
+        self.Position[2] = next_z
+        # Invertir dirección
+        self.lawnmower_direction = -self.lawnmower_direction
+        self.rotation = (self.rotation + 180) % 360
+
+    def seek_target(self):
+        # Drive straight to the burger the search strategy assigned
+        if not self.fleet.has_target[self.index]:
+            return
+        target = self.fleet.target_position[self.index]
+        dx = target[0] - self.Position[0]
+        dz = target[2] - self.Position[2]
+        dist = math.sqrt(dx*dx + dz*dz)
 
-        # Caso contrario: lawnmower_direction == -1, va de DERECHA -> IZQUIERDA
+        heading = math.degrees(math.atan2(dx, dz))
+        if dist <= self.speed:
+            self.rotation = heading
+            self.Position[0] = target[0]
+            self.Position[2] = target[2]
+            self.leg_ticks = -1
         else:
-            # Checamos si llegó al borde izquierdo
-            if self.Position[0] <= left_bound:
-                # Invertir dirección para ir de izquierda -> derecha
-                self.lawnmower_direction = 1
-                self.rotation = (self.rotation + 180) % 360
-                
-                # Avanzar una "fila" en Z
-                if is_top:
-                    self.Position[2] -= 10
-                else:
-                    self.Position[2] += 10
-            else:
-                # Continúa moviéndose a la izquierda
-                self.Position[0] -= self.speed
+            self.move_along(dx, dz)
 
+    def move_along(self, dx, dz):
+        """Move `speed` units towards the point (dx, dz) away; the direction is taken when a leg starts."""
+        if self.leg_ticks < 0:
+            self.rotation = math.degrees(math.atan2(dx, dz))
+        scale = self.speed / math.sqrt(dx*dx + dz*dz)
+        self.follow_leg(dx * scale, dz * scale)
+
+    def follow_leg(self, step_x, step_z):
+        """One step along the current leg, starting one here with this per-step move if needed."""
+        if self.leg_ticks < 0:
+            self.leg_origin = self.Position
+            self.leg_step = (step_x, 0.0, step_z)
+            self.leg_ticks = 0
+        self.leg_ticks += 1
+        self.Position[0] = self.leg_origin[0] + self.leg_ticks * self.leg_step[0]
+        self.Position[2] = self.leg_origin[2] + self.leg_ticks * self.leg_step[2]
 
     def draw(self):
         glPushMatrix()
@@ -340,130 +577,65 @@ class CleaningBot:
         glPopMatrix()
 
     def draw_dump_animation(self):
-        glColor3f(0.6, 0.3, 0.0)
-        progress = self.dump_animation_progress
-        block_size = self.dump_block_size * (0.3 + progress * 0.7)
-        angle_rad = math.radians(self.rotation)
-        start_x = self.Position[0] - math.sin(angle_rad) * 12.0
-        start_z = self.Position[2] - math.cos(angle_rad) * 12.0
-        start_y = 12.0
-
-        end_x, end_z, end_y = 0, 0, 0
-        dist_to_toilet = math.sqrt(start_x**2 + start_z**2)
-        gravity = 45.0
-        initial_vy = 35.0
-        horizontal_speed = 2.2
-        t = progress
-
-        block_x = start_x + (end_x - start_x) * t * horizontal_speed
-        block_z = start_z + (end_z - start_z) * t * horizontal_speed
-        block_y = start_y + initial_vy * t - 0.5 * gravity * t * t
-
-        curve_factor = math.sin(t * math.pi) * 2.0
-        block_x += curve_factor * math.cos(angle_rad)
-        block_z += curve_factor * math.sin(angle_rad)
-
-        y_scale = 1.0
-        if progress > 0.8:
-            impact_progress = (progress - 0.8) * 5
-            y_scale = (
-                1.0
-                - (impact_progress * 0.3)
-                + (impact_progress * impact_progress * 0.3)
-            )
-
-        glPushMatrix()
-        glTranslatef(block_x, block_y, block_z)
-        glScalef(1.0, y_scale, 1.0)
-
-        def draw_block(s):
-            glBegin(GL_QUADS)
-            # front
-            glVertex3f(-s, 0, s)
-            glVertex3f(s, 0, s)
-            glVertex3f(s, s*2, s)
-            glVertex3f(-s, s*2, s)
-            # back
-            glVertex3f(-s, 0, -s)
-            glVertex3f(s, 0, -s)
-            glVertex3f(s, s*2, -s)
-            glVertex3f(-s, s*2, -s)
-            # top
-            glVertex3f(-s, s*2, s)
-            glVertex3f(s, s*2, s)
-            glVertex3f(s, s*2, -s)
-            glVertex3f(-s, s*2, -s)
-            # bottom
-            glVertex3f(-s, 0, s)
-            glVertex3f(s, 0, s)
-            glVertex3f(s, 0, -s)
-            glVertex3f(-s, 0, -s)
-            # left
-            glVertex3f(-s, 0, -s)
-            glVertex3f(-s, 0, s)
-            glVertex3f(-s, s*2, s)
-            glVertex3f(-s, s*2, -s)
-            # right
-            glVertex3f(s, 0, -s)
-            glVertex3f(s, 0, s)
-            glVertex3f(s, s*2, s)
-            glVertex3f(s, s*2, -s)
-            glEnd()
-
-        draw_block(block_size)
-        glColor3f(0.5, 0.25, 0.0)
-        draw_block(block_size * 1.02)
-        glPopMatrix()
+        draw_dump_block(
+            self.Position, self.rotation, self.dump_animation_progress, self.dump_block_size,
+            self.toilet.position,
+        )
 
-        # if near end, notify toilet
-        if progress > 0.9 and not hasattr(self, "_notified_toilet"):
-            if self.toilet:
-                self.toilet.receive_waste()
-                self._notified_toilet = True
-        elif progress == 0:
-            if hasattr(self, "_notified_toilet"):
-                del self._notified_toilet
-
-    def check_trash_collision(self, trash_objects):
-        for trash in trash_objects:
-            if not trash.is_collected:
-                if abs(self.Position[0] - trash.Position[0]) <= 5 and abs(self.Position[2] - trash.Position[2]) <= 5:
-                    print('collision')
-                    trash.is_collected = True
-                    self.state = 'eating'
+    def check_trash_collision(self, trash_grid, start=None):
+        # Only the grid cells along the way are checked; the first burger the
+        # bot came within reach of is eaten and taken out of the grid (one per
+        # tick), and the bot stops where it reached it
+        x, z = self.Position[0], self.Position[2]
+        x0, z0 = (x, z) if start is None else start
+        hit = trash_grid.claim_along(x0, z0, x, z, Fleet.pickup_reach)
+        if hit is not None:
+            trash, self.Position[0], self.Position[2] = hit
+            trash.picked_step = self.fleet.now
+            self.state = 'eating'
+            self.leg_ticks = -1
+            # The sweep resumes from here after the dump
+            self.resume_position = self.Position
+            # Into the hopper; the fuller it is, the fatter the bot
+            self.cargo.append(trash)
+            self.load += 1
+            self.target_fatness = 1.0 + Fleet.fatness_per_load * self.load / self.hopper_capacity
 
     def return_to_base(self):
         if self.state == "returning":
-            dx = -self.Position[0]
-            dz = -self.Position[2]
+            # Drive to the station this trip was routed to
+            station = self.toilet.position
+            dx = station[0] - self.Position[0]
+            dz = station[2] - self.Position[2]
             dist = math.sqrt(dx*dx + dz*dz)
 
-            if dist < 10.0:
-                self.rotation = math.degrees(math.atan2(self.Position[0], self.Position[2]))
+            # Within one step's move counts too, so fast bots can't overshoot
+            if dist < max(10.0, self.speed):
+                # Turn its back to the station
+                self.rotation = math.degrees(math.atan2(-dx, -dz))
                 self.state = "dumping_animation"
+                self.leg_ticks = -1
             else:
-                self.rotation = math.degrees(math.atan2(dx, dz))
-                self.Position[0] += self.speed * math.sin(math.radians(self.rotation))
-                self.Position[2] += self.speed * math.cos(math.radians(self.rotation))
+                self.move_along(dx, dz)
 
-            if self.carrying_trash:
-                self.carrying_trash.Position[0] = self.Position[0]
-                self.carrying_trash.Position[1] = self.Position[1]
-                self.carrying_trash.Position[2] = self.Position[2]
+            for trash in self.cargo:
+                trash.Position[0] = self.Position[0]
+                trash.Position[1] = self.Position[1]
+                trash.Position[2] = self.Position[2]
 
     def restart_position(self):
-        # Return to self.spawn_position
-        dx = self.spawn_position[0] - self.Position[0]
-        dz = self.spawn_position[2] - self.Position[2]
+        # Return to where the sweep left off
+        dx = self.resume_position[0] - self.Position[0]
+        dz = self.resume_position[2] - self.Position[2]
         dist = math.sqrt(dx*dx + dz*dz)
 
-        if dist < 5.0:
+        if dist < max(5.0, self.speed):
             self.rotation = math.degrees(math.atan2(dx, dz))
+            self.Position = self.resume_position
             self.state = "searching"
+            self.leg_ticks = -1
         else:
-            self.rotation = math.degrees(math.atan2(dx, dz))
-            self.Position[0] += self.speed * math.sin(math.radians(self.rotation))
-            self.Position[2] += self.speed * math.cos(math.radians(self.rotation))
+            self.move_along(dx, dz)
 
     def align(self):
         self.rotation = 60.0
@@ -0,0 +1,139 @@
+import numpy as np
+from CleaningBot import BODY_POINTS
+
+# Half extents of a bot's body footprint (X is scaled by fatness)
+BODY_HALF_WIDTH = float(np.abs(BODY_POINTS[:, 0]).max())
+BODY_HALF_LENGTH = float(np.abs(BODY_POINTS[:, 2]).max())
+
+KEY_OFFSET = 2 ** 30
+
+# Fleets up to this size skip the grid and test every pair
+SMALL_FLEET = 32
+
+# Half of the 8 neighbouring cells, so every pair of cells is visited once
+NEIGHBOUR_OFFSETS = ((1, -1), (1, 0), (1, 1), (0, 1))
+
+
+def pack(cx, cz):
+    return ((cx + KEY_OFFSET) << 32) | (cz + KEY_OFFSET)
+
+
+class CollisionGrid:
+    """Bot-to-bot collision detection over a Fleet.
+
+    Broad phase: bots are bucketed into a uniform X/Z grid whose cells are
+    as wide as the largest body can reach, so only bots in the same or
+    adjacent cells are paired. Narrow phase: each candidate pair is tested
+    as two oriented rectangles (the body scaled by fatness, rotated by the
+    bot's heading) with the separating axis test. Everything is vectorized,
+    so a step costs about O(n log n) plus the number of close pairs.
+    """
+
+    def __init__(self, half_width=BODY_HALF_WIDTH, half_length=BODY_HALF_LENGTH):
+        self.half_width = half_width
+        self.half_length = half_length
+
+    def candidate_pairs(self, x, z, cell_size):
+        """Index pairs (i, j) of points in the same or adjacent grid cells."""
+        n = len(x)
+        cx = np.floor(x / cell_size).astype(np.int64)
+        cz = np.floor(z / cell_size).astype(np.int64)
+        keys = pack(cx, cz)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+
+        first, second = [], []
+
+        # Same cell: bots sharing a key are contiguous once sorted
+        gap = 1
+        while gap < n:
+            same = np.flatnonzero(sorted_keys[gap:] == sorted_keys[:-gap])
+            if not same.size:
+                break
+            first.append(order[same])
+            second.append(order[same + gap])
+            gap += 1
+
+        # Adjacent cells
+        for ox, oz in NEIGHBOUR_OFFSETS:
+            neighbour = pack(cx + ox, cz + oz)
+            start = np.searchsorted(sorted_keys, neighbour, 'left')
+            counts = np.searchsorted(sorted_keys, neighbour, 'right') - start
+            total = int(counts.sum())
+            if not total:
+                continue
+            within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            first.append(np.repeat(np.arange(n), counts))
+            second.append(order[np.repeat(start, counts) + within])
+
+        if not first:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        return np.concatenate(first), np.concatenate(second)
+
+    def colliding_pairs(self, fleet, rows=None):
+        """Index pairs (i, j) of bots whose bodies overlap, among `rows` (default: every bot)."""
+        rows = np.arange(fleet.count) if rows is None else rows
+        n = len(rows)
+        if n < 2:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+
+        x = fleet.position[rows, 0]
+        z = fleet.position[rows, 2]
+        half_w = self.half_width * fleet.fatness[rows]
+        half_l = np.full(n, self.half_length)
+        radius = np.sqrt(half_w * half_w + half_l * half_l)
+
+        if n <= SMALL_FLEET:
+            # Pairing everyone is cheaper than building the grid
+            i, j = np.triu_indices(n, 1)
+        else:
+            i, j = self.candidate_pairs(x, z, 2 * radius.max())
+
+        angle = np.radians(fleet.rotation[rows])
+        overlap = self.overlapping(
+            x[j] - x[i], z[j] - z[i], half_w[i], half_w[j], angle[i], angle[j]
+        )
+        return rows[i[overlap]], rows[j[overlap]]
+
+    def overlapping(self, dx, dz, half_w_i, half_w_j, angle_i, angle_j):
+        """Mask over bot pairs whose bodies overlap.
+
+        Each pair is given by the offset (dx, dz) from the first bot to the
+        second, their half widths and their headings in radians.
+        """
+        half_l = self.half_length
+        overlap = np.zeros(len(dx), dtype=bool)
+
+        # Bounding circles first
+        radius_i = np.sqrt(half_w_i * half_w_i + half_l * half_l)
+        radius_j = np.sqrt(half_w_j * half_w_j + half_l * half_l)
+        reach = radius_i + radius_j
+        close = np.flatnonzero(dx * dx + dz * dz <= reach * reach)
+        if not close.size:
+            return overlap
+        dx, dz = dx[close], dz[close]
+
+        # Separating axis test on the two rectangles. A body's local X axis
+        # points along (cos, -sin) and its local Z axis along (sin, cos).
+        cos_i, sin_i = np.cos(angle_i[close]), np.sin(angle_i[close])
+        cos_j, sin_j = np.cos(angle_j[close]), np.sin(angle_j[close])
+        axes = (
+            (cos_i, -sin_i, half_w_i[close]), (sin_i, cos_i, half_l),
+            (cos_j, -sin_j, half_w_j[close]), (sin_j, cos_j, half_l),
+        )
+
+        apart = np.zeros(len(close), dtype=bool)
+        for ax, az, _ in axes:
+            projected = np.zeros(len(close))
+            for ex, ez, half in axes:
+                projected += half * np.abs(ex * ax + ez * az)
+            apart |= np.abs(dx * ax + dz * az) > projected
+        overlap[close] = ~apart
+        return overlap
+
+    def count(self, fleet):
+        """Number of colliding bot pairs."""
+        i, _ = self.colliding_pairs(fleet)
+        return len(i)
@@ -0,0 +1,558 @@
+import heapq
+import math
+import numpy as np
+from Fleet import (
+    Fleet, SEARCHING, EATING, RETURNING, DUMPING_ANIMATION, RESTART_POSITION, ALIGN,
+)
+from CollisionGrid import SMALL_FLEET
+from TrashGrid import sweep_entry
+
+# Next event of a bot that will never do anything again on its own
+NEVER = 2 ** 62
+
+# Longest run of steps whose collisions are tested in one batch
+COLLISION_BATCH = 256
+
+
+def timer_table(state, advance, fields):
+    """Values of `fields` after each step of a timed state, until the bot leaves it.
+
+    The state is played out on a scratch one-bot fleet with the Fleet's own
+    code, so the table holds exactly the values a ticking fleet goes through.
+    """
+    fleet = Fleet(capacity=1)
+    row = np.array([fleet.add((0.0, 0.0, 0.0))])
+    fleet.state[row] = state
+    table = [tuple(getattr(fleet, name)[0].item() for name in fields)]
+    while True:
+        finished = advance(fleet, row)
+        table.append(tuple(getattr(fleet, name)[0].item() for name in fields))
+        if finished:
+            return table
+
+
+EAT_FIELDS = ("eating_animation_progress", "eating_open", "eating_cycles")
+EAT_TABLE = timer_table(EATING, lambda fleet, row: len(fleet.eat(row)), EAT_FIELDS)
+# A burger is finished this many steps after it was picked up
+EAT_STEPS = len(EAT_TABLE) - 1
+
+
+def dump_step(fleet, row):
+    fleet.dump_animation(row)
+    return fleet.state[0] != DUMPING_ANIMATION
+
+
+DUMP_FIELDS = ("dump_animation_progress", "notified_toilet")
+DUMP_TABLE = timer_table(DUMPING_ANIMATION, dump_step, DUMP_FIELDS)
+# Steps after arriving at the station until the waste lands and until the bot leaves
+DUMP_NOTIFY_STEPS = next(k for k, (_, notified) in enumerate(DUMP_TABLE) if notified)
+DUMP_STEPS = len(DUMP_TABLE) - 1
+
+
+class EventScheduler:
+    """The 'events' engine: runs a CleaningSimulation from event to event.
+
+    Between its events a bot either stands still or goes straight along
+    its leg (see Fleet), and its timers only count steps, so those steps
+    need no simulating. Each bot's next event is the first step where that
+    stops being true: a burger finished or thrown in the toilet, the
+    station, the end of a row or the resume point reached, a burger touched
+    along the leg, a hopper timing out. Events sit in a priority
+    queue and the scheduler jumps straight to the earliest one.
+
+    Burgers arriving during the run (see Workload) are events too: every
+    searching bot is stepped when one lands.
+
+    On an event step only the bots with an event are advanced, by
+    Fleet.step itself, so they follow exactly the rules of the tick
+    engines; every other bot is brought up to date only when something
+    needs it. The search strategy only runs when it has something to do.
+    For the skipped steps, movements are constant and collisions are
+    tested step by step only for the pairs of bots whose paths come close,
+    so the metrics match a tick-by-tick 'fleet' run.
+
+    The cost grows with the number of events and close encounters, not
+    with the number of steps. Nothing is left to record per step, so the
+    'record', 'log' and 'trajectory' outputs can't be used with it.
+    """
+
+    def __init__(self, model):
+        if model.record_steps or model.step_log is not None or model.trajectory is not None:
+            raise ValueError(
+                "the 'events' engine skips steps; it can't record, log or trace every step"
+            )
+        self.model = model
+        self.fleet = model.fleet
+        n = self.fleet.count
+        # Step each bot's fields were last brought up to
+        self.since = np.full(n, model.t, dtype=np.int64)
+        # Position in EAT_TABLE/DUMP_TABLE at `since` for eating/dumping bots
+        self.timer = np.zeros(n, dtype=np.int64)
+        self.next_event = np.full(n, NEVER, dtype=np.int64)
+        self.queue = []
+        # Step the toilets were last brought up to
+        self.toilet_step = model.t
+        self.eat_index = {values: k for k, values in enumerate(EAT_TABLE[:-1])}
+        self.dump_index = {values: k for k, values in enumerate(DUMP_TABLE[:-1])}
+
+        rows = np.arange(n)
+        # Nobody has looked for trash where they stand yet
+        self.schedule(rows, model.t, np.full(n, -1))
+        self.search_pending = True
+
+    def advance(self, until=math.inf):
+        """Run until step `until`, the end of the run, or until nothing is left to happen."""
+        model = self.model
+        steps = model.p['steps'] if 'steps' in model.p else math.inf
+        until = min(until, steps)
+        while model.running and model.t < until:
+            step = self.peek()
+            if self.search_pending:
+                step = min(step, model.t + 1)
+            if model.arrivals is not None:
+                step = min(step, model.arrivals.next_step())
+            if step > until:
+                if until == math.inf:
+                    break  # No events left: the run would idle forever
+                self.skip(model.t + 1, until)
+                model.t = until
+                break
+            self.skip(model.t + 1, step - 1)
+            self.process(step)
+
+        self.catch_up(np.arange(self.fleet.count), model.t)
+        self.stations_to(model.t)
+        if model.t >= steps:
+            model.running = False
+
+    def peek(self):
+        """Step of the earliest pending event (NEVER if there is none)."""
+        queue = self.queue
+        while queue and self.next_event[queue[0][1]] != queue[0][0]:
+            heapq.heappop(queue)
+        return queue[0][0] if queue else NEVER
+
+    def schedule(self, rows, step, previous):
+        """Work out the next event of every bot in `rows`, as of the end of `step`."""
+        for i, before in zip(rows.tolist(), previous.tolist()):
+            tick = self.plan(i, step, before)
+            self.next_event[i] = tick
+            if tick < NEVER:
+                heapq.heappush(self.queue, (tick, i))
+
+    def process(self, step):
+        """Simulate `step` for the bots that have an event in it."""
+        model = self.model
+        fleet = self.fleet
+        profiler = model.profiler
+        model.t = step
+        fleet.now = step
+
+        due = set()
+        while self.queue and self.queue[0][0] == step:
+            _, i = heapq.heappop(self.queue)
+            if self.next_event[i] == step:
+                due.add(i)
+        if model.spawn_trash():
+            # New burgers: every searching bot looks again and may get one
+            due.update(np.flatnonzero(fleet.state[:fleet.count] == SEARCHING).tolist())
+            self.search_pending = True
+
+        with profiler.scope('assign'):
+            changed = self.assign(step)
+        rows = np.array(sorted(due.union(changed.tolist())), dtype=np.int64)
+        self.catch_up(rows, step - 1)
+        self.stations_to(step - 1)
+
+        previous = fleet.state[rows].copy()
+        self.update_speeds()
+        with profiler.scope('bots'):
+            model.collected_trash += fleet.step(model.trash_grid, rows)
+        self.since[rows] = step
+        # The bots without an event went on along their legs
+        model.step_movements = fleet.step_distance + self.leg_distance(rows)
+        model.movement_series.append(model.step_movements)
+
+        with profiler.scope('toilet'):
+            self.stations_to(step)
+        self.schedule(rows, step, previous)
+
+        with profiler.scope('collisions'):
+            model.step_collisions = int(self.collisions(step, step)[0])
+        model.collision_series.append(model.step_collisions)
+
+        search = fleet.search
+        self.search_pending = search is not None and search.pending(fleet, model.trash_grid)
+        if model.cleared:
+            model.done = True
+            model.stop()
+
+    def assign(self, step):
+        """Run the start-of-step assignment; returns the bots it changed."""
+        fleet = self.fleet
+        n = fleet.count
+        if not self.search_pending:
+            fleet.stations.count_load(fleet)
+            return np.zeros(0, dtype=np.int64)
+
+        # Bots losing their target stop where they are now, and bots handed a
+        # lane bank their idle time as searching before they switch state
+        self.catch_up(np.flatnonzero(fleet.state[:n] == SEARCHING), step - 1)
+        before = (
+            fleet.state[:n].copy(), fleet.has_target[:n].copy(),
+            fleet.target_position[:n].copy(), fleet.lane_max[:n].copy(),
+        )
+        fleet.assign_targets(self.model.trash_grid)
+        changed = (
+            (fleet.state[:n] != before[0]) | (fleet.has_target[:n] != before[1])
+            | (fleet.target_position[:n] != before[2]).any(axis=1) | (fleet.lane_max[:n] != before[3])
+        )
+        return np.flatnonzero(changed)
+
+    def skip(self, first, last):
+        """Fill in the metrics of steps first..last, where no bot has an event."""
+        if last < first:
+            return
+        model = self.model
+        self.update_speeds()
+        movements = self.leg_distance()
+        model.movement_series.extend(np.full(last - first + 1, movements))
+        model.step_movements = movements
+        with model.profiler.scope('collisions'):
+            counts = self.collisions(first, last)
+        model.collision_series.extend(counts)
+        model.step_collisions = int(counts[-1])
+
+    def leg_distance(self, stepped=None):
+        """Distance one step moves the bots on a leg, leaving out the `stepped` rows."""
+        fleet = self.fleet
+        n = fleet.count
+        on_leg = fleet.leg_ticks[:n] >= 0
+        if stepped is not None:
+            on_leg[stepped] = False
+        leg_step = fleet.leg_step[:n][on_leg]
+        return float(np.hypot(leg_step[:, 0], leg_step[:, 2]).sum())
+
+    def update_speeds(self):
+        """Set every bot's speed for the coming step, as Fleet.step does for the bots it steps."""
+        fleet = self.fleet
+        fleet.speed[:fleet.count] = fleet.loaded_speed(np.arange(fleet.count))
+
+    def stations_to(self, step):
+        if step > self.toilet_step:
+            self.fleet.stations.update(step - self.toilet_step)
+            self.toilet_step = step
+
+    # Bringing bots up to date
+
+    def catch_up(self, rows, step):
+        """Bring the fields of the bots in `rows` up to the end of `step`."""
+        fleet = self.fleet
+        rows = rows[self.since[rows] < step]
+        if not rows.size:
+            return
+        elapsed = step - self.since[rows]
+        self.since[rows] = step
+
+        fleet.fatness[rows] = self.fatness_after(rows, elapsed)
+        fleet.cargo_age[rows] += elapsed * (fleet.load[rows] > 0)
+
+        moving = fleet.leg_ticks[rows] >= 0
+        legs = rows[moving]
+        start_x = fleet.position[legs, 0]
+        start_z = fleet.position[legs, 2]
+        fleet.leg_ticks[legs] += elapsed[moving]
+        fleet.position[legs, 0] = fleet.leg_origin[legs, 0] + fleet.leg_ticks[legs] * fleet.leg_step[legs, 0]
+        fleet.position[legs, 2] = fleet.leg_origin[legs, 2] + fleet.leg_ticks[legs] * fleet.leg_step[legs, 2]
+
+        state = fleet.state[rows]
+        # Counters; a straight stretch is added in one go, so distances can
+        # differ from a tick-by-tick run in the last bits
+        fleet.state_ticks[rows, state] += elapsed
+        dx = fleet.position[legs, 0] - start_x
+        dz = fleet.position[legs, 2] - start_z
+        fleet.state_distance[legs, state[moving]] += np.sqrt(dx * dx + dz * dz)
+        self.timer[rows] += elapsed
+        for code, table, fields in (
+            (EATING, EAT_TABLE, EAT_FIELDS), (DUMPING_ANIMATION, DUMP_TABLE, DUMP_FIELDS),
+        ):
+            timed = rows[state == code]
+            for name, values in zip(fields, zip(*(table[k] for k in self.timer[timed]))):
+                getattr(fleet, name)[timed] = values
+
+        # Carried burgers ride along to the station
+        for i in rows[(state == RETURNING) & (fleet.load[rows] > 0)]:
+            for trash in fleet.cargo[i]:
+                trash.Position[:] = fleet.position[i]
+
+        # Legs only swing for looks; keep them roughly in step
+        swinging = (state == SEARCHING) | (state == RETURNING)
+        phase = fleet.leg_animation_phase[rows] + elapsed * fleet.leg_animation_speed
+        fleet.leg_animation_phase[rows] = np.where(swinging, np.mod(phase, 2 * np.pi), 0.0)
+
+    def fatness_after(self, rows, elapsed):
+        """Fatness of the bots in `rows` `elapsed` steps after `since`."""
+        fleet = self.fleet
+        fatness = fleet.fatness[rows]
+        target = fleet.target_fatness[rows]
+        left = np.asarray(elapsed).copy()
+        while True:
+            growing = (left > 0) & (fatness != target)
+            if not growing.any():
+                return fatness
+            fatness = np.where(growing, Fleet.next_fatness(fatness, target), fatness)
+            left -= 1
+
+    # Next events
+
+    def plan(self, i, step, before):
+        """Step of bot i's next event, given its state at the end of `step`.
+
+        `before` is its state at the start of `step` (-1 if it wasn't stepped).
+        """
+        fleet = self.fleet
+        state = fleet.state[i]
+        if state == EATING:
+            k = self.eat_index[tuple(getattr(fleet, name)[i].item() for name in EAT_FIELDS)]
+            self.timer[i] = k
+            return step + EAT_STEPS - k
+        if state == DUMPING_ANIMATION:
+            k = self.dump_index[tuple(getattr(fleet, name)[i].item() for name in DUMP_FIELDS)]
+            self.timer[i] = k
+            return step + (DUMP_NOTIFY_STEPS if k < DUMP_NOTIFY_STEPS else DUMP_STEPS) - k
+        if state == ALIGN:
+            return step + 1
+        if state in (RETURNING, RESTART_POSITION) and fleet.leg_ticks[i] < 0:
+            return step + 1
+        if state == RETURNING:
+            station = fleet.stations.positions[fleet.station[i]]
+            return step + 1 + self.moves_until(i, station, max(10.0, fleet.speed[i]))
+        if state == RESTART_POSITION:
+            return step + 1 + self.moves_until(i, fleet.resume_position[i], max(5.0, fleet.speed[i]))
+        if state == SEARCHING:
+            return self.plan_search(i, step, before)
+        return NEVER
+
+    def plan_search(self, i, step, before):
+        fleet = self.fleet
+        events = [NEVER]
+        if fleet.load[i] > 0:
+            idle = not fleet.has_target[i] if fleet.targeted else fleet.lane_done[i]
+            if idle or fleet.load[i] >= fleet.hopper_capacity[i]:
+                return step + 1
+            if fleet.hopper_timeout is not None:
+                events.append(step + max(1, fleet.hopper_timeout - fleet.cargo_age[i]))
+
+        still = not fleet.has_target[i] if fleet.targeted else fleet.lane_done[i]
+        if still:
+            # Standing still finds nothing new once it has looked here
+            checked = before in (SEARCHING, EATING, RESTART_POSITION)
+            return min(events) if checked else step + 1
+        if fleet.leg_ticks[i] < 0:
+            return step + 1
+
+        if fleet.targeted:
+            moves = self.moves_until(i, fleet.target_position[i], fleet.speed[i], inclusive=True)
+        else:
+            moves = self.moves_to_edge(i)
+        # The bot moves on steps step+1..step+moves and then arrives or turns
+        events.append(step + moves + 1)
+        horizon = min(min(events) - step, moves)
+        pickup = self.first_pickup(i, horizon)
+        if pickup is not None:
+            events.append(step + pickup)
+        return min(events)
+
+    def leg_point(self, i, moves):
+        """X/Z of bot i after `moves` more steps along its leg, as Fleet computes it."""
+        fleet = self.fleet
+        ticks = int(fleet.leg_ticks[i]) + moves
+        origin = fleet.leg_origin[i]
+        step = fleet.leg_step[i]
+        return origin[0] + ticks * step[0], origin[2] + ticks * step[2]
+
+    def moves_until(self, i, target, limit, inclusive=False):
+        """Steps bot i still moves along its leg until it is within `limit` of `target`.
+
+        Distances are computed exactly as Fleet does, so the answer is the
+        very step a ticking fleet would stop at.
+        """
+        def distance(moves):
+            x, z = self.leg_point(i, moves)
+            dx = target[0] - x
+            dz = target[2] - z
+            return math.sqrt(dx * dx + dz * dz)
+
+        def arrived(moves):
+            dist = distance(moves)
+            return dist <= limit if inclusive else dist < limit
+
+        fleet = self.fleet
+        length = math.hypot(fleet.leg_step[i, 0], fleet.leg_step[i, 2])
+        if not length or arrived(0):
+            return 0
+        # Each step closes the distance by at most `length`; nothing arrives sooner
+        start = distance(0)
+        moves = max(0, math.floor((start - limit) / length) - 2)
+        # A leg aimed elsewhere never arrives; its bot is looked at again past the closest point
+        last = math.ceil((start + limit) / length) + 2
+        while moves < last and not arrived(moves):
+            moves += 1
+        return moves
+
+    def moves_to_edge(self, i):
+        """Steps bot i still moves along its row before it stands at the edge."""
+        fleet = self.fleet
+        direction = fleet.lawnmower_direction[i]
+        limit = fleet.map_limit[i]
+        edge = limit - 20 if direction == 1 else -limit + 20
+        length = abs(fleet.leg_step[i, 0])
+        x = fleet.position[i, 0]
+        if not length:
+            return 0
+        moves = max(0, math.ceil((edge - x) * direction / length) - 2)
+        while True:
+            x, _ = self.leg_point(i, moves)
+            if (x >= edge) if direction == 1 else (x <= edge):
+                return moves
+            moves += 1
+
+    def first_pickup(self, i, horizon):
+        """First move (1..horizon) during which bot i touches a burger, or None."""
+        if horizon < 1:
+            return None
+        fleet = self.fleet
+        reach = fleet.pickup_reach
+        ticks = int(fleet.leg_ticks[i])
+        ox, oz = fleet.leg_origin[i, 0], fleet.leg_origin[i, 2]
+        sx, sz = fleet.leg_step[i, 0], fleet.leg_step[i, 2]
+        x0, z0 = self.leg_point(i, 0)
+        x1, z1 = self.leg_point(i, horizon)
+        margin = reach + 1e-6
+        found = self.model.trash_grid.within(
+            min(x0, x1) - margin, min(z0, z1) - margin, max(x0, x1) + margin, max(z0, z1) + margin,
+        )
+
+        best = None
+        for trash in found:
+            tx, tz = trash.Position[0], trash.Position[2]
+            # Stretch of the way (in moves from now) within reach on both axes
+            first, last = 0.0, float(horizon if best is None else best)
+            for origin, step, spot in ((ox, sx, tx), (oz, sz, tz)):
+                if step == 0:
+                    if abs(origin - spot) > margin:
+                        first = math.inf
+                    continue
+                a = (spot - margin - origin) / step - ticks
+                b = (spot + margin - origin) / step - ticks
+                first = max(first, min(a, b))
+                last = min(last, max(a, b))
+            if first > last:
+                continue
+            # Move m covers the way from m - 1 to m; settle it with Fleet's own test
+            stop = min(math.floor(last) + 1, horizon if best is None else best - 1)
+            for moves in range(max(1, math.floor(first)), stop + 1):
+                if sweep_entry(*self.leg_point(i, moves - 1), *self.leg_point(i, moves), tx, tz, reach) is not None:
+                    best = moves
+                    break
+        return best
+
+    # Collisions
+
+    def collisions(self, first, last):
+        """Colliding bot pairs at each step first..last, given no bot has an event in between."""
+        counts = np.zeros(last - first + 1, dtype=np.int64)
+        fleet = self.fleet
+        n = fleet.count
+        if n < 2:
+            return counts
+        grid = self.model.collision_grid
+        moving = fleet.leg_ticks[:n] >= 0
+        # No body gets wider than this over the steps
+        widest = np.maximum(fleet.fatness[:n], fleet.target_fatness[:n]) * grid.half_width
+        radius = np.sqrt(widest * widest + grid.half_length * grid.half_length)
+        if n > SMALL_FLEET and moving.any():
+            # Short batches keep each swept box about one body across
+            fastest = np.hypot(fleet.leg_step[:n, 0], fleet.leg_step[:n, 2])[moving].max()
+            batch = max(1, min(COLLISION_BATCH, int(radius.max() / fastest)))
+        else:
+            batch = COLLISION_BATCH
+
+        for start in range(first, last + 1, batch):
+            end = min(start + batch - 1, last)
+            counts[start - first:end - first + 1] = self.collisions_in(start, end, radius)
+        return counts
+
+    def collisions_in(self, first, last, radius):
+        fleet = self.fleet
+        n = fleet.count
+        grid = self.model.collision_grid
+        steps = np.arange(first, last + 1)
+        counts = np.zeros(len(steps), dtype=np.int64)
+
+        # Swept box of every bot over the batch
+        x0, z0 = self.points(np.arange(n), first)
+        x1, z1 = self.points(np.arange(n), last)
+        min_x, max_x = np.minimum(x0, x1) - radius, np.maximum(x0, x1) + radius
+        min_z, max_z = np.minimum(z0, z1) - radius, np.maximum(z0, z1) + radius
+        if n <= SMALL_FLEET:
+            i, j = np.triu_indices(n, 1)
+        else:
+            extent = np.maximum(max_x - min_x, max_z - min_z).max()
+            i, j = grid.candidate_pairs((min_x + max_x) / 2, (min_z + max_z) / 2, extent)
+        meet = (
+            (min_x[i] <= max_x[j]) & (min_x[j] <= max_x[i])
+            & (min_z[i] <= max_z[j]) & (min_z[j] <= max_z[i])
+        )
+        i, j = i[meet], j[meet]
+        if not i.size:
+            return counts
+
+        # Pairs that don't move or change shape only need testing once
+        settled = (fleet.leg_ticks[:n] < 0) & (fleet.fatness[:n] == fleet.target_fatness[:n])
+        still = settled[i] & settled[j]
+        if still.any():
+            counts += self.overlaps(i[still], j[still], steps[:1]).sum()
+        i, j = i[~still], j[~still]
+        if i.size:
+            overlap = self.overlaps(i, j, steps)
+            counts += overlap.reshape(len(i), len(steps)).sum(axis=0)
+        return counts
+
+    def overlaps(self, i, j, steps):
+        """Overlap mask for every pair (i, j) at every step, pair-major."""
+        fleet = self.fleet
+        grid = self.model.collision_grid
+        bots = np.union1d(i, j)
+        first = np.searchsorted(bots, i)
+        second = np.searchsorted(bots, j)
+        x, z = self.points(bots[:, None], steps[None, :])
+        half_w = grid.half_width * self.fatness_at(bots, steps)
+        angle = np.radians(fleet.rotation[bots])[:, None].repeat(len(steps), axis=1)
+        return grid.overlapping(
+            (x[second] - x[first]).ravel(), (z[second] - z[first]).ravel(),
+            half_w[first].ravel(), half_w[second].ravel(),
+            angle[first].ravel(), angle[second].ravel(),
+        )
+
+    def points(self, rows, steps):
+        """X/Z of the bots in `rows` at the end of `steps` (broadcast), following their plans."""
+        fleet = self.fleet
+        ticks = fleet.leg_ticks[rows] + (steps - self.since[rows])
+        moving = fleet.leg_ticks[rows] >= 0
+        x = np.where(moving, fleet.leg_origin[rows, 0] + ticks * fleet.leg_step[rows, 0], fleet.position[rows, 0])
+        z = np.where(moving, fleet.leg_origin[rows, 2] + ticks * fleet.leg_step[rows, 2], fleet.position[rows, 2])
+        return x, z
+
+    def fatness_at(self, rows, steps):
+        """Fatness of the bots in `rows` at each of `steps` (rows x steps)."""
+        fleet = self.fleet
+        fatness = fleet.fatness[rows]
+        target = fleet.target_fatness[rows]
+        elapsed = steps[None, :] - self.since[rows][:, None]
+        # Fatness after 0, 1, 2... steps until every bot has reached its target
+        path = [fatness]
+        while (path[-1] != target).any() and len(path) <= elapsed.max():
+            path.append(Fleet.next_fatness(path[-1], target))
+        path = np.stack(path, axis=1)
+        return np.take_along_axis(path, np.minimum(elapsed, path.shape[1] - 1), axis=1)
@@ -0,0 +1,70 @@
+import time
+
+
+class FixedTimestep:
+    """Runs simulation steps at a fixed rate, decoupled from the frame rate.
+
+    Each call to advance() runs the steps that are due for the real time
+    elapsed since the previous call (times the speed multiplier). A slow
+    frame just means more steps before the next one, so frames are dropped
+    rather than the simulation slowing down. Results only depend on how many
+    steps ran, never on the display's frame rate.
+
+    Stepping is cut off once `frame_budget` seconds are used so the window
+    stays responsive; the steps still owed carry over, but at most
+    `max_backlog` seconds' worth.
+    """
+
+    # Selectable speed multipliers; None runs as many steps as fit in a frame
+    SPEEDS = (1, 10, 100, None)
+
+    def __init__(self, step_rate=60, frame_budget=1 / 60, max_backlog=0.25,
+                 clock=time.perf_counter):
+        self.step_rate = step_rate
+        self.frame_budget = frame_budget
+        self.max_backlog = max_backlog
+        self.clock = clock
+        self.speed = 1
+        self.accumulator = 0.0  # simulated seconds owed
+        self.last_time = None
+
+    def set_speed(self, speed):
+        self.speed = speed
+        self.accumulator = 0.0
+
+    @property
+    def speed_label(self):
+        return "max" if self.speed is None else f"{self.speed}x"
+
+    def advance(self, step):
+        """Call `step()` for every step due now and return how many ran.
+
+        `step` may return False to stop early (e.g. when the simulation is done).
+        """
+        now = self.clock()
+        if self.last_time is None:
+            self.last_time = now
+        elapsed = now - self.last_time
+        self.last_time = now
+        deadline = now + self.frame_budget
+
+        if self.speed is None:
+            due = None
+        else:
+            self.accumulator = min(
+                self.accumulator + elapsed * self.speed,
+                self.max_backlog * self.speed,
+            )
+            due = int(self.accumulator * self.step_rate)
+
+        steps = 0
+        while due is None or steps < due:
+            if step() is False:
+                break
+            steps += 1
+            if self.clock() >= deadline:
+                break
+
+        if due is not None:
+            self.accumulator -= steps / self.step_rate
+        return steps
@@ -0,0 +1,536 @@
+import numpy as np
+from Profiler import Profiler
+from StationRegistry import StationRegistry
+
+# State codes used in Fleet.state (CleaningBot.state exposes the names)
+SEARCHING = 0
+EATING = 1
+RETURNING = 2
+DUMPING = 3
+DUMPING_ANIMATION = 4
+RESTART_POSITION = 5
+ALIGN = 6
+
+STATE_NAMES = (
+    "searching",
+    "eating",
+    "returning",
+    "dumping",
+    "dumping_animation",
+    "restart_position",
+    "align",
+)
+STATE_CODES = {name: code for code, name in enumerate(STATE_NAMES)}
+
+# Distance between lawnmower rows; the pickup reach (±5) covers the gap
+ROW_SPACING = 10.0
+
+
+def lane_bounds(bot_index, total_bots, map_limit):
+    """Z of the first and last row of a bot's lane.
+
+    The sweepable part of the board is cut into rows ROW_SPACING apart and
+    the rows are dealt out as evenly as possible into `total_bots`
+    consecutive strips. With more bots than rows a lane can be empty
+    (last < first); its bot starts idle.
+    """
+    edge = map_limit - 20
+    rows = int(2 * edge // ROW_SPACING) + 1
+    first = bot_index * rows // total_bots
+    last = (bot_index + 1) * rows // total_bots - 1
+    return -edge + first * ROW_SPACING, -edge + last * ROW_SPACING
+
+# Per-bot columns: name -> (shape of one row, dtype)
+FIELDS = {
+    "position": ((3,), np.float64),
+    "spawn_position": ((3,), np.float64),
+    "rotation": ((), np.float64),
+    "speed": ((), np.float64),
+    "base_speed": ((), np.float64),
+    "map_limit": ((), np.float64),
+    "lawnmower_direction": ((), np.int8),
+    "lane_min": ((), np.float64),
+    "lane_max": ((), np.float64),
+    "lane_done": ((), np.bool_),
+    "resume_position": ((3,), np.float64),
+    "state": ((), np.int8),
+    "fatness": ((), np.float64),
+    "target_fatness": ((), np.float64),
+    "dump_animation_progress": ((), np.float64),
+    "eating_animation_progress": ((), np.float64),
+    "eating_open": ((), np.bool_),
+    "eating_cycles": ((), np.float64),
+    "leg_animation_phase": ((), np.float64),
+    "notified_toilet": ((), np.bool_),
+    "hopper_capacity": ((), np.int64),
+    "load": ((), np.int64),
+    "cargo": ((), object),
+    "cargo_age": ((), np.int64),
+    "has_target": ((), np.bool_),
+    "target_position": ((3,), np.float64),
+    "target_trash": ((), object),
+    "station": ((), np.int64),
+    "leg_origin": ((3,), np.float64),
+    "leg_step": ((3,), np.float64),
+    "leg_ticks": ((), np.int64),
+    # Steps spent and distance actually moved in each state, burgers delivered
+    "state_ticks": ((len(STATE_NAMES),), np.int64),
+    "state_distance": ((len(STATE_NAMES),), np.float64),
+    "delivered": ((), np.int64),
+}
+
+
+class Fleet:
+    """Structure-of-arrays storage for a whole fleet of cleaning bots.
+
+    Every per-bot value lives in a NumPy column indexed by the bot's row, so
+    step() can advance all bots at once with batched array operations. Each
+    CleaningBot is a thin view over one row.
+
+    `search` is the search strategy (see SearchStrategy); None sweeps each
+    bot's lane without ever handing finished bots more rows. `stations` is
+    the StationRegistry bots dump at; by default a single toilet at the
+    origin. `profiler` times the pickup phase (see Profiler).
+
+    Each bot collects into a hopper of `hopper_capacity` burgers (its
+    `cargo`) and only returns to dump once it is full, once it has carried
+    something for `hopper_timeout` steps (None: no limit) or when it has
+    nothing left to search.
+
+    Bots move in straight legs: a leg starts where the bot stands and its
+    position after k steps is `leg_origin + k * leg_step`, so any step of a
+    leg can be computed directly (EventScheduler relies on it). A leg ends
+    whenever the bot stops, turns or changes state (`leg_ticks` is -1 then).
+    """
+
+    fatness_change_speed = 0.02
+    eating_animation_speed = 0.2
+    dump_animation_speed = 0.03
+    leg_animation_speed = 0.3
+    pickup_reach = 5
+    # A full hopper makes a bot this much wider
+    fatness_per_load = 0.5
+
+    def __init__(self, capacity=16, search=None, profiler=None, stations=None,
+                 hopper_timeout=None):
+        self.count = 0
+        self.capacity = 0
+        self.search = search
+        self.hopper_timeout = hopper_timeout
+        self.stations = stations if stations is not None else StationRegistry.at([(0.0, 0.0)])
+        self.profiler = profiler if profiler is not None else Profiler()
+        # Step being simulated; stamped on the burgers picked up and delivered
+        self.now = 0
+        # Distance the bots of the last step() actually moved, summed
+        self.step_distance = 0.0
+        self._allocate(max(capacity, 1))
+
+    @property
+    def targeted(self):
+        """True when searching bots drive to an assigned burger instead of sweeping."""
+        return self.search is not None and self.search.targeted
+
+    def assign_targets(self, trash_grid):
+        """Let the search strategy hand out targets; call once per step before moving.
+
+        Also counts the station loads that least-loaded routing uses this step.
+        """
+        if self.search is not None:
+            self.search.assign(self, trash_grid)
+        self.stations.count_load(self)
+
+    def state_totals(self):
+        """Steps and distance moved in each state, summed over the fleet, by state name."""
+        n = self.count
+        ticks = self.state_ticks[:n].sum(axis=0)
+        distance = self.state_distance[:n].sum(axis=0)
+        return (
+            dict(zip(STATE_NAMES, ticks.tolist())),
+            dict(zip(STATE_NAMES, distance.tolist())),
+        )
+
+    def station_load(self, n_stations):
+        """Bots heading to or dumping at each station."""
+        n = self.count
+        state = self.state[:n]
+        busy = (state == RETURNING) | (state == DUMPING) | (state == DUMPING_ANIMATION)
+        return np.bincount(self.station[:n][busy], minlength=n_stations)
+
+    def _allocate(self, capacity):
+        for name, (shape, dtype) in FIELDS.items():
+            column = np.zeros((capacity,) + shape, dtype=dtype)
+            if self.capacity:
+                column[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, column)
+        self.capacity = capacity
+
+    def add(self, spawn_position, lawnmower_direction=1, map_limit=0, lane=None,
+            hopper_capacity=1):
+        """Append a bot at its spawn position and return its row index.
+
+        `lane` is the (first, last) row Z the bot sweeps; by default the whole
+        board. `hopper_capacity` is how many burgers it carries per trip.
+        """
+        if lane is None:
+            lane = lane_bounds(0, 1, map_limit)
+        if self.count == self.capacity:
+            self._allocate(self.capacity * 2)
+        i = self.count
+        self.count += 1
+
+        self.position[i] = spawn_position
+        self.spawn_position[i] = spawn_position
+        self.rotation[i] = 0.0
+        self.speed[i] = 4
+        self.base_speed[i] = 4
+        self.map_limit[i] = map_limit
+        self.lawnmower_direction[i] = lawnmower_direction
+        self.lane_min[i], self.lane_max[i] = lane
+        self.lane_done[i] = lane[1] < lane[0]
+        self.resume_position[i] = spawn_position
+        self.state[i] = SEARCHING
+        self.fatness[i] = 1.0
+        self.target_fatness[i] = 1.0
+        self.dump_animation_progress[i] = 0.0
+        self.eating_animation_progress[i] = 0.0
+        self.eating_open[i] = False
+        self.eating_cycles[i] = 0
+        self.leg_animation_phase[i] = 0.0
+        self.notified_toilet[i] = False
+        self.hopper_capacity[i] = hopper_capacity
+        self.load[i] = 0
+        self.cargo[i] = []
+        self.cargo_age[i] = 0
+        self.has_target[i] = False
+        self.target_position[i] = spawn_position
+        self.target_trash[i] = None
+        self.station[i] = 0
+        self.leg_origin[i] = spawn_position
+        self.leg_step[i] = 0.0
+        self.leg_ticks[i] = -1
+        return i
+
+    def step(self, trash_grid, rows=None):
+        """Advance every bot one step, or only the bots in `rows` (sorted).
+
+        Mirrors CleaningBot.update applied to each bot in row order and
+        returns how many bots finished eating a burger.
+        """
+        if rows is None:
+            rows = np.arange(self.count)
+        # The state at the start of the step picks the branch, like the elif chain
+        state = self.state[rows]
+        start_x = self.position[rows, 0]
+        start_z = self.position[rows, 2]
+
+        # Update fatness
+        self.fatness[rows] = self.next_fatness(self.fatness[rows], self.target_fatness[rows])
+
+        # Speed if carrying trash
+        self.speed[rows] = self.loaded_speed(rows)
+        self.cargo_age[rows] += self.load[rows] > 0
+
+        searching = rows[state == SEARCHING]
+        # Bots whose hopper is due go and dump it instead of searching on
+        due = self.hopper_due(searching)
+        leaving = searching[due]
+        searching = searching[~due]
+        # Where the movers set off; pickup sweeps the way they came
+        movers = searching
+        start = self.position[movers][:, [0, 2]]
+        if searching.size:
+            if self.targeted:
+                self.seek_target(searching)
+            else:
+                self.lawnmower_movement(searching)
+                # A turn steps over to the next row; only the row itself is swept
+                start[:, 1] = self.position[movers, 2]
+
+        delivered = 0
+        eating = rows[state == EATING]
+        if eating.size:
+            finished = self.eat(eating)
+            delivered = len(finished)
+            # Dump once the hopper is full; until then search on from where they ate
+            full = self.hopper_full(finished)
+            self.state[finished[~full]] = SEARCHING
+            searching = np.sort(np.concatenate([searching, finished[~full]]))
+            leaving = np.sort(np.concatenate([leaving, finished[full]]))
+        if leaving.size:
+            # Routed in row order, like bots leaving one after another
+            self.start_return(leaving)
+
+        returning = rows[state == RETURNING]
+        if returning.size:
+            self.return_to_base(returning)
+
+        dumping = rows[state == DUMPING_ANIMATION]
+        if dumping.size:
+            self.dump_animation(dumping)
+
+        restarting = rows[state == RESTART_POSITION]
+        if restarting.size:
+            # Bots back on their row look again where they last picked up
+            back = self.restart_position(restarting)
+            searching = np.sort(np.concatenate([searching, back]))
+        if searching.size:
+            # Bots that didn't move this step just look around where they stand
+            sweep = self.position[searching][:, [0, 2]]
+            sweep[np.searchsorted(searching, movers)] = start
+            with self.profiler.scope("pickup"):
+                self.check_trash_collision(searching, trash_grid, sweep)
+
+        aligning = rows[state == ALIGN]
+        if aligning.size:
+            self.rotation[aligning] = 60.0
+            self.state[aligning] = SEARCHING
+
+        # Leg animation
+        moving = (state == SEARCHING) | (state == RETURNING)
+        phase = self.leg_animation_phase[rows] + self.leg_animation_speed
+        phase = np.where(phase >= 2 * np.pi, phase - 2 * np.pi, phase)
+        self.leg_animation_phase[rows] = np.where(moving, phase, 0.0)
+
+        # The step counts towards the state it started in
+        dx = self.position[rows, 0] - start_x
+        dz = self.position[rows, 2] - start_z
+        moved = np.sqrt(dx * dx + dz * dz)
+        self.state_ticks[rows, state] += 1
+        self.state_distance[rows, state] += moved
+        self.step_distance = float(moved.sum())
+
+        return delivered
+
+    @classmethod
+    def next_fatness(cls, fatness, target):
+        """Fatness one step later, moving towards `target`."""
+        change = cls.fatness_change_speed
+        return np.where(
+            fatness < target,
+            np.minimum(fatness + change, target),
+            np.maximum(fatness - change, target),
+        )
+
+    def loaded_speed(self, idx):
+        """Speed of the bots in `idx` for this step; carrying trash slows them down."""
+        base = self.base_speed[idx]
+        return np.where(self.load[idx] > 0, base * 0.6, base)
+
+    def lawnmower_movement(self, idx):
+        # Bots whose lane is finished wait for the search strategy to hand them another
+        idx = idx[~self.lane_done[idx]]
+        x = self.position[idx, 0]
+        z = self.position[idx, 2]
+        direction = self.lawnmower_direction[idx]
+        left_bound = -self.map_limit[idx] + 20
+        right_bound = self.map_limit[idx] - 20
+
+        at_edge = np.where(direction == 1, x >= right_bound, x <= left_bound)
+        # Rows advance upwards through the lane; past its last row the lane is done
+        next_z = z + ROW_SPACING
+        finished = at_edge & (next_z > self.lane_max[idx] + 1e-6)
+        turn = at_edge & ~finished
+
+        # Straight along the row; every turn starts a new leg
+        ahead = ~at_edge
+        self.follow_leg(idx[ahead], direction[ahead] * self.speed[idx[ahead]], np.zeros(ahead.sum()))
+        self.position[idx, 2] = np.where(turn, next_z, z)
+        self.lawnmower_direction[idx] = np.where(turn, -direction, direction)
+        rotation = self.rotation[idx]
+        self.rotation[idx] = np.where(turn, (rotation + 180) % 360, rotation)
+        self.leg_ticks[idx[at_edge]] = -1
+        self.lane_done[idx[finished]] = True
+
+    def give_lane(self, i, lane_min, lane_max):
+        """Send bot `i` to sweep the rows lane_min..lane_max, starting at the left edge."""
+        self.lane_min[i] = lane_min
+        self.lane_max[i] = lane_max
+        self.lane_done[i] = False
+        self.resume_position[i] = (-self.map_limit[i] + 20, 0.0, lane_min)
+        self.lawnmower_direction[i] = 1
+        self.state[i] = RESTART_POSITION
+        self.leg_ticks[i] = -1
+
+    def remaining_rows(self):
+        """Rows left in each bot's lane after the row it is sweeping (or will resume)."""
+        n = self.count
+        row = np.where(
+            self.state[:n] == SEARCHING, self.position[:n, 2], self.resume_position[:n, 2]
+        )
+        remaining = np.floor((self.lane_max[:n] - row) / ROW_SPACING + 1e-6)
+        return np.where(self.lane_done[:n], 0, np.maximum(remaining, 0)).astype(np.int64)
+
+    def seek_target(self, idx):
+        idx = idx[self.has_target[idx]]
+        dx = self.target_position[idx, 0] - self.position[idx, 0]
+        dz = self.target_position[idx, 2] - self.position[idx, 2]
+        dist = np.sqrt(dx * dx + dz * dz)
+
+        heading = np.degrees(np.arctan2(dx, dz))
+        arrived = dist <= self.speed[idx]
+        close = idx[arrived]
+        self.rotation[close] = heading[arrived]
+        self.position[close, 0] = self.target_position[close, 0]
+        self.position[close, 2] = self.target_position[close, 2]
+        self.leg_ticks[close] = -1
+        self.move_along(idx[~arrived], dx[~arrived], dz[~arrived])
+
+    def hopper_full(self, idx):
+        """Bots in `idx` whose hopper is full or has been carried for hopper_timeout steps."""
+        full = self.load[idx] >= self.hopper_capacity[idx]
+        if self.hopper_timeout is not None:
+            full |= (self.load[idx] > 0) & (self.cargo_age[idx] >= self.hopper_timeout)
+        return full
+
+    def hopper_due(self, idx):
+        """Searching bots in `idx` that should dump now: full, or carrying something while idle.
+
+        A sweeping bot is idle once its lane is done, a targeted one while
+        the search strategy has no burger for it.
+        """
+        idle = ~self.has_target[idx] if self.targeted else self.lane_done[idx]
+        return (self.load[idx] > 0) & (self.hopper_full(idx) | idle)
+
+    def start_return(self, idx):
+        """Send the bots in `idx` (row order) to dump their hopper at their station."""
+        # The sweep resumes from here after the dump
+        self.resume_position[idx] = self.position[idx]
+        self.state[idx] = RETURNING
+        self.leg_ticks[idx] = -1
+        self.stations.route(self, idx)
+
+    def check_trash_collision(self, idx, trash_grid, start=None):
+        """Let the bots in `idx` (row order) pick up the first burger they touched this step.
+
+        `start` holds the X/Z each bot set off from (default: where it
+        stands); the segment from there is swept, so however fast a bot
+        goes it can't jump over a burger. A bot that picks one up stops
+        where it reached it.
+        """
+        reach = self.pickup_reach
+        x1 = self.position[idx, 0]
+        z1 = self.position[idx, 2]
+        x0, z0 = (x1, z1) if start is None else (start[:, 0], start[:, 1])
+        # Cheap vectorized pass first; only bots next to trash query the grid
+        half = np.maximum(np.abs(x1 - x0), np.abs(z1 - z0)) / 2
+        near = trash_grid.occupied_near((x0 + x1) / 2, (z0 + z1) / 2, reach + half.max())
+        for k in np.flatnonzero(near):
+            i = idx[k]
+            hit = trash_grid.claim_along(x0[k], z0[k], x1[k], z1[k], reach)
+            if hit is not None:
+                trash, self.position[i, 0], self.position[i, 2] = hit
+                trash.picked_step = self.now
+                self.state[i] = EATING
+                self.leg_ticks[i] = -1
+                self.resume_position[i] = self.position[i]
+                self.cargo[i].append(trash)
+                self.load[i] += 1
+                self.target_fatness[i] = (
+                    1.0 + self.fatness_per_load * self.load[i] / self.hopper_capacity[i]
+                )
+
+    def eat(self, idx):
+        """Chew one step; returns the bots in `idx` that finished their burger."""
+        progress = self.eating_animation_progress[idx] + self.eating_animation_speed
+        flip = progress >= 1.0
+        self.eating_open[idx] = self.eating_open[idx] ^ flip
+        progress = np.where(flip, 0.0, progress)
+        cycles = self.eating_cycles[idx] + np.where(flip, 0.5, 0.0)
+
+        done = cycles >= 3
+        progress[done] = 0.0
+        cycles[done] = 0
+        self.eating_animation_progress[idx] = progress
+        self.eating_cycles[idx] = cycles
+        finished = idx[done]
+        self.eating_open[finished] = False
+        return finished
+
+    def return_to_base(self, idx):
+        # Drive to the station the bot was routed to
+        station = self.stations.positions[self.station[idx]]
+        dx = station[:, 0] - self.position[idx, 0]
+        dz = station[:, 2] - self.position[idx, 2]
+        dist = np.sqrt(dx * dx + dz * dz)
+
+        # Within one step's move counts too, so fast bots can't overshoot
+        arrived = dist < np.maximum(10.0, self.speed[idx])
+        # On arrival the bot turns its back to the station
+        back = idx[arrived]
+        self.rotation[back] = np.degrees(np.arctan2(-dx[arrived], -dz[arrived]))
+        self.move_along(idx[~arrived], dx[~arrived], dz[~arrived])
+        self.state[back] = DUMPING_ANIMATION
+        self.leg_ticks[back] = -1
+
+        for i in idx[self.load[idx] > 0]:
+            for trash in self.cargo[i]:
+                trash.Position[:] = self.position[i]
+
+    def dump_animation(self, idx):
+        progress = self.dump_animation_progress[idx] + self.dump_animation_speed
+        # Near the end of the throw the waste lands in the toilet
+        notify = (progress > 0.9) & ~self.notified_toilet[idx]
+        for i in idx[notify]:
+            toilet = self.stations[self.station[i]]
+            for trash in self.cargo[i]:
+                toilet.receive_waste()
+                trash.delivered_step = self.now
+            self.delivered[i] += self.load[i]
+        self.notified_toilet[idx[notify]] = True
+
+        done = progress >= 1.0
+        progress[done] = 0.0
+        self.dump_animation_progress[idx] = progress
+        finished = idx[done]
+        self.notified_toilet[finished] = False
+        for i in finished:
+            self.cargo[i] = []
+        self.load[finished] = 0
+        self.cargo_age[finished] = 0
+        # Targeted bots go straight back to work; sweeping bots restart their rows
+        self.state[finished] = SEARCHING if self.targeted else RESTART_POSITION
+        self.target_fatness[finished] = 1.0
+
+    def restart_position(self, idx):
+        dx = self.resume_position[idx, 0] - self.position[idx, 0]
+        dz = self.resume_position[idx, 2] - self.position[idx, 2]
+        dist = np.sqrt(dx * dx + dz * dz)
+
+        arrived = dist < np.maximum(5.0, self.speed[idx])
+        heading = np.degrees(np.arctan2(dx, dz))
+        self.move_along(idx[~arrived], dx[~arrived], dz[~arrived])
+        # Snap onto the row so the sweep carries on exactly where it left off
+        back = idx[arrived]
+        self.rotation[back] = heading[arrived]
+        self.position[back] = self.resume_position[back]
+        self.state[back] = SEARCHING
+        self.leg_ticks[back] = -1
+        return back
+
+    def move_along(self, idx, dx, dz):
+        """Move bots `speed` units towards the point (dx, dz) away from them.
+
+        The direction only counts when a bot starts a new leg: it turns that
+        way and then goes straight until the leg ends.
+        """
+        new = self.leg_ticks[idx] < 0
+        self.rotation[idx[new]] = np.degrees(np.arctan2(dx[new], dz[new]))
+        # Plain arithmetic, so every engine gets the very same leg
+        scale = self.speed[idx] / np.sqrt(dx * dx + dz * dz)
+        self.follow_leg(idx, dx * scale, dz * scale)
+
+    def follow_leg(self, idx, step_x, step_z):
+        """Advance the bots in `idx` one step along their leg.
+
+        Bots without one start a leg from where they stand, moving
+        (step_x, step_z) per step.
+        """
+        new = self.leg_ticks[idx] < 0
+        start = idx[new]
+        self.leg_origin[start] = self.position[start]
+        self.leg_step[start, 0] = step_x[new]
+        self.leg_step[start, 2] = step_z[new]
+        self.leg_ticks[start] = 0
+        self.leg_ticks[idx] += 1
+        self.position[idx, 0] = self.leg_origin[idx, 0] + self.leg_ticks[idx] * self.leg_step[idx, 0]
+        self.position[idx, 2] = self.leg_origin[idx, 2] + self.leg_ticks[idx] * self.leg_step[idx, 2]
@@ -0,0 +1,142 @@
+import numpy as np
+try:
+    from OpenGL.GL import *
+except ImportError:  # headless runs don't need OpenGL
+    pass
+from CleaningBot import BODY_POINTS, FRONT_POINTS, LEG_POINTS, DUMP_BLOCK_SIZE, draw_dump_block
+from Fleet import EATING, DUMPING_ANIMATION
+
+# Body quads in draw order: front, back, top, bottom, left, right
+BODY_QUADS = BODY_POINTS[[
+    0, 1, 5, 4,
+    2, 3, 7, 6,
+    4, 5, 6, 7,
+    0, 1, 2, 3,
+    0, 3, 7, 4,
+    1, 2, 6, 5,
+]]
+
+# The face texture covers the front quad; the other faces keep the last
+# texture coordinate of the front face, like CleaningBot.draw_body
+BODY_TEXCOORDS = np.array(
+    [[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 1.0]] + [[0.0, 1.0]] * 20,
+    dtype=np.float32,
+)
+
+LEG_UPPER = LEG_POINTS[0::2]
+LEG_LOWER = LEG_POINTS[1::2]
+
+
+class FleetRenderer:
+    """Draws every bot of a Fleet from its arrays in a handful of draw calls.
+
+    Per-bot transforms (translate, rotate around Y, scale X by fatness) and
+    leg swing are computed with NumPy, producing world-space vertex arrays
+    for the bodies, front markers and legs. Only bots in the middle of a
+    dump animation fall back to immediate mode for their waste block.
+    """
+
+    def __init__(self, fleet, face_texture=None, face_texture_open=None,
+                 leg_max_swing=3.0, leg_swing_frequency=2 * np.pi):
+        self.fleet = fleet
+        self.face_texture = face_texture
+        self.face_texture_open = face_texture_open
+        self.leg_max_swing = leg_max_swing
+        self.leg_swing_frequency = leg_swing_frequency
+
+    def transform(self, local, scale_x=None):
+        """World coordinates of `local` points (k, 3) for every bot -> (n, k, 3)."""
+        n = self.fleet.count
+        position = self.fleet.position[:n]
+        angle = np.radians(self.fleet.rotation[:n])[:, None]
+        cos_a = np.cos(angle)
+        sin_a = np.sin(angle)
+
+        x = local[..., 0]
+        if scale_x is not None:
+            x = x * scale_x[:, None]
+        y = local[..., 1]
+        z = local[..., 2]
+
+        world = np.empty((n,) + local.shape[-2:], dtype=np.float32)
+        world[..., 0] = x * cos_a + z * sin_a + position[:, 0, None]
+        world[..., 1] = y + position[:, 1, None]
+        world[..., 2] = -x * sin_a + z * cos_a + position[:, 2, None]
+        return world
+
+    def leg_vertices(self):
+        """Line vertices of every leg, with the upper end swinging by animation phase."""
+        n = self.fleet.count
+        legs = len(LEG_UPPER)
+        # Same swing as CleaningBot.draw_legs: phase offset by the leg's point index
+        offsets = (np.arange(legs) * 2 / len(LEG_POINTS)) * self.leg_swing_frequency
+        swing = np.sin(self.fleet.leg_animation_phase[:n, None] + offsets) * self.leg_max_swing
+
+        local = np.empty((n, legs, 2, 3))
+        local[:, :, 0] = LEG_UPPER
+        local[:, :, 0, 1] += swing
+        local[:, :, 1] = LEG_LOWER
+        return self.transform(local.reshape(n, legs * 2, 3), self.fleet.fatness[:n])
+
+    def draw(self):
+        n = self.fleet.count
+        if n == 0:
+            return
+        fatness = self.fleet.fatness[:n]
+
+        glEnableClientState(GL_VERTEX_ARRAY)
+
+        # Bodies: one call per face texture
+        glColor3f(0.0, 0.7, 0.0)
+        body = self.transform(BODY_QUADS, fatness)
+        if self.face_texture is not None:
+            mouth_open = self.fleet.eating_open[:n] & (self.fleet.state[:n] == EATING)
+            if self.face_texture_open is None:
+                mouth_open[:] = False
+            glEnable(GL_TEXTURE_2D)
+            glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+            for texture, rows in (
+                (self.face_texture, ~mouth_open),
+                (self.face_texture_open, mouth_open),
+            ):
+                count = int(rows.sum())
+                if not count:
+                    continue
+                glBindTexture(GL_TEXTURE_2D, texture)
+                vertices = np.ascontiguousarray(body[rows].reshape(-1, 3))
+                texcoords = np.tile(BODY_TEXCOORDS, (count, 1))
+                glVertexPointer(3, GL_FLOAT, 0, vertices)
+                glTexCoordPointer(2, GL_FLOAT, 0, texcoords)
+                glDrawArrays(GL_QUADS, 0, len(vertices))
+            glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+            glDisable(GL_TEXTURE_2D)
+        else:
+            vertices = body.reshape(-1, 3)
+            glVertexPointer(3, GL_FLOAT, 0, vertices)
+            glDrawArrays(GL_QUADS, 0, len(vertices))
+
+        # Red marker points
+        glColor3f(1.0, 0.0, 0.0)
+        markers = self.transform(FRONT_POINTS).reshape(-1, 3)
+        glVertexPointer(3, GL_FLOAT, 0, markers)
+        glDrawArrays(GL_POINTS, 0, len(markers))
+
+        # Legs
+        glColor3f(0.0, 0.7, 0.0)
+        legs = self.leg_vertices().reshape(-1, 3)
+        glVertexPointer(3, GL_FLOAT, 0, legs)
+        glDrawArrays(GL_LINES, 0, len(legs))
+
+        glDisableClientState(GL_VERTEX_ARRAY)
+
+        # Waste blocks of the (few) bots that are dumping
+        for i in np.flatnonzero(self.fleet.state[:n] == DUMPING_ANIMATION):
+            position = self.fleet.position[i]
+            glPushMatrix()
+            glTranslatef(position[0], position[1], position[2])
+            glRotatef(self.fleet.rotation[i], 0.0, 1.0, 0.0)
+            draw_dump_block(
+                position, self.fleet.rotation[i], self.fleet.dump_animation_progress[i],
+                DUMP_BLOCK_SIZE, self.fleet.stations.positions[self.fleet.station[i]],
+            )
+            glPopMatrix()
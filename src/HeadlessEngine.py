@@ -0,0 +1,72 @@
+import math
+from model import CleaningSimulation
+from EventScheduler import EventScheduler
+
+
+class HeadlessEngine:
+    """Runs a CleaningSimulation without pygame, OpenGL or PIL.
+
+    There is no window and no frame cap, so steps run as fast as the CPU
+    allows. Useful for batch runs on machines without a display.
+
+    With `engine='events'` the steps where no bot has anything to decide
+    are skipped instead of simulated (see EventScheduler).
+    """
+
+    def __init__(self, parameters, seed=None):
+        parameters = dict(parameters)
+        parameters['headless'] = True
+        self.model = CleaningSimulation(parameters)
+        # Same entry point as ap.Model.run: seeds the RNGs, runs setup() and the first update()
+        self.model.sim_setup(seed=seed)
+        self.scheduler = EventScheduler(self.model) if self.model.engine == 'events' else None
+
+    @property
+    def done(self):
+        return self.model.done
+
+    def step(self):
+        """Advance the simulation one step."""
+        if self.scheduler is not None:
+            self.scheduler.advance(self.model.t + 1)
+        else:
+            self.model.sim_step()
+
+    def run(self, steps):
+        """Run up to `steps` steps (fewer if the simulation stops) and return the metrics."""
+        if self.scheduler is not None:
+            self.scheduler.advance(self.model.t + steps)
+        else:
+            for _ in range(steps):
+                if not self.model.running:
+                    break
+                self.model.sim_step()
+        if not self.model.running:
+            self.model.close_outputs()
+        return self.model.get_metrics()
+
+    def run_until_done(self, max_steps=None):
+        """Run until all trash is collected (or `max_steps` is reached) and return the metrics."""
+        if self.scheduler is not None:
+            self.scheduler.advance(math.inf if max_steps is None else max_steps)
+        else:
+            while self.model.running:
+                if max_steps is not None and self.model.t >= max_steps:
+                    break
+                self.model.sim_step()
+        if not self.model.running:
+            self.model.close_outputs()
+        return self.model.get_metrics()
+
+
+if __name__ == "__main__":
+    parameters = {
+        'dim': 200,
+        'n_bots': 5,
+        'n_trash': 20
+    }
+
+    engine = HeadlessEngine(parameters)
+    metrics = engine.run_until_done()
+    print(metrics)
+    print(f"Pasos por segundo: {metrics.steps_per_second:.0f}")
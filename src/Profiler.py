@@ -0,0 +1,174 @@
+import contextlib
+import csv
+import json
+import time
+import numpy as np
+try:
+    import pygame
+    from OpenGL.GL import *
+except ImportError:  # timing and export work without a display
+    pass
+from RunningSeries import RunningSeries
+
+# Returned by disabled profilers: entering and leaving it does nothing
+NULL_SCOPE = contextlib.nullcontext()
+
+SUMMARY_COLUMNS = ("phase", "count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms")
+
+# Whole-run histogram bins for the percentiles: log-spaced from 100 ns to
+# 100 s, 64 per decade, so a percentile is off by under 2% of its value
+HISTOGRAM_EDGES = np.logspace(-7, 2, 9 * 64 + 1)
+
+
+class Scope:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, time.perf_counter() - self.start)
+
+
+class Profiler:
+    """Named timing scopes that can be switched on and off at run time.
+
+        with profiler.scope("draw.trash"):
+            Trash.draw_many(trash_grid)
+
+    Each phase keeps its count, mean and max over the whole run, and a
+    histogram of every sample (see HISTOGRAM_EDGES) from which the
+    p50/p95/p99 are taken. Samples wait in a ring of `window` and are
+    binned a ring at a time. While disabled, scope() hands back a shared
+    no-op context, so leaving the hooks in costs one method call per phase.
+    """
+
+    def __init__(self, enabled=False, window=4096):
+        self.enabled = enabled
+        self.window = window
+        self.phases = {}
+        self.histograms = {}
+        self.overlay = False
+        self.overlay_image = None
+        self.overlay_frames = 0
+
+    def scope(self, name):
+        if not self.enabled:
+            return NULL_SCOPE
+        return Scope(self, name)
+
+    def add(self, name, seconds):
+        series = self.phases.get(name)
+        if series is None:
+            series = self.phases[name] = RunningSeries(self.window)
+            self.histograms[name] = [np.zeros(len(HISTOGRAM_EDGES) - 1, dtype=np.int64), 0]
+        series.append(seconds)
+        if series.count - self.histograms[name][1] == self.window:
+            self.bin_samples(name)
+
+    def bin_samples(self, name):
+        """Move the samples of `name` not binned yet into its histogram."""
+        series = self.phases[name]
+        counts, binned = self.histograms[name]
+        pending = series.count - binned
+        if not pending:
+            return
+        samples = series.recent()[-pending:]
+        bins = np.searchsorted(HISTOGRAM_EDGES, samples, side="right") - 1
+        np.add.at(counts, np.clip(bins, 0, len(counts) - 1), 1)
+        self.histograms[name][1] = series.count
+
+    def percentiles(self, name, quantiles):
+        """Whole-run percentiles of `name` in seconds, each a bin's geometric centre."""
+        self.bin_samples(name)
+        series = self.phases[name]
+        cumulative = np.cumsum(self.histograms[name][0])
+        ranks = np.maximum(np.ceil(np.asarray(quantiles) / 100 * series.count), 1)
+        bins = np.searchsorted(cumulative, ranks)
+        centres = np.sqrt(HISTOGRAM_EDGES[bins] * HISTOGRAM_EDGES[bins + 1])
+        # The top bin can overshoot the slowest sample actually seen
+        return np.minimum(centres, series.max)
+
+    def toggle(self):
+        self.enabled = not self.enabled
+
+    def reset(self):
+        self.phases = {}
+        self.histograms = {}
+
+    def summary(self):
+        """One row per phase (in first-seen order), times in milliseconds."""
+        rows = []
+        for name, series in self.phases.items():
+            p50, p95, p99 = self.percentiles(name, (50, 95, 99)) * 1000
+            rows.append({
+                "phase": name,
+                "count": series.count,
+                "mean_ms": series.mean * 1000,
+                "p50_ms": p50,
+                "p95_ms": p95,
+                "p99_ms": p99,
+                "max_ms": series.max * 1000,
+            })
+        return rows
+
+    def export(self, path):
+        """Write the summary to `path`, as JSON if it ends in .json and CSV otherwise."""
+        rows = self.summary()
+        with open(path, "w", newline="") as f:
+            if path.endswith(".json"):
+                json.dump(rows, f, indent=2)
+            else:
+                writer = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS)
+                writer.writeheader()
+                writer.writerows(rows)
+
+    def draw_overlay(self, refresh_frames=30):
+        """Draw the per-phase table in the window's top-left corner.
+
+        The text is re-rendered every `refresh_frames` frames only; call
+        this last in the frame, before flipping.
+        """
+        if not self.overlay:
+            return
+        if self.overlay_image is None or self.overlay_frames >= refresh_frames:
+            self.overlay_image = self.render_overlay()
+            self.overlay_frames = 0
+        self.overlay_frames += 1
+
+        width, height, pixels = self.overlay_image
+        viewport = glGetIntegerv(GL_VIEWPORT)
+        glPushAttrib(GL_ENABLE_BIT | GL_COLOR_BUFFER_BIT)
+        glDisable(GL_DEPTH_TEST)
+        glDisable(GL_TEXTURE_2D)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glWindowPos2i(4, int(viewport[3]) - height - 4)
+        glDrawPixels(width, height, GL_RGBA, GL_UNSIGNED_BYTE, pixels)
+        glPopAttrib()
+
+    def render_overlay(self):
+        if not pygame.font.get_init():
+            pygame.font.init()
+        font = pygame.font.SysFont("monospace", 14)
+        status = "on" if self.enabled else "off (P to start)"
+        lines = [f"profiling {status}", f"{'phase':<18}{'p50':>8}{'p95':>8}{'p99':>8} ms"]
+        for row in self.summary():
+            lines.append(
+                f"{row['phase']:<18}{row['p50_ms']:8.2f}{row['p95_ms']:8.2f}{row['p99_ms']:8.2f}"
+            )
+        rendered = [font.render(line, True, (255, 255, 0)) for line in lines]
+        width = max(surface.get_width() for surface in rendered)
+        line_height = font.get_linesize()
+        panel = pygame.Surface((width + 8, line_height * len(lines) + 8), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 160))
+        for i, surface in enumerate(rendered):
+            panel.blit(surface, (4, 4 + i * line_height))
+        # glDrawPixels rows go bottom-up
+        pixels = pygame.image.tostring(panel, "RGBA", True)
+        return panel.get_width(), panel.get_height(), pixels
@@ -0,0 +1,466 @@
+import os
+import random
+import time
+import multiprocessing as mp
+import numpy as np
+try:
+    import pygame
+    from pygame.locals import *
+    from OpenGL.GL import *
+    from OpenGL.GLU import *
+    from PIL import Image
+except ImportError:  # the simulation side only publishes frames
+    pass
+from SharedBlock import SharedBlock
+from Fleet import Fleet, FIELDS
+from Trash import Trash
+from StationRegistry import StationRegistry
+from Toilet import PARTICLE_DTYPE
+from FleetRenderer import FleetRenderer
+from FixedTimestep import FixedTimestep
+from Profiler import Profiler
+
+# Fleet columns a frame carries: everything FleetRenderer reads
+BOT_FIELDS = (
+    "position", "rotation", "state", "fatness", "leg_animation_phase",
+    "eating_open", "dump_animation_progress", "station",
+)
+# Toilet attributes a frame carries besides its particle pool
+TOILET_FIELDS = {
+    "water_level": np.float64,
+    "is_flushing": np.bool_,
+    "flush_progress": np.float64,
+    "flush_rotation": np.float64,
+}
+
+# Window and camera, as in the single-process window
+WINDOW_SIZE = (800, 800)
+FOVY = 60.0
+ZNEAR = 1.0
+ZFAR = 900.0
+EYE = (300.0, 200.0, 300.0)
+
+# How long the simulation loop naps when no step was due, in seconds
+IDLE_SLEEP = 0.001
+# Times the window redraws a frame that changed while it was drawn before showing it anyway
+MAX_REDRAWS = 3
+
+
+def window_profile_path(path):
+    """Where the window process writes its phase table when the run's goes to `path`."""
+    if not path:
+        return None
+    root, ext = os.path.splitext(path)
+    return f"{root}.window{ext}"
+
+
+def frame_spec(n_bots, n_stations, particle_capacity, trash_capacity):
+    """Arrays of a SharedFrame: the header, then two slots of everything drawn."""
+    scalar = ((), np.int64)
+    spec = {
+        # Slot holding the newest complete frame (-1: none yet) and the one being drawn
+        'latest': scalar,
+        'reading': scalar,
+        # Per slot: odd while the simulation writes it, bumped again when done
+        'sequence': ((2,), np.int64),
+        # Window -> simulation: speed index into FixedTimestep.SPEEDS, key presses
+        'speed': scalar,
+        'flush_requests': scalar,
+        'trash_requests': scalar,
+        'profiling': ((), np.bool_),
+        'closed': ((), np.bool_),
+        # Simulation -> window: the run is over
+        'finished': ((), np.bool_),
+    }
+    for slot in (0, 1):
+        for name in BOT_FIELDS:
+            shape, dtype = FIELDS[name]
+            spec[f'{slot}.fleet.{name}'] = ((n_bots,) + shape, dtype)
+        for name, dtype in TOILET_FIELDS.items():
+            spec[f'{slot}.toilet.{name}'] = ((n_stations,), dtype)
+        spec[f'{slot}.toilet.particles'] = ((n_stations, particle_capacity), PARTICLE_DTYPE)
+        spec[f'{slot}.toilet.alive'] = ((n_stations, particle_capacity), np.bool_)
+        spec[f'{slot}.trash_count'] = scalar
+        spec[f'{slot}.trash_xz'] = ((trash_capacity, 2), np.float64)
+        spec[f'{slot}.trash_rotation'] = ((trash_capacity,), np.float64)
+    return spec
+
+
+class SharedFrame:
+    """What the window draws, double-buffered in shared memory between two processes.
+
+    The simulation publish()es into the slot that isn't the latest one and
+    then flips 'latest' to it; the window acquire()s the latest slot and
+    draws straight from the shared arrays. Neither side ever blocks or
+    takes a lock.
+
+    The window marks the slot it draws as 'reading' and the writer drops a
+    frame rather than write that slot. Without memory fences that is only
+    a hint: both sides can miss each other's store. What makes a frame safe
+    is each slot's sequence counter, a seqlock. The writer makes it odd
+    while it writes and even again when done. After drawing, the window
+    checks with intact() that the counter hasn't moved and redraws if it
+    has. That holds as long as each process's stores, and each one's loads,
+    are seen in program order, which x86-64 guarantees. On CPUs with weaker
+    ordering a torn frame remains possible, if unlikely.
+
+    Only the first `trash_capacity` uncollected burgers are drawn.
+    """
+
+    def __init__(self, n_bots, n_stations, particle_capacity, trash_capacity, name=None):
+        self.sizes = (n_bots, n_stations, particle_capacity, trash_capacity)
+        self.block = SharedBlock(frame_spec(*self.sizes), name)
+        if name is None:
+            self.block['latest'][()] = -1
+            self.block['reading'][()] = -1
+        # The trash list each slot was last filled from (see publish)
+        self.trash_written = [None, None]
+
+    @property
+    def name(self):
+        return self.block.name
+
+    def __getitem__(self, key):
+        return self.block[key]
+
+    def publish(self, fleet, trash_grid, stations):
+        """Copy the scene into the free slot and make it the latest; False if dropped."""
+        block = self.block
+        slot = 1 - max(int(block['latest']), 0)
+        if slot == int(block['reading']):
+            return False  # the window is still drawing the older frame
+        sequence = block['sequence']
+        sequence[slot] += 1  # odd: being written
+        n_bots, _, _, trash_capacity = self.sizes
+        for name in BOT_FIELDS:
+            block[f'{slot}.fleet.{name}'][:] = getattr(fleet, name)[:n_bots]
+        for station, toilet in enumerate(stations):
+            for name in TOILET_FIELDS:
+                block[f'{slot}.toilet.{name}'][station] = getattr(toilet, name)
+            block[f'{slot}.toilet.particles'][station] = toilet.particles
+            block[f'{slot}.toilet.alive'][station] = toilet.alive
+        # The grid hands back the same list until trash moves in or out
+        items, xz = trash_grid.flat()
+        if self.trash_written[slot] is not items:
+            count = min(len(items), trash_capacity)
+            block[f'{slot}.trash_xz'][:count] = xz[:count]
+            block[f'{slot}.trash_rotation'][:count] = [trash.rotation for trash in items[:count]]
+            block[f'{slot}.trash_count'][()] = count
+            self.trash_written[slot] = items
+        sequence[slot] += 1
+        block['latest'][()] = slot
+        return True
+
+    def acquire(self):
+        """Claim the latest complete slot for drawing: (slot, sequence), or None before the first frame."""
+        block = self.block
+        while True:
+            slot = int(block['latest'])
+            if slot < 0:
+                return None
+            block['reading'][()] = slot
+            sequence = int(block['sequence'][slot])
+            # A publish may have flipped 'latest' before the claim landed
+            if sequence % 2 == 0 and int(block['latest']) == slot:
+                return slot, sequence
+
+    def intact(self, claim):
+        """True if the slot of an acquire() claim wasn't written since: all read from it is one frame."""
+        slot, sequence = claim
+        return int(self.block['sequence'][slot]) == sequence
+
+    def release(self):
+        self.block['reading'][()] = -1
+
+    def close(self):
+        self.block.close()
+
+
+class FrameScene:
+    """Fleet, stations and burger the window draws, bound to a SharedFrame slot.
+
+    The fleet's columns and the toilets' particle pools become views on the
+    slot, so drawing a frame copies nothing.
+    """
+
+    def __init__(self, frame, station_positions, dim):
+        n_bots = frame.sizes[0]
+        self.frame = frame
+        self.stations = StationRegistry.at(station_positions)
+        self.fleet = Fleet(capacity=n_bots, stations=self.stations)
+        for _ in range(n_bots):
+            self.fleet.add([0.0, 0.0, 0.0], map_limit=dim)
+        self.trash = Trash(dim, rng=random.Random(0))
+        self.trash_xz = np.zeros((0, 2))
+        self.trash_rotation = np.zeros(0)
+
+    def bind(self, slot):
+        frame = self.frame
+        for name in BOT_FIELDS:
+            setattr(self.fleet, name, frame[f'{slot}.fleet.{name}'])
+        for station, toilet in enumerate(self.stations):
+            for name in TOILET_FIELDS:
+                setattr(toilet, name, frame[f'{slot}.toilet.{name}'][station].item())
+            toilet.particles = frame[f'{slot}.toilet.particles'][station]
+            toilet.alive = frame[f'{slot}.toilet.alive'][station]
+        count = int(frame[f'{slot}.trash_count'])
+        self.trash_xz = frame[f'{slot}.trash_xz'][:count]
+        self.trash_rotation = frame[f'{slot}.trash_rotation'][:count]
+
+    def unbind(self):
+        """Drop every view on the frame, so its block can close."""
+        for name in BOT_FIELDS:
+            setattr(self.fleet, name, np.array(getattr(self.fleet, name)))
+        for toilet in self.stations:
+            toilet.particles = np.array(toilet.particles)
+            toilet.alive = np.array(toilet.alive)
+        self.trash_xz = np.zeros((0, 2))
+        self.trash_rotation = np.zeros(0)
+
+    def draw_trash(self):
+        self.trash.draw_copies(self.trash_xz, self.trash_rotation)
+
+
+def load_texture(image_path):
+    image = Image.open(image_path)
+    image = image.transpose(Image.FLIP_TOP_BOTTOM)  # OpenGL expects textures flipped
+    if image.mode != 'RGBA':
+        image = image.convert('RGBA')
+
+    img_data = image.tobytes()
+    texture_id = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, texture_id)
+    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, image.width, image.height, 0, GL_RGBA, GL_UNSIGNED_BYTE, img_data)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+    return texture_id
+
+
+def draw_board(dim, axis_extent, station_positions):
+    """Axes, floor and (if given) a pad under each station."""
+    glShadeModel(GL_FLAT)
+    glLineWidth(3.0)
+    for color, axis in (((1.0, 0.0, 0.0), 0), ((0.0, 1.0, 0.0), 1), ((0.0, 0.0, 1.0), 2)):
+        start = [0.0, 0.0, 0.0]
+        end = [0.0, 0.0, 0.0]
+        start[axis] = -axis_extent
+        end[axis] = axis_extent
+        glColor3f(*color)
+        glBegin(GL_LINES)
+        glVertex3f(*start)
+        glVertex3f(*end)
+        glEnd()
+    glLineWidth(1.0)
+
+    glColor3f(0.3, 0.3, 0.3)
+    glBegin(GL_QUADS)
+    glVertex3d(-dim, 0, -dim)
+    glVertex3d(-dim, 0, dim)
+    glVertex3d(dim, 0, dim)
+    glVertex3d(dim, 0, -dim)
+    glEnd()
+
+    glColor3f(0.5, 0.5, 1.0)
+    for x, z in station_positions:
+        glPushMatrix()
+        glTranslatef(x, 0, z)
+        glScaled(10, 1, 10)
+        glBegin(GL_QUADS)
+        glVertex3d(-1, 0, -1)
+        glVertex3d(-1, 0, 1)
+        glVertex3d(1, 0, 1)
+        glVertex3d(1, 0, -1)
+        glEnd()
+        glPopMatrix()
+
+
+def render_main(frame_name, sizes, dim, station_positions, caption, axis_extent,
+                station_pads, profiling, profile_path):
+    """Entry point of the window process: draw the latest frame until closed or finished.
+
+    Keys: ESC closes, 1-4 pick the simulation speed, F flushes, T drops a
+    burger, P starts/stops profiling and O shows the (window's) phase table.
+    """
+    frame = SharedFrame(*sizes, name=frame_name)
+    profiler = Profiler(enabled=profiling)
+    scene = None
+    try:
+        pygame.init()
+        pygame.display.set_mode(WINDOW_SIZE, DOUBLEBUF | OPENGL)
+        pygame.display.set_caption(caption)
+
+        glMatrixMode(GL_PROJECTION)
+        glLoadIdentity()
+        gluPerspective(FOVY, WINDOW_SIZE[0] / WINDOW_SIZE[1], ZNEAR, ZFAR)
+        glMatrixMode(GL_MODELVIEW)
+        glLoadIdentity()
+        gluLookAt(*EYE, 0, 0, 0, 0, 1, 0)
+
+        glClearColor(0, 0, 0, 0)
+        glEnable(GL_DEPTH_TEST)
+        glEnable(GL_TEXTURE_2D)
+        glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
+
+        texture_dir = os.path.join(os.path.dirname(__file__), 'assets')
+        scene = FrameScene(frame, station_positions, dim)
+        fleet_renderer = FleetRenderer(
+            scene.fleet,
+            load_texture(os.path.join(texture_dir, 'close.jpg')),
+            load_texture(os.path.join(texture_dir, 'open.jpg')),
+        )
+        pads = station_positions if station_pads else ()
+
+        speed_keys = dict(zip((pygame.K_1, pygame.K_2, pygame.K_3, pygame.K_4),
+                              range(len(FixedTimestep.SPEEDS))))
+        clock = pygame.time.Clock()
+        while not frame['finished']:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    return
+                if event.type != pygame.KEYDOWN:
+                    continue
+                if event.key == pygame.K_ESCAPE:
+                    return
+                elif event.key in speed_keys:
+                    frame['speed'][()] = speed_keys[event.key]
+                    speed = FixedTimestep.SPEEDS[speed_keys[event.key]]
+                    label = "max" if speed is None else f"{speed}x"
+                    pygame.display.set_caption(f"{caption} [{label}]")
+                elif event.key == pygame.K_f:
+                    frame['flush_requests'][()] += 1
+                elif event.key == pygame.K_t:
+                    frame['trash_requests'][()] += 1
+                elif event.key == pygame.K_p:
+                    profiler.toggle()
+                    frame['profiling'][()] = profiler.enabled
+                elif event.key == pygame.K_o:
+                    profiler.overlay = not profiler.overlay
+
+            with profiler.scope('frame'):
+                # GL has read the arrays once the draw calls return, so a
+                # frame that was intact until then is shown whole
+                for _ in range(MAX_REDRAWS):
+                    glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+                    with profiler.scope('draw.board'):
+                        draw_board(dim, axis_extent, pads)
+                    claim = frame.acquire()
+                    if claim is None:
+                        break
+                    scene.bind(claim[0])
+                    with profiler.scope('draw.toilet'):
+                        scene.stations.draw()
+                    with profiler.scope('draw.trash'):
+                        scene.draw_trash()
+                    with profiler.scope('draw.bots'):
+                        fleet_renderer.draw()
+                    if frame.intact(claim):
+                        break
+                profiler.draw_overlay()
+                with profiler.scope('flip'):
+                    pygame.display.flip()
+            clock.tick(60)
+    finally:
+        frame['closed'][()] = True
+        frame.release()
+        if scene is not None:
+            scene.unbind()
+        frame.close()
+        pygame.quit()
+        if profile_path and profiler.phases:
+            profiler.export(profile_path)
+
+
+class RenderProcess:
+    """The window of a running simulation, drawn by a process of its own.
+
+    The simulation keeps stepping in the calling process and publish()es
+    each new state into a SharedFrame; the window process draws whatever
+    frame is latest, at its own pace. A slow, dragged or minimized window
+    therefore never holds the simulation back, and a burst of steps never
+    stalls the window. Key presses come back through the frame's header:
+    see `speed`, `profiling` and take_requests().
+    """
+
+    def __init__(self, fleet, trash_grid, stations, dim, caption, axis_extent=None,
+                 station_pads=False, profiling=False, profile_path=None, min_trash_capacity=4096):
+        particle_capacity = max((len(toilet.particles) for toilet in stations), default=0)
+        trash_capacity = max(min_trash_capacity, 2 * len(trash_grid))
+        self.frame = SharedFrame(fleet.count, len(stations), particle_capacity, trash_capacity)
+        self.frame['profiling'][()] = profiling
+        self.requests = (0, 0)
+        self.scene = (fleet, trash_grid, stations)
+        station_positions = [(float(x), float(z)) for x, _, z in stations.positions]
+        self.process = mp.Process(
+            target=render_main,
+            args=(self.frame.name, self.frame.sizes, dim, station_positions, caption,
+                  dim if axis_extent is None else axis_extent, station_pads, profiling,
+                  profile_path),
+            daemon=True,
+        )
+        self.process.start()
+
+    @property
+    def open(self):
+        """False once the window was closed (or its process died)."""
+        return not self.frame['closed'] and self.process.is_alive()
+
+    @property
+    def speed(self):
+        """Simulation speed picked in the window (see FixedTimestep.SPEEDS)."""
+        return FixedTimestep.SPEEDS[int(self.frame['speed'])]
+
+    @property
+    def profiling(self):
+        return bool(self.frame['profiling'])
+
+    def take_requests(self):
+        """(flushes, burgers) asked for with F and T since the previous call."""
+        requests = (int(self.frame['flush_requests']), int(self.frame['trash_requests']))
+        flushes, burgers = (now - before for now, before in zip(requests, self.requests))
+        self.requests = requests
+        return flushes, burgers
+
+    def publish(self):
+        """Offer the current state to the window; False if the frame was dropped."""
+        return self.frame.publish(*self.scene)
+
+    def run(self, timestep, step, profiler, before_step=None):
+        """Step the simulation until the window closes or `step` returns False.
+
+        `timestep` (a FixedTimestep) paces `step` at the speed picked in the
+        window; `before_step()` runs on every pass, e.g. to apply
+        take_requests(). When no step is due the loop naps briefly instead
+        of spinning.
+        """
+        stopped = False
+
+        def paced_step():
+            nonlocal stopped
+            if step() is False:
+                stopped = True
+                return False
+
+        stale = not self.publish()
+        while self.open and not stopped:
+            if timestep.speed != self.speed:
+                timestep.set_speed(self.speed)
+            profiler.enabled = self.profiling
+            if before_step is not None:
+                before_step()
+            with profiler.scope('simulate'):
+                steps = timestep.advance(paced_step)
+            # A dropped frame is offered again until the window takes one
+            if steps or stale:
+                with profiler.scope('publish'):
+                    stale = not self.publish()
+            if not steps:
+                time.sleep(IDLE_SLEEP)
+
+    def close(self):
+        """Tell the window the run is over, wait for it and free the frame."""
+        self.frame['finished'][()] = True
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.frame.close()
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import tempfile
+
+from HeadlessEngine import HeadlessEngine
+from SimulationMetrics import SimulationMetrics
+from model import ENGINE_VERSION
+
+# Parameters that change how a run is executed but not its results
+RESULT_NEUTRAL_PARAMETERS = (
+    'headless', 'record', 'log', 'trajectory', 'profile', 'profile_output',
+)
+
+
+class ResultCache:
+    """On-disk cache of simulation metrics, keyed by a hash of the run's inputs.
+
+    A seeded run is fully determined by its parameters, its seed and the
+    engine version, so the SHA-256 of those three is used as the file name.
+    Entries are JSON files; reading one refreshes its modification time and
+    the least recently used entries are evicted once the cache grows past
+    `max_bytes`.
+
+    Runs without a seed (neither `seed` nor a 'seed' parameter) are random
+    draws, so they are never stored: run() simulates them every time.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(parameters, seed, engine_version=ENGINE_VERSION):
+        relevant = {
+            k: v for k, v in parameters.items()
+            if k not in RESULT_NEUTRAL_PARAMETERS
+        }
+        payload = json.dumps(
+            {'parameters': relevant, 'seed': seed, 'engine_version': engine_version},
+            sort_keys=True,
+            default=repr,
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def seeded(parameters, seed):
+        """True when the run is reproducible: a seed is given or in the parameters."""
+        return seed is not None or parameters.get('seed') is not None
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, parameters, seed):
+        """Stored metrics for this run, or None if it has not been cached."""
+        if not self.seeded(parameters, seed):
+            return None
+        path = self.path(self.key(parameters, seed))
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        os.utime(path)  # mark as recently used
+        return SimulationMetrics.from_dict(data)
+
+    def put(self, parameters, seed, metrics):
+        if not self.seeded(parameters, seed):
+            raise ValueError("only seeded runs can be cached; an unseeded run is a random draw")
+        path = self.path(self.key(parameters, seed))
+        # Write to a temp file first so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(metrics.as_dict(), f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.json'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def run(self, parameters, seed):
+        """Metrics for this run, simulating (and caching) it only on a miss.
+
+        Cap runs with the agentpy 'steps' parameter so the cap is part of the key.
+        Unseeded runs are simulated every time and not cached.
+        """
+        if not self.seeded(parameters, seed):
+            return HeadlessEngine(parameters).run_until_done()
+        metrics = self.get(parameters, seed)
+        if metrics is None:
+            engine = HeadlessEngine(parameters, seed=seed)
+            metrics = engine.run_until_done()
+            self.put(parameters, seed, metrics)
+        return metrics
@@ -0,0 +1,58 @@
+import numpy as np
+
+
+class RunningSeries:
+    """Streaming aggregates of a per-step value in constant memory.
+
+    Keeps the count, sum and max of everything appended, plus the last
+    `window` values in a ring buffer for live views and plots, so a run
+    can go on for any number of steps without its history growing.
+    """
+
+    def __init__(self, window=1000, dtype=np.float64):
+        self.window = window
+        self.buffer = np.zeros(window, dtype=dtype)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def append(self, value):
+        self.buffer[self.count % self.window] = value
+        if self.count == 0 or value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+
+    def extend(self, values):
+        """Append every value of `values`, oldest first; same result as one append() each."""
+        values = np.asarray(values, dtype=self.buffer.dtype)
+        if not len(values):
+            return
+        kept = values[-self.window:]
+        first = self.count + len(values) - len(kept)
+        self.buffer[(first + np.arange(len(kept))) % self.window] = kept
+        high = values.max().item()
+        if self.count == 0 or high > self.max:
+            self.max = high
+        self.count += len(values)
+        if values.dtype.kind == 'f':
+            # Added one by one like append() does, so the rounding is the same
+            self.total = np.add.accumulate(np.concatenate([[self.total], values]))[-1].item()
+        else:
+            self.total += values.sum().item()
+
+    @property
+    def mean(self):
+        if self.count == 0:
+            return 0.0
+        return self.total / self.count
+
+    def recent(self):
+        """The last `window` values (fewer early on), oldest first."""
+        if self.count <= self.window:
+            return self.buffer[:self.count].copy()
+        start = self.count % self.window
+        return np.concatenate([self.buffer[start:], self.buffer[:start]])
+
+    def __len__(self):
+        return self.count
@@ -0,0 +1,172 @@
+import heapq
+import numpy as np
+from Fleet import SEARCHING, ROW_SPACING, lane_bounds
+
+
+class LawnmowerSearch:
+    """Blind boustrophedon sweep: each bot covers its own lane of the board row by row.
+
+    A bot that finishes its lane takes over the far half of the unswept
+    rows of the busiest lane, so no bot sits idle while rows remain. Once
+    the whole board is swept, burgers that arrived since (see Workload)
+    start a new pass, each bot on its original lane.
+    """
+
+    name = "lawnmower"
+    targeted = False
+
+    def assign(self, fleet, trash_grid):
+        n = fleet.count
+        idle = np.flatnonzero(fleet.lane_done[:n] & (fleet.state[:n] == SEARCHING))
+        for i in idle:
+            remaining = fleet.remaining_rows()
+            donor = int(np.argmax(remaining))
+            take = remaining[donor] // 2
+            if take < 1:
+                break
+            lane_max = fleet.lane_max[donor]
+            lane_min = lane_max - (take - 1) * ROW_SPACING
+            fleet.lane_max[donor] = lane_min - ROW_SPACING
+            fleet.give_lane(i, lane_min, lane_max)
+
+        if self.new_pass(fleet, trash_grid):
+            for i in idle:
+                lane_min, lane_max = lane_bounds(i, n, fleet.map_limit[i])
+                if lane_max >= lane_min:
+                    fleet.give_lane(i, lane_min, lane_max)
+
+    def new_pass(self, fleet, trash_grid):
+        """True when every lane is swept but trash is left on the board."""
+        return len(trash_grid) > 0 and bool(fleet.lane_done[:fleet.count].all())
+
+    def pending(self, fleet, trash_grid):
+        """True when assign() would hand out rows this step."""
+        n = fleet.count
+        idle = fleet.lane_done[:n] & (fleet.state[:n] == SEARCHING)
+        if not idle.any():
+            return False
+        return fleet.remaining_rows().max() >= 2 or self.new_pass(fleet, trash_grid)
+
+
+class NearestTrashSearch:
+    """Assign each free bot a burger and let it drive straight to it.
+
+    Every step, bots that are searching without a target are matched to
+    uncollected trash greedily, closest (bot, burger) pair first, so no two
+    bots ever chase the same one. A bot that lost its burger to another
+    bot's pickup, or that stopped searching, releases its claim and is
+    matched again.
+
+    Distances are computed with NumPy against the TrashGrid's flat arrays,
+    `chunk_size` bots at a time to bound memory. With k free bots at most k
+    burgers get claimed per step, so each bot only needs its k nearest
+    candidates. Claims are also kept as a mask aligned with the grid's flat
+    list, rebuilt only when that list changes, so picking the unclaimed
+    candidates is one array lookup.
+    """
+
+    name = "nearest"
+    targeted = True
+
+    def __init__(self, chunk_size=256):
+        self.chunk_size = chunk_size
+        # Claimed burger -> its index in `flat_items`
+        self.claimed = {}
+        self.flat_items = None
+        self.claimed_mask = np.zeros(0, dtype=bool)
+
+    def release(self, fleet, i):
+        index = self.claimed.pop(fleet.target_trash[i], None)
+        if index is not None:
+            self.claimed_mask[index] = False
+        fleet.target_trash[i] = None
+        fleet.has_target[i] = False
+        fleet.leg_ticks[i] = -1
+
+    def pending(self, fleet, trash_grid):
+        """True when assign() would release or hand out a target this step."""
+        n = fleet.count
+        searching = fleet.state[:n] == SEARCHING
+        for i in np.flatnonzero(fleet.has_target[:n]):
+            if not searching[i] or fleet.target_trash[i].is_collected:
+                return True
+        free = searching & ~fleet.has_target[:n]
+        return bool(free.any()) and len(self.claimed) < len(trash_grid)
+
+    def assign(self, fleet, trash_grid):
+        n = fleet.count
+        searching = fleet.state[:n] == SEARCHING
+
+        for i in np.flatnonzero(fleet.has_target[:n]):
+            if not searching[i] or fleet.target_trash[i].is_collected:
+                self.release(fleet, i)
+
+        free = np.flatnonzero(searching & ~fleet.has_target[:n])
+        if not free.size or len(self.claimed) >= len(trash_grid):
+            return
+
+        items, xz = trash_grid.flat()
+        if items is not self.flat_items:
+            self.align_claims(items)
+        candidates = np.flatnonzero(~self.claimed_mask)
+        k = min(len(free), len(candidates))
+        cx = xz[candidates, 0]
+        cz = xz[candidates, 1]
+
+        # Each free bot's k nearest candidates, closest first
+        ranked = {}
+        for start in range(0, len(free), self.chunk_size):
+            bots = free[start:start + self.chunk_size]
+            dx = cx[None, :] - fleet.position[bots, 0, None]
+            dz = cz[None, :] - fleet.position[bots, 2, None]
+            d2 = dx * dx + dz * dz
+            if k < len(candidates):
+                near = np.argpartition(d2, k - 1, axis=1)[:, :k]
+            else:
+                near = np.broadcast_to(np.arange(len(candidates)), d2.shape)
+            near_d2 = np.take_along_axis(d2, near, axis=1)
+            order = np.argsort(near_d2, axis=1, kind='stable')
+            near = np.take_along_axis(near, order, axis=1)
+            near_d2 = np.take_along_axis(near_d2, order, axis=1)
+            for row, i in enumerate(bots):
+                ranked[int(i)] = (candidates[near[row]], near_d2[row])
+
+        heap = [(d2[0], i, 0) for i, (_, d2) in ranked.items()]
+        heapq.heapify(heap)
+        while heap:
+            _, i, rank = heapq.heappop(heap)
+            choices, d2 = ranked[i]
+            index = choices[rank]
+            if self.claimed_mask[index]:
+                # A closer bot got it first; try this bot's next candidate
+                if rank + 1 < len(choices):
+                    heapq.heappush(heap, (d2[rank + 1], i, rank + 1))
+                continue
+            trash = items[index]
+            self.claimed[trash] = index
+            self.claimed_mask[index] = True
+            fleet.target_trash[i] = trash
+            fleet.target_position[i] = trash.Position
+            fleet.has_target[i] = True
+            fleet.leg_ticks[i] = -1
+
+    def align_claims(self, items):
+        """Re-index the claims against a new flat list of the grid (trash came or went)."""
+        index = {id(trash): k for k, trash in enumerate(items)}
+        self.flat_items = items
+        self.claimed_mask = np.zeros(len(items), dtype=bool)
+        for trash in self.claimed:
+            k = index[id(trash)]
+            self.claimed[trash] = k
+            self.claimed_mask[k] = True
+
+
+SEARCH_STRATEGIES = {
+    LawnmowerSearch.name: LawnmowerSearch,
+    NearestTrashSearch.name: NearestTrashSearch,
+}
+
+
+def make_search(name):
+    """Search strategy instance for a name in SEARCH_STRATEGIES."""
+    return SEARCH_STRATEGIES[name]()
@@ -0,0 +1,485 @@
+import math
+import os
+import random
+import threading
+import time
+import traceback
+import multiprocessing as mp
+import numpy as np
+from HeadlessEngine import HeadlessEngine
+from SharedBlock import SharedBlock
+from Fleet import Fleet, FIELDS, RETURNING, DUMPING_ANIMATION, ROW_SPACING
+from CollisionGrid import CollisionGrid, BODY_HALF_WIDTH, BODY_HALF_LENGTH
+from TrashGrid import TrashGrid
+
+# Parameters whose outputs or workload need the whole board in one process
+UNSHARDABLE = ('record', 'log', 'trajectory', 'arrival_rate', 'arrival_trace')
+
+
+def shard_halo(fleet):
+    """How far past its band a shard's bots can reach for trash in one step.
+
+    A step moves a bot at most its speed, or one row over on a lawnmower
+    turn, and it picks up within pickup_reach of the path it took.
+    """
+    speed = float(fleet.base_speed[:fleet.count].max()) if fleet.count else 0.0
+    return Fleet.pickup_reach + max(speed, ROW_SPACING)
+
+
+def max_shards(dim, halo):
+    """Most shards a board of half-size `dim` can be cut into.
+
+    Each band is stepped in two halves, and halves stepped at the same time
+    must be more than two halos apart (see Shard), so half a band has to
+    span at least two halos.
+    """
+    return max(1, int(dim // (2 * halo)))
+
+
+def shared_spec(fleet, n_trash, shards):
+    """Name -> (shape, dtype) of every array the shards share."""
+    spec = {
+        f'fleet.{name}': ((fleet.capacity,) + shape, dtype)
+        for name, (shape, dtype) in FIELDS.items() if dtype is not object
+    }
+    spec.update({
+        # Shard that steps each bot
+        'owner': ((fleet.capacity,), np.int64),
+        # Bots that set off for a station this step, for least_loaded routing
+        'leaving': ((fleet.capacity,), np.bool_),
+        # Per burger: step it was picked up / delivered (-1: not yet) and the bot carrying it
+        'trash_picked': ((n_trash,), np.int64),
+        'trash_delivered': ((n_trash,), np.int64),
+        'trash_carrier': ((n_trash,), np.int64),
+        # Burgers each shard claimed in each half of the step, for its neighbours
+        'claims': ((shards, 2, max(fleet.capacity, 1)), np.int64),
+        'claim_count': ((shards, 2), np.int64),
+        # Per-shard tallies
+        'collected': ((shards,), np.int64),
+        'picked': ((shards,), np.int64),
+        'movements': ((shards,), np.float64),
+        'collisions': ((shards,), np.int64),
+        'handoffs': ((shards,), np.int64),
+    })
+    return spec
+
+
+class BoardCount:
+    """Stands in for the whole board's TrashGrid where only its size is asked for.
+
+    The lane search only checks whether trash is left, and no shard holds
+    every burger.
+    """
+
+    def __init__(self, count):
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+
+class Shard:
+    """One process's part of a ShardedEngine run: the bots in one band of the board.
+
+    The board is cut along Z into `shards` bands; shard k steps the bots
+    whose position is in band k at the start of a step, with a TrashGrid
+    of the burgers in its band plus a halo (see shard_halo) on each side.
+    Every shard builds the same model from the same seed, then swaps the
+    fleet's columns for the shared ones, so handing a bot to another shard
+    is just a change of `owner`; only its cargo list is rebuilt there.
+
+    Steps are synchronized with a barrier, and each one runs in phases:
+
+    1. Shard 0 runs the lane search over the whole fleet while the others
+       wait.
+    2. Every shard steps its bots in the lower half of its band, then
+       (3.) those in the upper half. Halves stepped at the same time are
+       over two halos apart, so two shards never reach for the same
+       burger; after each phase a shard drops what its neighbours claimed.
+    4. Shards count collisions and hand off the bots that left their band.
+       With least_loaded routing shard 0 then routes every bot that set
+       off for a station again, in row order against the loads at the
+       start of the step, as one process would have; they only start
+       driving next step.
+    """
+
+    def __init__(self, index, shards, model, block, barrier):
+        self.index = index
+        self.shards = shards
+        self.model = model
+        self.fleet = fleet = model.fleet
+        self.block = block
+        self.barrier = barrier
+        self.collision_grid = CollisionGrid()
+        self.last_step = model.p['steps'] if 'steps' in model.p else math.inf
+
+        # Band k spans Z from -dim + k * height; the outer bands run on past the board
+        self.height = 2 * model.dim / shards
+        self.low = -model.dim + index * self.height if index else -math.inf
+        self.high = -model.dim + (index + 1) * self.height if index < shards - 1 else math.inf
+        self.middle = -model.dim + (index + 0.5) * self.height
+        halo = shard_halo(fleet)
+
+        self.trash_objects = model.trash_objects
+        self.trash_index = {id(trash): k for k, trash in enumerate(self.trash_objects)}
+        self.trash_grid = TrashGrid(cell_size=10.0, trash_objects=[
+            trash for trash in self.trash_objects
+            if self.low - halo <= trash.Position[2] < self.high + halo
+        ])
+        model.trash_grid = self.trash_grid
+
+        n = fleet.count
+        if index == 0:
+            for name, (_, dtype) in FIELDS.items():
+                if dtype is not object:
+                    block[f'fleet.{name}'][:n] = getattr(fleet, name)[:n]
+            block['owner'][:n] = self.band_of(fleet.position[:n, 2])
+            for key in ('trash_picked', 'trash_delivered', 'trash_carrier'):
+                block[key][:] = -1
+        barrier.wait()
+        self.attach()
+        self.rows = np.flatnonzero(block['owner'][:n] == index)
+
+    def band_of(self, z):
+        """Band (shard index) of each Z."""
+        band = np.floor((np.asarray(z) + self.model.dim) / self.height).astype(np.int64)
+        return np.clip(band, 0, self.shards - 1)
+
+    def attach(self):
+        """Swap the fleet's own columns for the shared ones."""
+        for name, (_, dtype) in FIELDS.items():
+            if dtype is not object:
+                setattr(self.fleet, name, self.block[f'fleet.{name}'])
+
+    def detach(self):
+        """Give the fleet private copies of its columns again, so the block can close."""
+        for name, (_, dtype) in FIELDS.items():
+            if dtype is not object:
+                setattr(self.fleet, name, np.array(getattr(self.fleet, name)))
+
+    def run(self, until):
+        """Step until step `until` or the end of the run; every shard stops at the same step."""
+        model = self.model
+        while model.running and model.t < until:
+            self.step()
+            if model.t >= self.last_step:
+                model.running = False
+
+    def step(self):
+        """Simulate one step of this shard's bots, in lockstep with the other shards."""
+        model = self.model
+        fleet = self.fleet
+        block = self.block
+        model.t += 1
+        fleet.now = model.t
+
+        if self.index == 0:
+            self.plan()
+        self.barrier.wait()
+
+        rows = self.rows
+        block['movements'][self.index] = 0.0
+        lower = fleet.position[rows, 2] < self.middle
+        for phase, part in enumerate((rows[lower], rows[~lower])):
+            self.move(part, phase)
+            self.barrier.wait()
+            self.drop_claims(phase)
+
+        block['collisions'][self.index] = self.count_collisions()
+        self.hand_off(rows)
+        self.barrier.wait()
+        self.receive()
+        self.tally()
+
+    def plan(self):
+        """Hand out lanes over the whole fleet; shard 0 does it while the others wait."""
+        fleet = self.fleet
+        block = self.block
+        search = fleet.search
+        board = BoardCount(self.model.n_trash - int(block['picked'].sum()))
+        if search is not None and search.pending(fleet, board):
+            search.assign(fleet, board)
+        if fleet.stations.routing == 'least_loaded':
+            self.station_load = fleet.station_load(len(fleet.stations))
+
+    def move(self, rows, phase):
+        """Step the bots in `rows` and publish the burgers they picked up and delivered."""
+        fleet = self.fleet
+        block = self.block
+        now = self.model.t
+        claims = []
+        if rows.size:
+            state = fleet.state[rows]
+            load = fleet.load[rows]
+            delivered = fleet.delivered[rows]
+            # Dumping clears the cargo list, so keep the lists being dumped
+            cargo = {i: fleet.cargo[i] for i in rows[state == DUMPING_ANIMATION]}
+
+            block['collected'][self.index] += fleet.step(self.trash_grid, rows)
+            block['movements'][self.index] += fleet.step_distance
+            block['leaving'][rows] = (fleet.state[rows] == RETURNING) & (state != RETURNING)
+
+            picked = rows[fleet.load[rows] > load]
+            claims = [self.trash_index[id(fleet.cargo[i][-1])] for i in picked]
+            block['trash_picked'][claims] = now
+            block['trash_carrier'][claims] = picked
+            block['picked'][self.index] += len(claims)
+            for i in rows[fleet.delivered[rows] > delivered]:
+                dumped = [self.trash_index[id(trash)] for trash in cargo[i]]
+                block['trash_delivered'][dumped] = now
+                block['trash_carrier'][dumped] = -1
+        block['claims'][self.index, phase, :len(claims)] = claims
+        block['claim_count'][self.index, phase] = len(claims)
+
+    def drop_claims(self, phase):
+        """Take the burgers the neighbouring shards claimed in `phase` off this shard's grid."""
+        block = self.block
+        for neighbour in (self.index - 1, self.index + 1):
+            if 0 <= neighbour < self.shards:
+                count = block['claim_count'][neighbour, phase]
+                for k in block['claims'][neighbour, phase, :count]:
+                    trash = self.trash_objects[k]
+                    trash.is_collected = True
+                    self.trash_grid.remove(trash)
+
+    def count_collisions(self):
+        """Colliding pairs whose lower bot (by Z, then row) is in this shard's band."""
+        fleet = self.fleet
+        n = fleet.count
+        z = fleet.position[:n, 2]
+        # Overlapping bodies are never further apart than two of the widest bodies
+        margin = 2 * math.hypot(BODY_HALF_WIDTH * fleet.fatness[:n].max(), BODY_HALF_LENGTH)
+        near = np.flatnonzero((z >= self.low - margin) & (z < self.high + margin))
+        i, j = self.collision_grid.colliding_pairs(fleet, near)
+        lower = np.where((z[i] < z[j]) | ((z[i] == z[j]) & (i < j)), i, j)
+        return int(np.count_nonzero(self.band_of(z[lower]) == self.index))
+
+    def hand_off(self, rows):
+        """Give the bots that left this shard's band to the shard they are in now."""
+        band = self.band_of(self.fleet.position[rows, 2])
+        leaving = band != self.index
+        self.block['owner'][rows[leaving]] = band[leaving]
+        self.block['handoffs'][self.index] = np.count_nonzero(leaving)
+
+    def receive(self):
+        """Take over the bots handed to this shard, with the burgers they carry."""
+        block = self.block
+        if not block['handoffs'].any():
+            return
+        fleet = self.fleet
+        owned = np.flatnonzero(block['owner'][:fleet.count] == self.index)
+        arrived = np.setdiff1d(owned, self.rows, assume_unique=True)
+        self.rows = owned
+        if not arrived.size:
+            return
+        for i in arrived:
+            fleet.cargo[i] = []
+        carrier = block['trash_carrier']
+        for k in np.flatnonzero(np.isin(carrier, arrived)):
+            fleet.cargo[carrier[k]].append(self.trash_objects[k])
+
+    def tally(self):
+        """Sum the shards' counts into the model; shard 0 keeps the per-step series."""
+        model = self.model
+        block = self.block
+        model.collected_trash = int(block['collected'].sum())
+        if self.index == 0:
+            if self.fleet.stations.routing == 'least_loaded':
+                self.route()
+            model.step_movements = float(block['movements'].sum())
+            model.movement_series.append(model.step_movements)
+            model.step_collisions = int(block['collisions'].sum())
+            model.collision_series.append(model.step_collisions)
+        if model.cleared:
+            model.done = True
+            model.stop()
+
+    def route(self):
+        """Route this step's leavers over the whole fleet, in row order."""
+        leaving = np.flatnonzero(self.block['leaving'][:self.fleet.count])
+        if leaving.size:
+            self.fleet.stations.load = self.station_load.copy()
+            self.fleet.stations.route(self.fleet, leaving)
+
+    def sync_trash(self):
+        """Copy the pickup and delivery steps of every burger into this shard's Trash objects."""
+        picked = self.block['trash_picked']
+        delivered = self.block['trash_delivered']
+        for k, trash in enumerate(self.trash_objects):
+            trash.is_collected = bool(picked[k] >= 0)
+            trash.picked_step = int(picked[k]) if picked[k] >= 0 else None
+            trash.delivered_step = int(delivered[k]) if delivered[k] >= 0 else None
+
+
+def run_shard(index, shards, parameters, seed, spec, block_name, barrier, conn):
+    """Entry point of a worker process: build shard `index` and run it on command."""
+    block = SharedBlock(spec, block_name)
+    shard = None
+    try:
+        model = HeadlessEngine(parameters, seed=seed).model
+        shard = Shard(index, shards, model, block, barrier)
+        conn.send(('ready', None))
+        while True:
+            command, until = conn.recv()
+            if command == 'close':
+                break
+            shard.run(until)
+            conn.send(('ok', None))
+    except Exception:
+        barrier.abort()
+        conn.send(('error', traceback.format_exc()))
+    finally:
+        if shard is not None:
+            shard.detach()
+        block.close()
+
+
+class ShardedEngine:
+    """Runs a CleaningSimulation split over processes, one band of the board each.
+
+    Shard 0 runs in this process and the others in worker processes (see
+    Shard); `shards` defaults to one per core, as many as the board allows.
+    Bot state, burger flags and per-shard tallies live in one shared memory
+    block, so nothing is pickled while stepping: the workers only get a
+    message per run()/run_until_done() call. Use it like HeadlessEngine,
+    then close() it (or use it as a context manager).
+
+    Only lawnmower sweeps with a fixed set of burgers can be sharded:
+    nearest-trash matching and arrivals need the whole board in one
+    process, as do step records, logs and trajectories (ValueError).
+    Results match engine='fleet' except where bots of the two halves of
+    a band touch the same burger in the same step: bots step by half band
+    rather than by row, so the order of the two pickups can differ.
+    """
+
+    def __init__(self, parameters, seed=None, shards=None):
+        parameters = dict(parameters, engine='fleet')
+        for key in UNSHARDABLE:
+            if parameters.get(key):
+                raise ValueError(f"the sharded engine can't run with {key!r}")
+        if seed is None:
+            seed = parameters.get('seed', random.getrandbits(128))
+
+        model = HeadlessEngine(parameters, seed=seed).model
+        if model.fleet.targeted:
+            raise ValueError(f"the sharded engine can't run targeted search {model.search!r}")
+        limit = max_shards(model.dim, shard_halo(model.fleet))
+        if shards is None:
+            shards = min(os.cpu_count() or 1, limit)
+        elif not 1 <= shards <= limit:
+            raise ValueError(f"a board of dim {model.dim} takes 1 to {limit} shards, got {shards}")
+        self.shards = shards
+
+        spec = shared_spec(model.fleet, len(model.trash_objects), shards)
+        self.block = SharedBlock(spec)
+        context = mp.get_context()
+        barrier = context.Barrier(shards)
+        self.workers = []
+        self.shard = None
+        try:
+            for index in range(1, shards):
+                conn, child = context.Pipe()
+                process = context.Process(
+                    target=run_shard, daemon=True,
+                    args=(index, shards, parameters, seed, spec, self.block.name, barrier, child),
+                )
+                process.start()
+                child.close()
+                self.workers.append((process, conn))
+
+            try:
+                self.shard = Shard(0, shards, model, self.block, barrier)
+            except threading.BrokenBarrierError:
+                pass
+            self.collect()
+        except BaseException:
+            # Release the workers still waiting at the barrier, then everything else
+            barrier.abort()
+            self.close()
+            raise
+        self.model = model
+        # Time the run, not the setup of the workers
+        model.start_time = time.time()
+
+    @property
+    def done(self):
+        return self.model.done
+
+    def step(self):
+        """Advance the simulation one step."""
+        self.advance(self.model.t + 1)
+
+    def run(self, steps):
+        """Run up to `steps` steps (fewer if the simulation stops) and return the metrics."""
+        self.advance(self.model.t + steps)
+        return self.get_metrics()
+
+    def run_until_done(self, max_steps=None):
+        """Run until all trash is collected (or `max_steps` is reached) and return the metrics."""
+        self.advance(math.inf if max_steps is None else max_steps)
+        return self.get_metrics()
+
+    def advance(self, until):
+        if not self.model.running:
+            return
+        for _, conn in self.workers:
+            conn.send(('run', until))
+        try:
+            self.shard.run(until)
+        except threading.BrokenBarrierError:
+            pass
+        except Exception:
+            # The workers fail on the broken barrier; report what broke it
+            self.shard.barrier.abort()
+            try:
+                self.collect()
+            except RuntimeError:
+                pass
+            raise
+        self.collect()
+
+    def collect(self):
+        """Wait for every worker to finish its command; raise if one of them failed."""
+        failed = [(index, conn.recv()) for index, (_, conn) in enumerate(self.workers, 1)]
+        for index, (status, details) in failed:
+            if status == 'error':
+                raise RuntimeError(f"shard {index} failed:\n{details}")
+
+    def get_metrics(self):
+        """Snapshot of the metrics collected so far, over every shard."""
+        self.shard.sync_trash()
+        return self.model.get_metrics()
+
+    def close(self):
+        """Stop the workers and release the shared memory."""
+        for process, conn in self.workers:
+            if process.is_alive():
+                try:
+                    conn.send(('close', None))
+                except OSError:
+                    pass  # it exited after failing
+            process.join()
+            conn.close()
+        self.workers = []
+        if self.shard is not None:
+            self.shard.detach()
+        self.block.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    parameters = {
+        'dim': 10000,
+        'n_bots': 2000,
+        'n_trash': 20000
+    }
+
+    with ShardedEngine(parameters, seed=0) as engine:
+        metrics = engine.run(200)
+        print(metrics)
+        print(f"{engine.shards} shards: {metrics.steps_per_second:.0f} pasos por segundo")
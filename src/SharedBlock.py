@@ -0,0 +1,39 @@
+from multiprocessing import shared_memory
+import numpy as np
+
+
+class SharedBlock:
+    """Named NumPy arrays packed into one multiprocessing.shared_memory block.
+
+    The process that creates the block (name=None) owns it and unlinks it
+    on close; the others attach to it by name. Every array is a view on
+    the shared buffer, so a write is seen by every process without copies.
+    """
+
+    def __init__(self, spec, name=None):
+        offsets = {}
+        size = 0
+        for key, (shape, dtype) in spec.items():
+            offsets[key] = size
+            nbytes = int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize
+            size += -(-nbytes // 8) * 8  # keep every array 8-byte aligned
+        self.owner = name is None
+        self.memory = shared_memory.SharedMemory(name=name, create=self.owner, size=max(size, 8))
+        self.arrays = {
+            key: np.ndarray(shape, dtype=dtype, buffer=self.memory.buf, offset=offsets[key])
+            for key, (shape, dtype) in spec.items()
+        }
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def __getitem__(self, key):
+        return self.arrays[key]
+
+    def close(self):
+        # The views have to go before the buffer can be released
+        self.arrays.clear()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
@@ -0,0 +1,109 @@
+class SimulationMetrics:
+    """Results of a simulation run."""
+
+    def __init__(self, steps, elapsed_time, collected_trash, n_trash, total_movements,
+                 collisions, max_movements, max_collisions, movement_history,
+                 collision_history, pickup_latency=None, delivery_latency=None,
+                 state_ticks=None, state_distance=None, delivered=0):
+        self.steps = steps
+        self.elapsed_time = elapsed_time
+        self.collected_trash = collected_trash
+        self.n_trash = n_trash
+        self.total_movements = total_movements
+        self.collisions = collisions
+        self.max_movements = max_movements
+        self.max_collisions = max_collisions
+        # Only the most recent steps (see CleaningSimulation.history_window)
+        self.movement_history = movement_history
+        self.collision_history = collision_history  # colliding bot pairs per step
+        # {'p50', 'p95', 'p99'} steps from a burger spawning to being picked
+        # up / landing in a toilet (None until one has)
+        self.pickup_latency = pickup_latency
+        self.delivery_latency = delivery_latency
+        # Bot-steps spent and distance actually moved in each state, by state
+        # name and summed over the fleet, and burgers that reached a toilet
+        self.state_ticks = state_ticks or {}
+        self.state_distance = state_distance or {}
+        self.delivered = delivered
+
+    @property
+    def done(self):
+        """True once every piece of trash has been collected."""
+        return self.collected_trash >= self.n_trash
+
+    @property
+    def steps_per_second(self):
+        if self.elapsed_time <= 0:
+            return float('inf')
+        return self.steps / self.elapsed_time
+
+    @property
+    def mean_movements(self):
+        if self.steps == 0:
+            return 0.0
+        return self.total_movements / self.steps
+
+    @property
+    def movements_per_item(self):
+        """Distance travelled by the fleet per collected burger."""
+        if self.collected_trash == 0:
+            return float('inf')
+        return self.total_movements / self.collected_trash
+
+    @property
+    def items_per_step(self):
+        """Throughput: burgers collected per simulation step."""
+        if self.steps == 0:
+            return 0.0
+        return self.collected_trash / self.steps
+
+    @property
+    def occupancy(self):
+        """Fraction of the fleet's time spent in each state."""
+        total = sum(self.state_ticks.values())
+        return {name: ticks / total if total else 0.0 for name, ticks in self.state_ticks.items()}
+
+    @property
+    def distance(self):
+        """Distance the bots actually moved, from the per-state counters.
+
+        Matches total_movements up to rounding; it is summed in a different order.
+        """
+        return sum(self.state_distance.values())
+
+    @property
+    def travel_share(self):
+        """Fraction of the distance moved in each state; what isn't searching is overhead."""
+        total = self.distance
+        return {name: d / total if total else 0.0 for name, d in self.state_distance.items()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def as_dict(self):
+        return {
+            'steps': self.steps,
+            'elapsed_time': self.elapsed_time,
+            'collected_trash': self.collected_trash,
+            'n_trash': self.n_trash,
+            'total_movements': self.total_movements,
+            'collisions': self.collisions,
+            'max_movements': self.max_movements,
+            'max_collisions': self.max_collisions,
+            'movement_history': list(self.movement_history),
+            'collision_history': list(self.collision_history),
+            'pickup_latency': self.pickup_latency,
+            'delivery_latency': self.delivery_latency,
+            'state_ticks': self.state_ticks,
+            'state_distance': self.state_distance,
+            'delivered': self.delivered,
+        }
+
+    def __repr__(self):
+        return (
+            f"SimulationMetrics(steps={self.steps}, "
+            f"collected_trash={self.collected_trash}/{self.n_trash}, "
+            f"total_movements={self.total_movements}, "
+            f"collisions={self.collisions})"
+        )
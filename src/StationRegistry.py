@@ -0,0 +1,106 @@
+import math
+import random
+import numpy as np
+from Toilet import Toilet
+
+ROUTINGS = ("nearest", "least_loaded")
+
+
+def station_positions(stations, dim):
+    """X/Z of every dump station from the 'stations' parameter.
+
+    An int n spreads n stations over a centered ceil(sqrt(n)) grid on the
+    board (1 is the toilet at the origin); anything else is taken as a
+    list of (x, z) pairs.
+    """
+    if isinstance(stations, int):
+        side = math.ceil(math.sqrt(stations))
+        spacing = 2 * dim / side
+        cells = [(col, row) for row in range(side) for col in range(side)][:stations]
+        return [
+            (-dim + (col + 0.5) * spacing, -dim + (row + 0.5) * spacing) for col, row in cells
+        ]
+    return [(float(x), float(z)) for x, z in stations]
+
+
+class StationRegistry:
+    """Every dump station (a Toilet) on the board and which one a returning bot goes to.
+
+    With 'nearest' routing a bot heads for the station closest to where it
+    finished eating. With 'least_loaded' it picks the station with the
+    fewest bots already on their way to it or dumping there, the closest
+    of those on a tie. Loads are counted once per step by count_load()
+    (Fleet.assign_targets does it) plus the bots routed since, so routing
+    doesn't depend on the order bots are updated in within a step.
+
+    The stations are few and fixed, so the lookup is one vectorized
+    distance test against all of them.
+    """
+
+    def __init__(self, toilets, routing="nearest"):
+        if routing not in ROUTINGS:
+            raise ValueError(f"unknown station routing {routing!r}, expected one of {ROUTINGS}")
+        self.toilets = list(toilets)
+        self.routing = routing
+        self.positions = np.array([toilet.position for toilet in self.toilets], dtype=np.float64)
+        self.load = np.zeros(len(self.toilets), dtype=np.int64)
+
+    @classmethod
+    def at(cls, positions, rng=random, routing="nearest"):
+        """One Toilet at each (x, z) of `positions`, drawing waste particles from `rng`."""
+        toilets = []
+        for x, z in positions:
+            toilet = Toilet(rng=rng)
+            toilet.position = [float(x), 0.0, float(z)]
+            toilets.append(toilet)
+        return cls(toilets, routing)
+
+    def __len__(self):
+        return len(self.toilets)
+
+    def __iter__(self):
+        return iter(self.toilets)
+
+    def __getitem__(self, station):
+        return self.toilets[station]
+
+    def nearest(self, xs, zs):
+        """Index of the closest station to each (x, z)."""
+        dx = self.positions[None, :, 0] - np.asarray(xs, dtype=np.float64)[..., None]
+        dz = self.positions[None, :, 2] - np.asarray(zs, dtype=np.float64)[..., None]
+        return np.argmin(dx * dx + dz * dz, axis=-1)
+
+    def count_load(self, fleet):
+        """Count the bots heading to or dumping at each station; call once per step."""
+        self.load = fleet.station_load(len(self.toilets))
+
+    def route(self, fleet, idx):
+        """Send the bots in `idx` (row order) to their station and return the station indices."""
+        x = fleet.position[idx, 0]
+        z = fleet.position[idx, 2]
+        if self.routing == "nearest":
+            stations = self.nearest(x, z)
+        else:
+            dx = self.positions[None, :, 0] - x[:, None]
+            dz = self.positions[None, :, 2] - z[:, None]
+            d2 = dx * dx + dz * dz
+            stations = np.empty(len(idx), dtype=np.int64)
+            for row in range(len(idx)):
+                # Fewest bots first, then the closest
+                candidates = np.flatnonzero(self.load == self.load.min())
+                stations[row] = candidates[np.argmin(d2[row, candidates])]
+                self.load[stations[row]] += 1
+        fleet.station[idx] = stations
+        return stations
+
+    def update(self, steps=1):
+        for toilet in self.toilets:
+            toilet.update(steps)
+
+    def draw(self):
+        for toilet in self.toilets:
+            toilet.draw()
+
+    def flush(self):
+        for toilet in self.toilets:
+            toilet.flush()
@@ -0,0 +1,90 @@
+import numpy as np
+from Fleet import STATE_NAMES
+
+MAGIC = b"STEPLOG1"
+# Magic, record count, number of states
+HEADER_DTYPE = np.dtype([("magic", "S8"), ("count", "<i8"), ("n_states", "<i8")])
+
+
+def record_dtype(n_states=len(STATE_NAMES)):
+    """One row of the log: a step's metrics and how many bots are in each state."""
+    return np.dtype([
+        ("step", "<i8"),
+        ("movements", "<f8"),
+        ("collected", "<i8"),
+        ("collisions", "<i8"),
+        ("states", "<i4", (n_states,)),
+    ])
+
+
+class StepLog:
+    """Append-only binary log of per-step metrics, written through a memory map.
+
+    The file is a small header followed by fixed-size records. It grows
+    `chunk` records at a time and the header's record count is updated on
+    every append, so a log cut short by a crash still reads back cleanly.
+    Use StepLog.read() to get the records as a read-only NumPy structured
+    array mapped straight from the file.
+    """
+
+    def __init__(self, path, n_states=len(STATE_NAMES), chunk=4096):
+        self.path = path
+        self.dtype = record_dtype(n_states)
+        self.chunk = chunk
+        self.count = 0
+        self.capacity = 0
+        self.file = open(path, "w+b")
+        self.file.truncate(HEADER_DTYPE.itemsize)
+        self.header = np.memmap(self.file, dtype=HEADER_DTYPE, mode="r+", shape=())
+        self.header["magic"] = MAGIC
+        self.header["n_states"] = n_states
+        self.header["count"] = 0
+        self.records = None
+
+    def _grow(self):
+        if self.records is not None:
+            self.records.flush()
+        self.capacity += self.chunk
+        self.file.truncate(HEADER_DTYPE.itemsize + self.capacity * self.dtype.itemsize)
+        self.records = np.memmap(
+            self.file, dtype=self.dtype, mode="r+",
+            offset=HEADER_DTYPE.itemsize, shape=(self.capacity,),
+        )
+
+    def append(self, step, movements, collected, collisions, states):
+        if self.count == self.capacity:
+            self._grow()
+        record = self.records[self.count]
+        record["step"] = step
+        record["movements"] = movements
+        record["collected"] = collected
+        record["collisions"] = collisions
+        record["states"] = states
+        self.count += 1
+        self.header["count"] = self.count
+
+    def close(self):
+        """Flush and trim the preallocated tail off the file."""
+        if self.file.closed:
+            return
+        if self.records is not None:
+            self.records.flush()
+        self.header.flush()
+        self.records = None
+        self.header = None
+        self.file.truncate(HEADER_DTYPE.itemsize + self.count * self.dtype.itemsize)
+        self.file.close()
+
+    @staticmethod
+    def read(path):
+        """Every record of the log at `path`, memory-mapped read-only."""
+        header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)[0]
+        if header["magic"] != MAGIC:
+            raise ValueError(f"{path} is not a step log")
+        dtype = record_dtype(int(header["n_states"]))
+        if header["count"] == 0:
+            return np.zeros(0, dtype=dtype)  # nothing to map
+        return np.memmap(
+            path, dtype=dtype, mode="r",
+            offset=HEADER_DTYPE.itemsize, shape=(int(header["count"]),),
+        )
@@ -1,17 +1,72 @@
-from OpenGL.GL import *
+try:
+    from OpenGL.GL import *
+except ImportError:  # headless runs don't need OpenGL
+    pass
 import numpy as np
 import math
 import random
 
+# Unit-circle tables (closed rings: the last point repeats the first)
+RING_SEGMENTS = 32
+RING_ANGLES = 2.0 * np.pi * np.arange(RING_SEGMENTS + 1) / RING_SEGMENTS
+RING_COS = np.cos(RING_ANGLES)
+RING_SIN = np.sin(RING_ANGLES)
+
+PARTICLE_SEGMENTS = 8
+PARTICLE_ANGLES = 2.0 * np.pi * np.arange(PARTICLE_SEGMENTS + 1) / PARTICLE_SEGMENTS
+
+
+def build_particle_template():
+    """Triangles of a unit waste particle: an upper and a lower cone over one ring."""
+    ring = np.stack(
+        [np.cos(PARTICLE_ANGLES), np.zeros(PARTICLE_SEGMENTS + 1), np.sin(PARTICLE_ANGLES)],
+        axis=1,
+    )
+    triangles = []
+    for apex_y in (1.0, -1.0):
+        apex = [0.0, apex_y, 0.0]
+        for i in range(PARTICLE_SEGMENTS):
+            triangles.extend([apex, ring[i], ring[i + 1]])
+    return np.array(triangles)
+
+
+PARTICLE_TEMPLATE = build_particle_template()
+
+# One waste particle per row of Toilet.particles
+PARTICLE_DTYPE = np.dtype([
+    ("x", np.float64),
+    ("y", np.float64),
+    ("z", np.float64),
+    ("size", np.float64),
+    ("color", np.float32, (3,)),
+    ("radius", np.float64),
+    ("offset", np.float64),
+    ("base_y", np.float64),
+])
+
 
 class Toilet:
-    def __init__(self):
+    """The toilet the bots dump into, with its water level, flush and waste particles.
+
+    Waste particles live in a fixed pool of `capacity` rows handed out in
+    ring order. A flush frees every slot; if the pool fills up before that,
+    new waste reuses the slots of the oldest particles. update() must cover
+    every simulation step for the flush to run (update(steps) covers several
+    at once).
+    """
+
+    particles_per_waste = 5
+
+    def __init__(self, rng=random, capacity=256):
+        self.rng = rng  # random.Random used for waste particles
         self.position = [0.0, 0.0, 0.0]  # Center of the world
         self.scale = 15.0  # Base size of toilet
         self.water_level = 0.2  # Start with some water
         self.flush_progress = 0.0  # Animation progress for flushing
         self.is_flushing = False
-        self.waste_particles = []  # List of waste particles
+        self.particles = np.zeros(capacity, dtype=PARTICLE_DTYPE)  # Waste particle pool
+        self.alive = np.zeros(capacity, dtype=bool)  # Slots in use
+        self.next_slot = 0  # Ring cursor: the next free (or else oldest) slot
         self.flush_rotation = 0.0  # Current rotation angle for swirl
 
         # Colors
@@ -21,53 +76,73 @@ class Toilet:
         self.rim_color = (0.9, 0.9, 0.9)  # Slightly darker than porcelain
         self.tank_color = (0.93, 0.93, 0.93)  # Tank color
 
-    def update(self):
-        if self.is_flushing:
+        # Display lists for the static porcelain, compiled on first draw
+        self.base_list = None
+        self.tank_list = None
+
+    def update(self, steps=1):
+        """Advance the flush and the settling waste by `steps` simulation steps."""
+        settle = steps
+        while settle and self.is_flushing:
             self.flush_progress += 0.02
             self.flush_rotation += 15.0  # Rotate 15 degrees per update
-
-            # Update waste particles during flush
-            for particle in self.waste_particles:
-                # Move particles in a spiral pattern
-                angle = math.radians(self.flush_rotation + particle["offset"])
-                radius = particle["radius"] * (1.0 - self.flush_progress)
-                particle["x"] = math.cos(angle) * radius
-                particle["z"] = math.sin(angle) * radius
-                particle["y"] = particle["base_y"] * (1.0 - self.flush_progress)
+            settle -= 1
+            if settle and self.flush_progress < 1.0:
+                continue
+
+            # Move particles in a spiral pattern during flush (free slots too; they are never drawn)
+            p = self.particles
+            angle = np.radians(self.flush_rotation + p["offset"])
+            radius = p["radius"] * (1.0 - self.flush_progress)
+            p["x"] = np.cos(angle) * radius
+            p["z"] = np.sin(angle) * radius
+            p["y"] = p["base_y"] * (1.0 - self.flush_progress)
 
             if self.flush_progress >= 1.0:
                 self.flush_progress = 0.0
                 self.is_flushing = False
                 self.water_level = max(0.2, self.water_level - 0.3)  # Keep some water
-                self.waste_particles = []  # Clear waste particles
+                self.alive[:] = False  # Clear waste particles
+                self.next_slot = 0
+                settle += 1  # The step that ends the flush settles too
 
         # Slowly settle waste particles
-        if not self.is_flushing:
-            for particle in self.waste_particles:
-                if particle["y"] > 0.1:
-                    particle["y"] = max(0.1, particle["y"] - 0.05)
+        if settle and not self.is_flushing:
+            y = self.particles["y"]
+            y[:] = np.where(y > 0.1, np.maximum(0.1, y - 0.05 * settle), y)
+
+    @property
+    def particle_count(self):
+        return int(np.count_nonzero(self.alive))
+
+    def free_slots(self, k):
+        """Indices of `k` slots for new particles; past the end of the pool, the oldest ones."""
+        capacity = len(self.particles)
+        slots = [(self.next_slot + j) % capacity for j in range(k)]
+        self.next_slot = (self.next_slot + k) % capacity
+        return slots
 
     def receive_waste(self):
         # Add new waste particles
-        for _ in range(5):  # Add multiple particles for each waste
-            angle = random.uniform(0, 360)
-            radius = random.uniform(0, self.scale * 0.3)
-            self.waste_particles.append(
-                {
-                    "x": math.cos(math.radians(angle)) * radius,
-                    "y": 2.0,  # Start above water
-                    "z": math.sin(math.radians(angle)) * radius,
-                    "size": random.uniform(0.8, 1.2),
-                    "color": (
-                        random.uniform(0.3, 0.5),
-                        random.uniform(0.15, 0.25),
-                        0.0,
-                    ),
-                    "radius": radius,
-                    "offset": random.uniform(0, 360),
-                    "base_y": random.uniform(0.1, 0.5),
-                }
+        slots = self.free_slots(self.particles_per_waste)  # Add multiple particles for each waste
+        for slot in slots:
+            angle = self.rng.uniform(0, 360)
+            radius = self.rng.uniform(0, self.scale * 0.3)
+            self.particles[slot] = (
+                math.cos(math.radians(angle)) * radius,  # x
+                2.0,  # y: start above water
+                math.sin(math.radians(angle)) * radius,  # z
+                self.rng.uniform(0.8, 1.2),  # size
+                (
+                    self.rng.uniform(0.3, 0.5),
+                    self.rng.uniform(0.15, 0.25),
+                    0.0,
+                ),  # color
+                radius,
+                self.rng.uniform(0, 360),  # offset
+                self.rng.uniform(0.1, 0.5),  # base_y
             )
+            self.alive[slot] = True
 
         self.water_level = min(1.0, self.water_level + 0.1)
         if self.water_level > 0.8:
@@ -79,24 +154,38 @@ class Toilet:
             self.flush_progress = 0.0
 
     def draw(self):
+        if self.base_list is None:
+            self.compile_static_geometry()
+
         glPushMatrix()
         glTranslatef(self.position[0], self.position[1], self.position[2])
 
-        # Draw base pedestal
-        self.draw_pedestal()
-
-        # Draw main bowl
-        glColor3f(*self.porcelain_color)
-        self.draw_bowl()
+        # Draw base pedestal and main bowl
+        glCallList(self.base_list)
 
         # Draw water
         self.draw_water()
 
         # Draw tank
-        self.draw_tank()
+        glCallList(self.tank_list)
 
         glPopMatrix()
 
+    def compile_static_geometry(self):
+        """Record the pedestal, bowl and tank once; they never change."""
+        self.base_list = glGenLists(2)
+        self.tank_list = self.base_list + 1
+
+        glNewList(self.base_list, GL_COMPILE)
+        self.draw_pedestal()
+        glColor3f(*self.porcelain_color)
+        self.draw_bowl()
+        glEndList()
+
+        glNewList(self.tank_list, GL_COMPILE)
+        self.draw_tank()
+        glEndList()
+
     def draw_pedestal(self):
         glColor3f(*self.porcelain_color)
         glPushMatrix()
@@ -144,16 +233,11 @@ class Toilet:
         glTranslatef(0, self.scale * 0.3, 0)  # Move up to top of pedestal
 
         # Bowl is oval-shaped and tapered
-        segments = 32
         height = self.scale * 0.4
 
         # Draw outer surface
         glBegin(GL_QUAD_STRIP)
-        for i in range(segments + 1):
-            angle = (2.0 * math.pi * i) / segments
-            x = math.cos(angle)
-            z = math.sin(angle)
-
+        for x, z in zip(RING_COS, RING_SIN):
             # Bottom vertex (wider)
             glVertex3f(x * self.scale * 0.7, 0, z * self.scale * 0.6)
             # Top vertex (narrower)
@@ -164,11 +248,8 @@ class Toilet:
         glColor3f(0.9, 0.9, 0.9)
         glBegin(GL_TRIANGLE_FAN)
         glVertex3f(0, height * 0.7, 0)  # Center point
-        for i in range(segments + 1):
-            angle = (2.0 * math.pi * i) / segments
-            x = math.cos(angle) * self.scale * 0.55
-            z = math.sin(angle) * self.scale * 0.45
-            glVertex3f(x, height, z)
+        for x, z in zip(RING_COS, RING_SIN):
+            glVertex3f(x * self.scale * 0.55, height, z * self.scale * 0.45)
         glEnd()
 
         glPopMatrix()
@@ -185,63 +266,61 @@ class Toilet:
         glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
 
         # Draw water surface with swirl effect
-        segments = 32
         if self.is_flushing:
             glRotatef(self.flush_rotation, 0, 1, 0)
 
+        glEnableClientState(GL_VERTEX_ARRAY)
+
         # Draw main water surface
         glColor4f(*self.water_color)
-        glBegin(GL_TRIANGLE_FAN)
-        glVertex3f(0, 0, 0)  # Center
-
-        for i in range(segments + 1):
-            angle = (2.0 * math.pi * i) / segments
-            x = math.cos(angle) * self.scale * 0.45
-            z = math.sin(angle) * self.scale * 0.35
-
-            # Add wave effect
-            if self.is_flushing:
-                wave = math.sin(angle * 4 + self.flush_rotation * 0.1) * 0.5
-                x *= 1.0 + wave * 0.1
-                z *= 1.0 + wave * 0.1
-
-            glVertex3f(x, 0, z)
-        glEnd()
-
-        # Draw waste particles
-        for particle in self.waste_particles:
-            glPushMatrix()
-            glTranslatef(particle["x"], -particle["y"], particle["z"])
-
-            glColor3f(*particle["color"])
-
-            # Draw waste particle as a small sphere
-            sphere_segments = 8
-            size = particle["size"] * self.scale * 0.05
-
-            glBegin(GL_TRIANGLE_FAN)
-            glVertex3f(0, size, 0)  # Top vertex
-            for i in range(sphere_segments + 1):
-                angle = (2.0 * math.pi * i) / sphere_segments
-                x = math.cos(angle) * size
-                z = math.sin(angle) * size
-                glVertex3f(x, 0, z)
-            glEnd()
-
-            glBegin(GL_TRIANGLE_FAN)
-            glVertex3f(0, -size, 0)  # Bottom vertex
-            for i in range(sphere_segments + 1):
-                angle = (2.0 * math.pi * i) / sphere_segments
-                x = math.cos(angle) * size
-                z = math.sin(angle) * size
-                glVertex3f(x, 0, z)
-            glEnd()
-
-            glPopMatrix()
-
+        surface = self.water_surface()
+        glVertexPointer(3, GL_FLOAT, 0, surface)
+        glDrawArrays(GL_TRIANGLE_FAN, 0, len(surface))
+
+        # Draw all waste particles in one call
+        vertices, colors = self.particle_arrays()
+        if len(vertices):
+            glEnableClientState(GL_COLOR_ARRAY)
+            glVertexPointer(3, GL_FLOAT, 0, vertices)
+            glColorPointer(3, GL_FLOAT, 0, colors)
+            glDrawArrays(GL_TRIANGLES, 0, len(vertices))
+            glDisableClientState(GL_COLOR_ARRAY)
+
+        glDisableClientState(GL_VERTEX_ARRAY)
         glDisable(GL_BLEND)
         glPopMatrix()
 
+    def water_surface(self):
+        """Triangle fan (center + ring) of the water surface, in water coordinates."""
+        x = RING_COS * self.scale * 0.45
+        z = RING_SIN * self.scale * 0.35
+
+        # Add wave effect
+        if self.is_flushing:
+            wave = np.sin(RING_ANGLES * 4 + self.flush_rotation * 0.1) * 0.5
+            x = x * (1.0 + wave * 0.1)
+            z = z * (1.0 + wave * 0.1)
+
+        surface = np.zeros((RING_SEGMENTS + 2, 3), dtype=np.float32)
+        surface[1:, 0] = x
+        surface[1:, 2] = z
+        return surface
+
+    def particle_arrays(self):
+        """Vertex and colour arrays (GL_TRIANGLES) for every waste particle."""
+        particles = self.particles[self.alive]
+        if len(particles) == 0:
+            return np.zeros((0, 3), dtype=np.float32), np.zeros((0, 3), dtype=np.float32)
+
+        centers = np.stack([particles["x"], -particles["y"], particles["z"]], axis=1)
+        sizes = particles["size"] * self.scale * 0.05
+        colors = particles["color"]
+
+        vertices = centers[:, None, :] + sizes[:, None, None] * PARTICLE_TEMPLATE[None]
+        vertices = vertices.reshape(-1, 3).astype(np.float32)
+        colors = np.repeat(colors, len(PARTICLE_TEMPLATE), axis=0)
+        return vertices, colors
+
     def draw_tank(self):
         glColor3f(*self.tank_color)
         glPushMatrix()
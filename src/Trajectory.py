@@ -0,0 +1,287 @@
+import random
+import numpy as np
+try:
+    import pygame
+except ImportError:  # recording works without a display
+    pass
+from Fleet import Fleet
+from Trash import Trash
+from StationRegistry import StationRegistry
+from FixedTimestep import FixedTimestep
+
+MAGIC = b"TRAJ0002"
+
+
+def header_dtype(n_trash, n_stations):
+    """File header: run shape, recorded step count and the (static) trash and station placement."""
+    return np.dtype([
+        ("magic", "S8"),
+        ("n_bots", "<i8"),
+        ("n_trash", "<i8"),
+        ("n_stations", "<i8"),
+        ("chunk_steps", "<i8"),
+        ("count", "<i8"),
+        ("dim", "<f8"),
+        ("trash_position", "<f4", (n_trash, 3)),
+        ("trash_rotation", "<f4", (n_trash,)),
+        ("station_position", "<f4", (n_stations, 3)),
+    ])
+
+
+def chunk_dtype(n_bots, n_trash, n_stations, chunk_steps):
+    """One chunk of `chunk_steps` steps, stored column by column.
+
+    `keyframe` is the packed is_collected bitmap at the chunk's first step;
+    `picked` holds, for every later step, the index of the burger each bot
+    collected on that step (-1 for none).
+    """
+    return np.dtype([
+        ("keyframe", "u1", ((n_trash + 7) // 8,)),
+        ("picked", "<i4", (chunk_steps, n_bots)),
+        ("position", "<f4", (chunk_steps, n_bots, 3)),
+        ("rotation", "<f4", (chunk_steps, n_bots)),
+        ("state", "u1", (chunk_steps, n_bots)),
+        ("fatness", "<f4", (chunk_steps, n_bots)),
+        ("leg_animation_phase", "<f4", (chunk_steps, n_bots)),
+        ("station", "<i2", (chunk_steps, n_bots)),
+        ("water_level", "<f4", (chunk_steps, n_stations)),
+    ])
+
+
+class TrajectoryRecorder:
+    """Writes every step of a run to a chunked, memory-mapped trajectory file.
+
+    Each step stores the bots' position, rotation, state, fatness, leg
+    phase and station, every toilet's water level and which burgers were
+    collected, as fixed-width columns. Chunks start with a keyframe of the
+    full is_collected bitmap, so any step is rebuilt from one keyframe and
+    at most `chunk_steps` small deltas. Read it back with TrajectoryReplay.
+    """
+
+    def __init__(self, path, fleet, trash_objects, stations, dim, chunk_steps=256):
+        self.fleet = fleet
+        self.trash_objects = trash_objects
+        self.stations = stations
+        self.n_bots = fleet.count
+        self.n_trash = len(trash_objects)
+        self.n_stations = len(stations)
+        self.chunk_steps = chunk_steps
+        self.dtype = chunk_dtype(self.n_bots, self.n_trash, self.n_stations, chunk_steps)
+        self.header_dtype = header_dtype(self.n_trash, self.n_stations)
+        self.count = 0
+        self.n_chunks = 0
+        self.chunks = None
+        self.collected = np.zeros(self.n_trash, dtype=bool)
+
+        self.file = open(path, "w+b")
+        self.file.truncate(self.header_dtype.itemsize)
+        self.header = np.memmap(self.file, dtype=self.header_dtype, mode="r+", shape=())
+        self.header["magic"] = MAGIC
+        self.header["n_bots"] = self.n_bots
+        self.header["n_trash"] = self.n_trash
+        self.header["n_stations"] = self.n_stations
+        self.header["chunk_steps"] = chunk_steps
+        self.header["count"] = 0
+        self.header["dim"] = dim
+        if self.n_trash:
+            self.header["trash_position"] = [trash.Position for trash in trash_objects]
+            self.header["trash_rotation"] = [trash.rotation for trash in trash_objects]
+        self.header["station_position"] = stations.positions
+
+    def _grow(self):
+        if self.chunks is not None:
+            self.chunks.flush()
+        self.n_chunks += 1
+        self.file.truncate(self.header_dtype.itemsize + self.n_chunks * self.dtype.itemsize)
+        self.chunks = np.memmap(
+            self.file, dtype=self.dtype, mode="r+",
+            offset=self.header_dtype.itemsize, shape=(self.n_chunks,),
+        )
+
+    def record(self):
+        """Append the current state of the fleet, trash and toilets as the next step."""
+        chunk, row = divmod(self.count, self.chunk_steps)
+        if chunk == self.n_chunks:
+            self._grow()
+        block = self.chunks[chunk]
+
+        collected = np.fromiter(
+            (trash.is_collected for trash in self.trash_objects), dtype=bool, count=self.n_trash
+        )
+        picked = block["picked"][row]
+        picked[:] = -1
+        if row == 0:
+            block["keyframe"] = np.packbits(collected)
+        else:
+            # A bot claims at most one burger per step
+            new = np.flatnonzero(collected & ~self.collected)
+            picked[:len(new)] = new
+        self.collected = collected
+
+        n = self.n_bots
+        block["position"][row] = self.fleet.position[:n]
+        block["rotation"][row] = self.fleet.rotation[:n]
+        block["state"][row] = self.fleet.state[:n]
+        block["fatness"][row] = self.fleet.fatness[:n]
+        block["leg_animation_phase"][row] = self.fleet.leg_animation_phase[:n]
+        block["station"][row] = self.fleet.station[:n]
+        block["water_level"][row] = [toilet.water_level for toilet in self.stations]
+
+        self.count += 1
+        self.header["count"] = self.count
+
+    def close(self):
+        """Flush everything to disk; the file stays readable even without this."""
+        if self.file.closed:
+            return
+        if self.chunks is not None:
+            self.chunks.flush()
+        self.header.flush()
+        self.chunks = None
+        self.header = None
+        self.file.close()
+
+
+class TrajectoryReplay:
+    """Random access to a trajectory file written by TrajectoryRecorder.
+
+    The file is memory-mapped read-only, so opening even a long recording
+    is instant and only the pages of the steps looked at are read.
+    """
+
+    def __init__(self, path):
+        prefix = np.fromfile(path, dtype=header_dtype(0, 0), count=1)[0]
+        if prefix["magic"] != MAGIC:
+            raise ValueError(f"{path} is not a trajectory file")
+        self.n_bots = int(prefix["n_bots"])
+        self.n_trash = int(prefix["n_trash"])
+        self.n_stations = int(prefix["n_stations"])
+        self.chunk_steps = int(prefix["chunk_steps"])
+        self.count = int(prefix["count"])
+        self.dim = float(prefix["dim"])
+
+        dtype = header_dtype(self.n_trash, self.n_stations)
+        self.header = np.fromfile(path, dtype=dtype, count=1)[0]
+        n_chunks = -(-self.count // self.chunk_steps)
+        self.chunks = np.memmap(
+            path, dtype=chunk_dtype(self.n_bots, self.n_trash, self.n_stations, self.chunk_steps),
+            mode="r",
+            offset=dtype.itemsize, shape=(n_chunks,),
+        ) if n_chunks else None
+
+    def __len__(self):
+        return self.count
+
+    def locate(self, step):
+        """(chunk, row) holding `step`."""
+        return divmod(step, self.chunk_steps)
+
+    def collected(self, step):
+        """is_collected of every burger at `step`: its chunk's keyframe plus the deltas since."""
+        chunk, row = self.locate(step)
+        block = self.chunks[chunk]
+        collected = np.unpackbits(block["keyframe"], count=self.n_trash).astype(bool)
+        picked = block["picked"][1:row + 1].ravel()
+        collected[picked[picked >= 0]] = True
+        return collected
+
+    def build_scene(self):
+        """Fleet, trash and stations to draw the recording with (see apply)."""
+        stations = StationRegistry.at(self.header["station_position"][:, [0, 2]])
+        fleet = Fleet(capacity=self.n_bots, stations=stations)
+        for _ in range(self.n_bots):
+            fleet.add([0.0, 0.0, 0.0], map_limit=self.dim)
+        trash_objects = []
+        for position, rotation in zip(self.header["trash_position"], self.header["trash_rotation"]):
+            trash = Trash(self.dim, rng=random.Random(0))
+            trash.Position = [float(v) for v in position]
+            trash.rotation = float(rotation)
+            trash_objects.append(trash)
+        return fleet, trash_objects, stations
+
+    def apply(self, step, fleet, trash_objects, stations):
+        """Load the recorded state of `step` into objects made by build_scene."""
+        chunk, row = self.locate(step)
+        block = self.chunks[chunk]
+        n = self.n_bots
+        fleet.position[:n] = block["position"][row]
+        fleet.rotation[:n] = block["rotation"][row]
+        fleet.state[:n] = block["state"][row]
+        fleet.fatness[:n] = block["fatness"][row]
+        fleet.leg_animation_phase[:n] = block["leg_animation_phase"][row]
+        fleet.station[:n] = block["station"][row]
+        for trash, collected in zip(trash_objects, self.collected(step)):
+            trash.is_collected = bool(collected)
+        for toilet, water_level in zip(stations, block["water_level"][row]):
+            toilet.water_level = float(water_level)
+
+
+class ReplayControls:
+    """Transport for a replay window: play/pause, stepping, seeking and scrubbing.
+
+    Space plays/pauses, Left/Right step one frame, Up/Down jump one second,
+    Page Up/Down ten seconds, Home/End go to the ends, 1-4 pick the playback
+    speed and dragging with the left mouse button scrubs across the run.
+    """
+
+    def __init__(self, n_steps, width, step_rate=60):
+        self.n_steps = n_steps
+        self.width = width
+        self.step_rate = step_rate
+        self.step = 0
+        self.playing = True
+        self.scrubbing = False
+        self.timestep = FixedTimestep(step_rate=step_rate)
+        self.speed_keys = dict(zip(
+            (pygame.K_1, pygame.K_2, pygame.K_3, pygame.K_4), FixedTimestep.SPEEDS
+        ))
+        self.seek_keys = {
+            pygame.K_LEFT: -1,
+            pygame.K_RIGHT: 1,
+            pygame.K_DOWN: -step_rate,
+            pygame.K_UP: step_rate,
+            pygame.K_PAGEDOWN: -10 * step_rate,
+            pygame.K_PAGEUP: 10 * step_rate,
+        }
+
+    def seek(self, step):
+        self.step = min(max(int(step), 0), max(self.n_steps - 1, 0))
+
+    def scrub(self, x):
+        self.seek(x / max(self.width - 1, 1) * (self.n_steps - 1))
+
+    def handle(self, event):
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_SPACE:
+                self.playing = not self.playing
+            elif event.key in self.seek_keys:
+                self.seek(self.step + self.seek_keys[event.key])
+            elif event.key == pygame.K_HOME:
+                self.seek(0)
+            elif event.key == pygame.K_END:
+                self.seek(self.n_steps - 1)
+            elif event.key in self.speed_keys:
+                self.timestep.set_speed(self.speed_keys[event.key])
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            self.scrubbing = True
+            self.scrub(event.pos[0])
+        elif event.type == pygame.MOUSEMOTION and self.scrubbing:
+            self.scrub(event.pos[0])
+        elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+            self.scrubbing = False
+
+    def advance(self):
+        """Move playback forward by the frames due now and return the step to show."""
+        def forward():
+            if self.step >= self.n_steps - 1:
+                return False
+            self.step += 1
+
+        if self.playing and not self.scrubbing:
+            self.timestep.advance(forward)
+        return self.step
+
+    @property
+    def caption(self):
+        status = "" if self.playing else " (paused)"
+        return f"Replay step {self.step}/{self.n_steps - 1} [{self.timestep.speed_label}]{status}"
@@ -1,10 +1,16 @@
 import numpy as np
-from OpenGL.GL import *
+try:
+    from OpenGL.GL import *
+except ImportError:  # headless runs don't need OpenGL
+    pass
 import random
 import math
 
 class Trash:
-    def __init__(self, dim):
+    # Shared burger mesh, compiled into a display list on first draw
+    display_list = None
+
+    def __init__(self, dim, rng=random):
         # Vertices of the cube (burger)
         size = 4.0  # Doubled base size of the burger
         self.points = np.array([
@@ -22,13 +28,18 @@ class Trash:
         # Use a smaller area for trash distribution
         usable_area = dim * 0.8
         # Initialize random position on the board
+        # rng: the simulation's own random.Random (defaults to the global module)
         self.Position = [
-            random.uniform(-usable_area, usable_area),
+            rng.uniform(-usable_area, usable_area),
             0.0,  # On the ground
-            random.uniform(-usable_area, usable_area),
+            rng.uniform(-usable_area, usable_area),
         ]
         self.is_collected = False
-        self.rotation = random.uniform(0, 360)  # Random rotation for variety
+        # Steps it appeared, was picked up and landed in a toilet (None: not yet)
+        self.spawn_step = 0
+        self.picked_step = None
+        self.delivered_step = None
+        self.rotation = rng.uniform(0, 360)  # Random rotation for variety
 
         # Colors for different burger parts
         self.bun_color = (0.85, 0.65, 0.30)      # Light brown for bun
@@ -52,38 +63,71 @@ class Trash:
             glPushMatrix()
             glTranslatef(self.Position[0], self.Position[1], self.Position[2])
             glRotatef(self.rotation, 0, 1, 0)  # Rotate around Y axis
-            
-            total_height = self.points[4][1]  # Height of the burger
-            
-            # Draw bottom bun
-            glColor3f(*self.bun_color)
-            self.draw_layer(0, self.layer_heights[1], True)  # Rounded bottom
-            
-            # Draw patty
-            glColor3f(*self.patty_color)
-            self.draw_layer(self.layer_heights[1], self.layer_heights[2])
-            
-            # Draw cheese
-            glColor3f(*self.cheese_color)
-            self.draw_layer(self.layer_heights[2], self.layer_heights[3])
-            
-            # Draw tomato
-            glColor3f(*self.tomato_color)
-            self.draw_layer(self.layer_heights[3], self.layer_heights[4])
-            
-            # Draw lettuce
-            glColor3f(*self.lettuce_color)
-            self.draw_layer(self.layer_heights[4], self.layer_heights[5])
-            
-            # Draw top bun
-            glColor3f(*self.bun_color)
-            self.draw_layer(self.layer_heights[4], self.layer_heights[5], True)  # Rounded top
-            
-            # Draw sesame seeds on top bun
-            self.draw_sesame_seeds()
-            
+            glCallList(self.mesh_list())
+            glPopMatrix()
+
+    @staticmethod
+    def draw_many(trash_objects):
+        """Draw every burger in `trash_objects` (pass only uncollected ones, e.g. a TrashGrid)."""
+        display_list = None
+        for trash in trash_objects:
+            if display_list is None:
+                display_list = trash.mesh_list()
+            glPushMatrix()
+            glTranslatef(trash.Position[0], trash.Position[1], trash.Position[2])
+            glRotatef(trash.rotation, 0, 1, 0)
+            glCallList(display_list)
             glPopMatrix()
 
+    def draw_copies(self, xz, rotations):
+        """Draw this burger's mesh on the ground at every (x, z) of `xz`, turned by `rotations`."""
+        display_list = self.mesh_list()
+        for (x, z), rotation in zip(np.asarray(xz).tolist(), np.asarray(rotations).tolist()):
+            glPushMatrix()
+            glTranslatef(x, 0.0, z)
+            glRotatef(rotation, 0, 1, 0)
+            glCallList(display_list)
+            glPopMatrix()
+
+    def mesh_list(self):
+        """Display list with the burger mesh, compiled on first use (needs a GL context)."""
+        # Every burger has the same geometry and colours, so one list is shared
+        if Trash.display_list is None:
+            Trash.display_list = glGenLists(1)
+            glNewList(Trash.display_list, GL_COMPILE)
+            self.draw_mesh()
+            glEndList()
+        return Trash.display_list
+
+    def draw_mesh(self):
+        """Issue the whole burger in immediate mode, in model coordinates."""
+        # Draw bottom bun
+        glColor3f(*self.bun_color)
+        self.draw_layer(0, self.layer_heights[1], True)  # Rounded bottom
+
+        # Draw patty
+        glColor3f(*self.patty_color)
+        self.draw_layer(self.layer_heights[1], self.layer_heights[2])
+
+        # Draw cheese
+        glColor3f(*self.cheese_color)
+        self.draw_layer(self.layer_heights[2], self.layer_heights[3])
+
+        # Draw tomato
+        glColor3f(*self.tomato_color)
+        self.draw_layer(self.layer_heights[3], self.layer_heights[4])
+
+        # Draw lettuce
+        glColor3f(*self.lettuce_color)
+        self.draw_layer(self.layer_heights[4], self.layer_heights[5])
+
+        # Draw top bun
+        glColor3f(*self.bun_color)
+        self.draw_layer(self.layer_heights[4], self.layer_heights[5], True)  # Rounded top
+
+        # Draw sesame seeds on top bun
+        self.draw_sesame_seeds()
+
     def draw_layer(self, start_height, end_height, is_bun=False):
         size = self.points[1][0]  # Size of the burger (x-coordinate of right side)
         height = self.points[4][1]  # Total height
@@ -0,0 +1,169 @@
+import math
+import numpy as np
+
+# Cell coordinates are packed into one int64 key for vectorized lookups
+KEY_OFFSET = 2 ** 30
+
+
+def sweep_entry(x0, z0, x1, z1, tx, tz, reach):
+    """How far (0-1) along (x0, z0)-(x1, z1) the ±reach box around (tx, tz) is first touched.
+
+    None if the segment never comes within reach. A segment of length
+    zero is the plain box test around a point.
+    """
+    enter, leave = 0.0, 1.0
+    for start, end, spot in ((x0, x1, tx), (z0, z1, tz)):
+        step = end - start
+        if step == 0:
+            if abs(start - spot) > reach:
+                return None
+            continue
+        a = (spot - reach - start) / step
+        b = (spot + reach - start) / step
+        enter = max(enter, min(a, b))
+        leave = min(leave, max(a, b))
+    return enter if enter <= leave else None
+
+
+class TrashGrid:
+    """Uniform grid over the board that indexes uncollected trash by X/Z cell.
+
+    Bots only look at the cells around them instead of scanning every
+    burger, and collected trash is removed so it is never visited again.
+    """
+
+    def __init__(self, cell_size=10.0, trash_objects=()):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.count = 0
+        self._keys = None  # sorted packed keys of non-empty cells, rebuilt lazily
+        self._flat = None  # (trash list, X/Z array) of all trash, rebuilt lazily
+        for trash in trash_objects:
+            if not trash.is_collected:
+                self.add(trash)
+
+    def cell_of(self, x, z):
+        return (math.floor(x / self.cell_size), math.floor(z / self.cell_size))
+
+    def add(self, trash):
+        key = self.cell_of(trash.Position[0], trash.Position[2])
+        self.cells.setdefault(key, []).append(trash)
+        self.count += 1
+        self._keys = None
+        self._flat = None
+
+    def remove(self, trash):
+        key = self.cell_of(trash.Position[0], trash.Position[2])
+        cell = self.cells.get(key)
+        if cell is None or trash not in cell:
+            return
+        cell.remove(trash)
+        if not cell:
+            del self.cells[key]
+            self._keys = None
+        self.count -= 1
+        self._flat = None
+
+    def nearby(self, x, z, radius):
+        """Trash in every cell touched by the square of half-size `radius` around (x, z)."""
+        return self.within(x - radius, z - radius, x + radius, z + radius)
+
+    def within(self, min_x, min_z, max_x, max_z):
+        """Trash in every cell touched by the X/Z rectangle (min_x, min_z)-(max_x, max_z)."""
+        min_cx, min_cz = self.cell_of(min_x, min_z)
+        max_cx, max_cz = self.cell_of(max_x, max_z)
+        found = []
+        for cx in range(min_cx, max_cx + 1):
+            for cz in range(min_cz, max_cz + 1):
+                cell = self.cells.get((cx, cz))
+                if cell:
+                    found.extend(cell)
+        return found
+
+    def claim_along(self, x0, z0, x1, z1, reach):
+        """Collect the first trash a bot touches moving from (x0, z0) to (x1, z1).
+
+        The bot's ±reach box is swept along the whole segment, so nothing is
+        jumped over however far it moves in one step; of the burgers touched
+        at the same point the closest wins. Returns (trash, x, z) with the
+        point where the bot reached it, or None.
+        """
+        closest = None
+        for trash in self.within(
+            min(x0, x1) - reach, min(z0, z1) - reach, max(x0, x1) + reach, max(z0, z1) + reach,
+        ):
+            tx, tz = trash.Position[0], trash.Position[2]
+            entry = sweep_entry(x0, z0, x1, z1, tx, tz, reach)
+            if entry is None:
+                continue
+            x = x0 + entry * (x1 - x0)
+            z = z0 + entry * (z1 - z0)
+            dx = x - tx
+            dz = z - tz
+            key = (entry, dx * dx + dz * dz)
+            if closest is None or key < closest[0]:
+                closest = (key, trash, x, z)
+
+        if closest is None:
+            return None
+        _, trash, x, z = closest
+        trash.is_collected = True
+        self.remove(trash)
+        return trash, x, z
+
+    def occupied_near(self, xs, zs, radius):
+        """Boolean mask over the points (xs, zs): True where a nearby cell holds trash.
+
+        Vectorized pre-filter for whole fleets; a True entry still needs a
+        claim_along() to check the actual distance.
+        """
+        if self._keys is None:
+            self._keys = np.sort(np.array(
+                [self.pack(cx, cz) for cx, cz in self.cells], dtype=np.int64
+            ))
+        mask = np.zeros(len(xs), dtype=bool)
+        if not len(self._keys):
+            return mask
+
+        min_cx = np.floor((xs - radius) / self.cell_size).astype(np.int64)
+        min_cz = np.floor((zs - radius) / self.cell_size).astype(np.int64)
+        max_cx = np.floor((xs + radius) / self.cell_size).astype(np.int64)
+        max_cz = np.floor((zs + radius) / self.cell_size).astype(np.int64)
+        span = int(math.ceil(2 * radius / self.cell_size)) + 1
+        last = len(self._keys) - 1
+        for ox in range(span):
+            cx = np.minimum(min_cx + ox, max_cx)
+            for oz in range(span):
+                cz = np.minimum(min_cz + oz, max_cz)
+                # Binary search in the sorted keys; cheaper than np.isin, which
+                # hashes every occupied cell again on each call
+                keys = self.pack(cx, cz)
+                found = np.minimum(np.searchsorted(self._keys, keys), last)
+                mask |= self._keys[found] == keys
+        return mask
+
+    def flat(self):
+        """Every uncollected trash as (list, (n, 2) array of X/Z positions).
+
+        For whole-board queries, like finding each bot's nearest burger,
+        that are cheaper as one array operation than as a walk over cells.
+        """
+        if self._flat is None:
+            items = list(self)
+            xz = np.array(
+                [(trash.Position[0], trash.Position[2]) for trash in items], dtype=np.float64
+            ).reshape(-1, 2)
+            self._flat = (items, xz)
+        return self._flat
+
+    @staticmethod
+    def pack(cx, cz):
+        return ((cx + KEY_OFFSET) << 32) | (cz + KEY_OFFSET)
+
+    def __iter__(self):
+        """Iterate over every uncollected trash in the grid."""
+        for cell in self.cells.values():
+            yield from cell
+
+    def __len__(self):
+        return self.count
@@ -0,0 +1,109 @@
+import math
+import numpy as np
+from Trash import Trash
+
+
+class PoissonArrivals:
+    """Burgers dropped on the board at random, `rate` per step on average.
+
+    Arrival times follow a Poisson process: the gaps between them are
+    exponential, drawn from `rng` (a random.Random). A burger arriving at
+    time T spawns at the step after it, at a random spot on the board.
+    """
+
+    exhausted = False
+
+    def __init__(self, rate, rng):
+        if rate <= 0:
+            raise ValueError(f"arrival rate must be positive, got {rate}")
+        self.rate = rate
+        self.rng = rng
+        self.next_time = rng.expovariate(rate)
+
+    def next_step(self):
+        """Step at which the next burger spawns."""
+        return math.floor(self.next_time) + 1
+
+    def spawn(self, step, dim):
+        """The burgers spawning at `step`."""
+        spawned = []
+        while self.next_step() <= step:
+            spawned.append(Trash(dim, rng=self.rng))
+            self.next_time += self.rng.expovariate(self.rate)
+        return spawned
+
+
+class TraceArrivals:
+    """Burgers dropped on the board as listed in a trace.
+
+    Each entry is a spawn step, or (step, x, z) to also fix where the
+    burger lands; burgers without a position land at random spots drawn
+    from `rng`. A fractional step is rounded up to the next whole one. `trace` is a sequence of entries or the path of a text
+    file with one entry per line (comma-separated columns, '#' comments).
+    """
+
+    def __init__(self, trace, rng):
+        if isinstance(trace, str):
+            with open(trace) as f:
+                trace = [
+                    [float(value) for value in line.split(',')]
+                    for line in f if line.strip() and not line.strip().startswith('#')
+                ]
+        entries = [tuple(entry) if np.ndim(entry) else (entry,) for entry in trace]
+        entries = [(math.ceil(entry[0]),) + entry[1:] for entry in entries]
+        self.entries = sorted(entries, key=lambda entry: entry[0])
+        self.rng = rng
+        self.index = 0
+
+    @property
+    def exhausted(self):
+        """True once every burger in the trace has spawned."""
+        return self.index >= len(self.entries)
+
+    def next_step(self):
+        if self.exhausted:
+            return math.inf
+        return self.entries[self.index][0]
+
+    def spawn(self, step, dim):
+        spawned = []
+        while not self.exhausted and self.entries[self.index][0] <= step:
+            entry = self.entries[self.index]
+            trash = Trash(dim, rng=self.rng)
+            if len(entry) == 3:
+                trash.Position[0] = float(entry[1])
+                trash.Position[2] = float(entry[2])
+            spawned.append(trash)
+            self.index += 1
+        return spawned
+
+
+def make_arrivals(rate=None, trace=None, rng=None):
+    """Arrival workload for a run: Poisson at `rate` per step, a `trace`, or None."""
+    if rate is not None and trace is not None:
+        raise ValueError("give either an arrival rate or an arrival trace, not both")
+    if rate is not None:
+        return PoissonArrivals(rate, rng)
+    if trace is not None:
+        return TraceArrivals(trace, rng)
+    return None
+
+
+def latency_percentiles(trash_objects, field, since=None, now=None):
+    """p50/p95/p99 steps from spawning to `field` ('picked_step' or 'delivered_step').
+
+    Only burgers that got that far count, unless the run's current step
+    `now` is given: then a burger still waiting counts as `now - spawn_step`,
+    a lower bound on its latency. With `since`, only burgers spawned after
+    that step count. None if no burger counts.
+    """
+    latency = np.array([
+        (now if getattr(trash, field) is None else getattr(trash, field)) - trash.spawn_step
+        for trash in trash_objects
+        if (since is None or trash.spawn_step > since)
+        and (now is not None or getattr(trash, field) is not None)
+    ])
+    if not latency.size:
+        return None
+    p50, p95, p99 = np.percentile(latency, (50, 95, 99))
+    return {'p50': float(p50), 'p95': float(p95), 'p99': float(p99)}
@@ -0,0 +1,421 @@
+import os
+# Without a display the draw() paths run against an offscreen EGL context;
+# PyOpenGL picks its platform on first import, so this has to come first
+if not (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY")):
+    os.environ.setdefault("PYOPENGL_PLATFORM", "egl")
+    os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+
+import argparse
+import fnmatch
+import json
+import math
+import platform
+import random
+import statistics
+import sys
+import time
+import numpy as np
+try:
+    from OpenGL.GL import glFinish
+except ImportError:  # the draw benchmarks are skipped without OpenGL
+    pass
+from CleaningBot import CleaningBot
+from Fleet import Fleet, RETURNING
+from FleetRenderer import FleetRenderer
+from HeadlessEngine import HeadlessEngine
+from Toilet import Toilet
+from StationRegistry import StationRegistry
+from Trash import Trash
+from TrashGrid import TrashGrid
+from model import ENGINE_VERSION
+
+# Scaling grids: the quick one runs in about a minute, the full one
+# (100k bots, 1M burgers) takes a while and several GB of memory
+QUICK_BOTS = (5, 100, 1000)
+QUICK_TRASH = (20, 1000, 10000)
+FULL_BOTS = (5, 100, 1000, 10000, 100000)
+FULL_TRASH = (20, 1000, 10000, 100000, 1000000)
+
+# Ratios to the baseline above this count as regressions
+DEFAULT_THRESHOLD = 1.25
+
+
+def board_size(n_bots, n_trash):
+    """Board half-size for a scene, grown with it so bots and trash keep some room."""
+    return max(200.0, 20.0 * math.sqrt(n_bots + n_trash))
+
+
+class Scene:
+    """Bots, trash and toilet of one (n_bots, n_trash) point, built like CleaningSimulation.setup."""
+
+    def __init__(self, n_bots, n_trash, seed=0):
+        rng = random.Random(seed)
+        self.n_bots = n_bots
+        self.n_trash = n_trash
+        self.dim = board_size(n_bots, n_trash)
+        self.toilet = Toilet(rng=rng)
+        self.stations = StationRegistry([self.toilet])
+        self.trash_objects = [Trash(self.dim, rng=rng) for _ in range(n_trash)]
+        self.trash_grid = TrashGrid(cell_size=10.0, trash_objects=self.trash_objects)
+        self.fleet = Fleet(capacity=n_bots, stations=self.stations)
+        self.bots = [
+            CleaningBot(
+                self.dim, bot_index=i, total_bots=n_bots, map_limit=self.dim, fleet=self.fleet,
+            )
+            for i in range(n_bots)
+        ]
+        self.start_position = self.fleet.position[:n_bots].copy()
+        self.renderer = FleetRenderer(self.fleet)
+
+    def reset(self):
+        """Put every bot back on its spawn point, searching and empty, and every burger back on the board."""
+        n = self.n_bots
+        self.fleet.position[:n] = self.start_position
+        self.fleet.resume_position[:n] = self.start_position
+        self.fleet.state[:n] = 0
+        self.fleet.rotation[:n] = 0.0
+        self.fleet.lane_done[:n] = self.fleet.lane_max[:n] < self.fleet.lane_min[:n]
+        self.fleet.lawnmower_direction[:n] = 1
+        self.fleet.load[:n] = 0
+        self.fleet.cargo_age[:n] = 0
+        for i in range(n):
+            self.fleet.cargo[i] = []
+        if len(self.trash_grid) < self.n_trash:
+            for trash in self.trash_objects:
+                trash.is_collected = False
+            self.trash_grid = TrashGrid(cell_size=10.0, trash_objects=self.trash_objects)
+
+    def scatter(self, state):
+        """Spread the bots over the board in `state` (e.g. returning from far away)."""
+        n = self.n_bots
+        rng = np.random.default_rng(0)
+        self.fleet.position[:n, 0] = rng.uniform(-self.dim, self.dim, n)
+        self.fleet.position[:n, 2] = rng.uniform(-self.dim, self.dim, n)
+        self.fleet.state[:n] = state
+
+
+def measure(fn, setup=None, repeat=5, min_time=0.05):
+    """Seconds per call of fn(): the median and min of `repeat` samples.
+
+    Each sample calls fn() enough times to last about `min_time`, after
+    running `setup` (untimed), so short calls aren't lost in timer noise.
+    """
+    if setup is not None:
+        setup()
+    start = time.perf_counter()
+    fn()
+    single = time.perf_counter() - start
+    number = max(1, int(min_time / max(single, 1e-9)))
+
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return {
+        "median_s": statistics.median(samples),
+        "min_s": min(samples),
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+# Each benchmark: name -> (axes it scales with, needs GL, bench(scene) -> (fn, setup))
+
+def bench_bot_update(scene):
+    def fn():
+        for bot in scene.bots:
+            bot.update(scene.trash_grid)
+    return fn, scene.reset
+
+
+def bench_fleet_step(scene):
+    return (lambda: scene.fleet.step(scene.trash_grid)), scene.reset
+
+
+def bench_bot_check_trash_collision(scene):
+    def fn():
+        for bot in scene.bots:
+            bot.check_trash_collision(scene.trash_grid)
+    return fn, scene.reset
+
+
+def bench_fleet_check_trash_collision(scene):
+    idx = np.arange(scene.n_bots)
+    return (lambda: scene.fleet.check_trash_collision(idx, scene.trash_grid)), scene.reset
+
+
+def bench_bot_return_to_base(scene):
+    def fn():
+        for bot in scene.bots:
+            bot.return_to_base()
+    return fn, lambda: scene.scatter(RETURNING)
+
+
+def bench_fleet_return_to_base(scene):
+    idx = np.arange(scene.n_bots)
+    return (lambda: scene.fleet.return_to_base(idx)), lambda: scene.scatter(RETURNING)
+
+
+def bench_toilet_receive_waste(scene):
+    # One delivery per bot, as if the whole fleet dumped in the same step
+    def fn():
+        for _ in range(scene.n_bots):
+            scene.toilet.receive_waste()
+
+    def setup():
+        scene.toilet = Toilet(rng=random.Random(0))
+    return fn, setup
+
+
+def bench_toilet_update(scene):
+    # Settling the particles of one delivery per bot
+    def setup():
+        scene.toilet = Toilet(rng=random.Random(0))
+        for _ in range(scene.n_bots):
+            scene.toilet.receive_waste()
+        scene.toilet.is_flushing = False
+    return (lambda: scene.toilet.update()), setup
+
+
+def simulation_step(engine):
+    def bench(scene):
+        runs = {}
+
+        def setup():
+            parameters = {
+                'dim': scene.dim, 'n_bots': scene.n_bots, 'n_trash': scene.n_trash,
+                'engine': engine,
+            }
+            runs['engine'] = HeadlessEngine(parameters, seed=0)
+        return (lambda: runs['engine'].step()), setup
+    return bench
+
+
+def bench_bot_draw(scene):
+    def fn():
+        for bot in scene.bots:
+            bot.draw()
+        glFinish()
+    return fn, scene.reset
+
+
+def bench_fleet_renderer_draw(scene):
+    def fn():
+        scene.renderer.draw()
+        glFinish()
+    return fn, scene.reset
+
+
+def bench_trash_draw_many(scene):
+    def fn():
+        Trash.draw_many(scene.trash_grid)
+        glFinish()
+    return fn, scene.reset
+
+
+def bench_toilet_draw(scene):
+    def fn():
+        scene.toilet.draw()
+        glFinish()
+
+    def setup():
+        scene.toilet = Toilet(rng=random.Random(0))
+        for _ in range(scene.n_bots):
+            scene.toilet.receive_waste()
+    return fn, setup
+
+
+BENCHMARKS = {
+    "CleaningBot.update": (("bots", "trash"), False, bench_bot_update),
+    "Fleet.step": (("bots", "trash"), False, bench_fleet_step),
+    "CleaningBot.check_trash_collision": (("bots", "trash"), False, bench_bot_check_trash_collision),
+    "Fleet.check_trash_collision": (("bots", "trash"), False, bench_fleet_check_trash_collision),
+    "CleaningBot.return_to_base": (("bots",), False, bench_bot_return_to_base),
+    "Fleet.return_to_base": (("bots",), False, bench_fleet_return_to_base),
+    "Toilet.receive_waste": (("bots",), False, bench_toilet_receive_waste),
+    "Toilet.update": (("bots",), False, bench_toilet_update),
+    "CleaningSimulation.step[agents]": (("bots", "trash"), False, simulation_step('agents')),
+    "CleaningSimulation.step[fleet]": (("bots", "trash"), False, simulation_step('fleet')),
+    "CleaningBot.draw": (("bots",), True, bench_bot_draw),
+    "FleetRenderer.draw": (("bots",), True, bench_fleet_renderer_draw),
+    "Trash.draw_many": (("trash",), True, bench_trash_draw_many),
+    "Toilet.draw": (("bots",), True, bench_toilet_draw),
+}
+
+
+def offscreen_context(width=800, height=800):
+    """Make a GL context current without showing a window; returns None on success, else why not.
+
+    With a display this is a hidden pygame window; without one, an EGL
+    pbuffer (PYOPENGL_PLATFORM is set to 'egl' on import for that case).
+    """
+    try:
+        if os.environ.get("PYOPENGL_PLATFORM") == "egl":
+            import ctypes
+            from OpenGL import EGL
+            display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+            major, minor = EGL.EGLint(), EGL.EGLint()
+            if not EGL.eglInitialize(display, ctypes.pointer(major), ctypes.pointer(minor)):
+                return "eglInitialize failed"
+            attributes = (EGL.EGLint * 13)(
+                EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+                EGL.EGL_RED_SIZE, 8, EGL.EGL_GREEN_SIZE, 8, EGL.EGL_BLUE_SIZE, 8,
+                EGL.EGL_DEPTH_SIZE, 24, EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+                EGL.EGL_NONE,
+            )
+            config = EGL.EGLConfig()
+            n_configs = EGL.EGLint()
+            EGL.eglChooseConfig(display, attributes, ctypes.pointer(config), 1, ctypes.pointer(n_configs))
+            if not n_configs.value:
+                return "no EGL config with desktop OpenGL"
+            size = (EGL.EGLint * 5)(EGL.EGL_WIDTH, width, EGL.EGL_HEIGHT, height, EGL.EGL_NONE)
+            surface = EGL.eglCreatePbufferSurface(display, config, size)
+            EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+            context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT, None)
+            if not EGL.eglMakeCurrent(display, surface, surface, context):
+                return "eglMakeCurrent failed"
+        else:
+            import pygame
+            pygame.display.init()
+            pygame.display.set_mode((width, height), pygame.OPENGL | pygame.DOUBLEBUF | pygame.HIDDEN)
+    except Exception as error:  # any missing library or driver just skips the draw benchmarks
+        # EGLError keeps the EGL error code in .err; its str() is a long dump
+        return f"{type(error).__name__}: {getattr(error, 'err', error)}"
+    return None
+
+
+def run_benchmarks(bots=QUICK_BOTS, trash=QUICK_TRASH, only=None, repeat=5, min_time=0.05,
+                   draw=True, progress=print):
+    """Time every benchmark over the bots x trash grid and return the results document.
+
+    `only` is a list of fnmatch patterns on benchmark names. A benchmark
+    that doesn't scale with an axis only runs at that axis' smallest
+    value, so e.g. Toilet.update is not repeated for every trash count.
+    """
+    selected = {
+        name: spec for name, spec in BENCHMARKS.items()
+        if not only or any(fnmatch.fnmatchcase(name, pattern) for pattern in only)
+    }
+    gl_error = offscreen_context() if draw and any(spec[1] for spec in selected.values()) else None
+
+    results = []
+    skipped = {}
+    for n_bots in bots:
+        for n_trash in trash:
+            scene = None
+            for name, (axes, needs_gl, bench) in selected.items():
+                if "bots" not in axes and n_bots != bots[0]:
+                    continue
+                if "trash" not in axes and n_trash != trash[0]:
+                    continue
+                if needs_gl and (not draw or gl_error is not None):
+                    skipped[name] = gl_error or "draw benchmarks disabled"
+                    continue
+                if scene is None:
+                    scene = Scene(n_bots, n_trash)
+                fn, setup = bench(scene)
+                row = {"name": name, "bots": n_bots, "trash": n_trash}
+                row.update(measure(fn, setup, repeat=repeat, min_time=min_time))
+                results.append(row)
+                progress(f"{name:<36}{n_bots:>8}{n_trash:>9}  {row['median_s'] * 1000:10.3f} ms")
+
+    return {
+        "meta": {
+            "engine_version": ENGINE_VERSION,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeat": repeat,
+            "min_time": min_time,
+        },
+        "skipped": skipped,
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """Match results by (name, bots, trash) and return rows with their ratio to the baseline.
+
+    ratio = current median / baseline median, so above 1 is slower. Each
+    row's status is 'regression' above `threshold`, 'faster' below its
+    inverse and 'same' otherwise.
+    """
+    reference = {(r["name"], r["bots"], r["trash"]): r for r in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        base = reference.get((result["name"], result["bots"], result["trash"]))
+        if base is None:
+            continue
+        ratio = result["median_s"] / base["median_s"]
+        if ratio > threshold:
+            status = "regression"
+        elif ratio < 1 / threshold:
+            status = "faster"
+        else:
+            status = "same"
+        rows.append({
+            "name": result["name"],
+            "bots": result["bots"],
+            "trash": result["trash"],
+            "baseline_s": base["median_s"],
+            "median_s": result["median_s"],
+            "ratio": ratio,
+            "status": status,
+        })
+    return rows
+
+
+def parse_counts(text):
+    return tuple(int(float(value)) for value in text.split(","))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Time the simulation and rendering hot paths over bot/trash scaling grids."
+    )
+    parser.add_argument("--full", action="store_true",
+                        help="scale up to 100k bots and 1M burgers instead of the quick grid")
+    parser.add_argument("--bots", type=parse_counts, help="comma-separated bot counts, e.g. 5,100,1e4")
+    parser.add_argument("--trash", type=parse_counts, help="comma-separated trash counts")
+    parser.add_argument("--only", action="append",
+                        help="only run benchmarks matching this pattern (repeatable), e.g. 'Fleet.*'")
+    parser.add_argument("--no-draw", action="store_true", help="skip the draw() benchmarks")
+    parser.add_argument("--repeat", type=int, default=5, help="samples per measurement")
+    parser.add_argument("--min-time", type=float, default=0.05, help="seconds per sample")
+    parser.add_argument("--output", default="benchmark_results.json", help="where to write the results")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="slowdown ratio that counts as a regression")
+    args = parser.parse_args()
+
+    bots = args.bots or (FULL_BOTS if args.full else QUICK_BOTS)
+    trash = args.trash or (FULL_TRASH if args.full else QUICK_TRASH)
+    print(f"{'benchmark':<36}{'bots':>8}{'trash':>9}  {'median':>13}")
+    current = run_benchmarks(
+        bots, trash, only=args.only, repeat=args.repeat, min_time=args.min_time,
+        draw=not args.no_draw,
+    )
+    for name, reason in current["skipped"].items():
+        print(f"skipped {name}: {reason}")
+
+    regressions = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        current["comparison"] = compare(current, baseline, args.threshold)
+        print(f"\n{'benchmark':<36}{'bots':>8}{'trash':>9}  {'ratio':>7}")
+        for row in current["comparison"]:
+            print(f"{row['name']:<36}{row['bots']:>8}{row['trash']:>9}  {row['ratio']:7.2f}  {row['status']}")
+        regressions = sum(row["status"] == "regression" for row in current["comparison"])
+
+    with open(args.output, "w") as f:
+        json.dump(current, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    # Non-zero exit when anything got slower than the threshold, for CI
+    sys.exit(1 if regressions else 0)
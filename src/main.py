@@ -5,10 +5,17 @@ from OpenGL.GLU import *
 import numpy as np
 from CleaningBot import CleaningBot
 from Trash import Trash
-from Toilet import Toilet
+from StationRegistry import StationRegistry
+from TrashGrid import TrashGrid
+from Fleet import Fleet
+from FleetRenderer import FleetRenderer
+from FixedTimestep import FixedTimestep
+from Trajectory import TrajectoryReplay, ReplayControls
+from Profiler import Profiler
+from RenderProcess import RenderProcess, window_profile_path
 import os
 from PIL import Image
-import sys
+import argparse
 import random
 import math
 
@@ -49,9 +56,16 @@ TRASH_AREA = DimBoard * 0.8  # 80% of board size
 # Global variables
 bots = []
 trash_objects = []
-toilet = None
+trash_grid = TrashGrid(cell_size=10.0)
 n_bots = 5
 n_trash = 20
+# (x, z) of every dump station; returning bots go to the nearest one
+STATION_POSITIONS = [(0.0, 0.0)]
+stations = StationRegistry.at(STATION_POSITIONS)
+# Phase timings; P toggles them and O the on-screen table
+profiler = Profiler()
+fleet = Fleet(capacity=n_bots, profiler=profiler, stations=stations)
+fleet_renderer = None
 
 # Texture ID for bot face
 bot_face_texture = None
@@ -110,10 +124,13 @@ def Axis():
     glLineWidth(1.0)
 
 
-def Init():
-    """Initialize OpenGL context and objects"""
+def Init(replay):
+    """Initialize the OpenGL context and the objects of a recording to replay"""
     global bot_face_texture
-    global toilet
+    global stations
+    global fleet
+    global fleet_renderer
+    global DimBoard
     
     screen = pygame.display.set_mode((screen_width, screen_height), DOUBLEBUF | OPENGL)
     pygame.display.set_caption("Trash Cleaning Simulation")
@@ -142,81 +159,111 @@ def Init():
     open_texture_path = os.path.join(os.path.dirname(__file__), 'assets', 'open.jpg')
     bot_face_open_texture = load_texture(open_texture_path)
     
-    # Initialize bots and trash
+    # Everything comes from the recording; no bots are simulated
+    DimBoard = replay.dim
+    fleet, replayed_trash, stations = replay.build_scene()
+    trash_objects.extend(replayed_trash)
+    fleet_renderer = FleetRenderer(fleet, bot_face_texture, bot_face_open_texture)
+
+
+def create_scene():
+    """Create the bots and trash to simulate (the window process draws them)"""
     for i in range(n_bots):
-        bot = CleaningBot(DimBoard, i, n_bots, bot_face_texture, DimBoard)
-        bot.face_texture_open = bot_face_open_texture
-        bots.append(bot)
+        bots.append(CleaningBot(DimBoard, i, n_bots, None, DimBoard, fleet=fleet))
     for i in range(n_trash):
-        trash_objects.append(Trash(DimBoard))
-    
-    toilet = Toilet()
+        trash = Trash(DimBoard)
+        trash_objects.append(trash)
+        trash_grid.add(trash)
 
 
 def display():
     """Render the scene"""
     glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
-    # Draw coordinate axes
-    Axis()
-
-    # Draw floor
-    glColor3f(0.3, 0.3, 0.3)
-    glBegin(GL_QUADS)
-    glVertex3d(-DimBoard, 0, -DimBoard)
-    glVertex3d(-DimBoard, 0, DimBoard)
-    glVertex3d(DimBoard, 0, DimBoard)
-    glVertex3d(DimBoard, 0, -DimBoard)
-    glEnd()
-
-    # Draw base station
-    glColor3f(0.5, 0.5, 1.0)
-    glPushMatrix()
-    glTranslatef(0, 0, 0)
-    glScaled(10, 1, 10)
-    glBegin(GL_QUADS)
-    glVertex3d(-1, 0, -1)
-    glVertex3d(-1, 0, 1)
-    glVertex3d(1, 0, 1)
-    glVertex3d(1, 0, -1)
-    glEnd()
-    glPopMatrix()
-
-    # Draw toilet
-    toilet.draw()
-
-    # Draw and update all objects
-    for trash in trash_objects:
-        trash.draw()
-
-    for bot in bots:
-        bot.update(trash_objects)
-        bot.draw()
-
-
-def main():
-    """Main program loop"""
+    with profiler.scope("draw.board"):
+        # Draw coordinate axes
+        Axis()
+
+        # Draw floor
+        glColor3f(0.3, 0.3, 0.3)
+        glBegin(GL_QUADS)
+        glVertex3d(-DimBoard, 0, -DimBoard)
+        glVertex3d(-DimBoard, 0, DimBoard)
+        glVertex3d(DimBoard, 0, DimBoard)
+        glVertex3d(DimBoard, 0, -DimBoard)
+        glEnd()
+
+        # Draw base stations
+        glColor3f(0.5, 0.5, 1.0)
+        for x, _, z in stations.positions:
+            glPushMatrix()
+            glTranslatef(x, 0, z)
+            glScaled(10, 1, 10)
+            glBegin(GL_QUADS)
+            glVertex3d(-1, 0, -1)
+            glVertex3d(-1, 0, 1)
+            glVertex3d(1, 0, 1)
+            glVertex3d(1, 0, -1)
+            glEnd()
+            glPopMatrix()
+
+    # Draw toilets
+    with profiler.scope("draw.toilet"):
+        stations.draw()
+
+    # Draw all objects (the grid only holds uncollected trash)
+    with profiler.scope("draw.trash"):
+        Trash.draw_many(trash_grid)
+    with profiler.scope("draw.bots"):
+        fleet_renderer.draw()
+
+    profiler.draw_overlay()
+
+
+def simulate():
+    """Advance the simulation one fixed step"""
+    # Steps are counted from 1, as in CleaningSimulation; pickups and deliveries are stamped with it
+    fleet.now += 1
+    with profiler.scope("bots"):
+        for bot in bots:
+            bot.update(trash_grid)
+    with profiler.scope("toilet"):
+        stations.update()
+
+
+def show_step(replay, step):
+    """Load a recorded step into the scene drawn by display()"""
+    global trash_grid
+    replay.apply(step, fleet, trash_objects, stations)
+    trash_grid = TrashGrid(cell_size=10.0, trash_objects=trash_objects)
+
+
+def replay_main(path):
+    """Play back a trajectory file; nothing is simulated"""
+    replay = TrajectoryReplay(path)
     pygame.init()
-    Init()
+    Init(replay)
 
     clock = pygame.time.Clock()
+    controls = ReplayControls(len(replay), screen_width)
+    shown = None
     done = False
-
     while not done:
-        # Handle events
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 done = True
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    done = True
-                elif event.key == pygame.K_f:
-                    toilet.flush()  # Manual flush with 'F' key
-                elif event.key == pygame.K_t:
-                    # Create a new Trash object when 'T' is pressed
-                    new_trash = Trash(DimBoard)
-                    trash_objects.append(new_trash)
-        
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                done = True
+            else:
+                controls.handle(event)
+                if event.type == pygame.KEYDOWN:
+                    handle_profiler_key(event.key)
+
+        step = controls.advance()
+        if step != shown:
+            show_step(replay, step)
+            shown = step
+        pygame.display.set_caption(controls.caption)
         display()
 
         pygame.display.flip()
@@ -226,5 +273,63 @@ def main():
     pygame.quit()
 
 
+def handle_profiler_key(key):
+    """P starts/stops profiling, O shows/hides the phase table"""
+    if key == pygame.K_p:
+        profiler.toggle()
+    elif key == pygame.K_o:
+        profiler.overlay = not profiler.overlay
+
+
+def apply_requests(window):
+    """Carry out the F (flush) and T (new trash) presses sent by the window"""
+    flushes, burgers = window.take_requests()
+    for _ in range(flushes):
+        stations.flush()
+    for _ in range(burgers):
+        new_trash = Trash(DimBoard)
+        new_trash.spawn_step = fleet.now
+        trash_objects.append(new_trash)
+        trash_grid.add(new_trash)
+
+
+def main(profile_path=None):
+    """Main program loop; with profile_path, phases are timed and written there on exit
+
+    This process only simulates: the window runs in a process of its own
+    and draws the latest published frame (see RenderProcess), so a dragged
+    or minimized window never stalls the simulation.
+    """
+    create_scene()
+    if profile_path:
+        profiler.enabled = True
+
+    # Keys 1-4 in the window pick the simulation speed: 1x, 10x, 100x, max
+    timestep = FixedTimestep(step_rate=60)
+    window = RenderProcess(
+        fleet, trash_grid, stations, DimBoard, "Trash Cleaning Simulation",
+        axis_extent=X_MAX, station_pads=True, profiling=profiler.enabled,
+        profile_path=window_profile_path(profile_path),
+    )
+    try:
+        window.run(timestep, simulate, profiler, before_step=lambda: apply_requests(window))
+    finally:
+        window.close()
+
+    if profile_path and profiler.phases:
+        profiler.export(profile_path)
+
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Trash cleaning simulation")
+    parser.add_argument("--replay", metavar="FILE", help="play back a recorded trajectory file")
+    parser.add_argument(
+        "--profile", metavar="FILE",
+        help="time each phase and write the p50/p95/p99 table (.csv or .json) on exit; "
+             "the window's own phases go next to it as FILE.window.csv/.json",
+    )
+    args = parser.parse_args()
+    if args.replay:
+        replay_main(args.replay)
+    else:
+        main(args.profile)
@@ -1,55 +1,57 @@
 import agentpy as ap
-import pygame
-from pygame.locals import *
-from OpenGL.GL import *
-from OpenGL.GLU import *
+try:
+    import pygame
+    from pygame.locals import *
+    from OpenGL.GL import *
+    from OpenGL.GLU import *
+    from PIL import Image
+    import matplotlib.pyplot as plt
+except ImportError:  # headless runs don't need the renderer
+    pass
 from CleaningBot import CleaningBot
 from Trash import Trash
-from Toilet import Toilet
+from StationRegistry import StationRegistry, station_positions
+from TrashGrid import TrashGrid
+from Fleet import Fleet, STATE_NAMES
+from FleetRenderer import FleetRenderer
+from FixedTimestep import FixedTimestep
+from CollisionGrid import CollisionGrid
+from SimulationMetrics import SimulationMetrics
+from SearchStrategy import make_search
+from Workload import make_arrivals, latency_percentiles
+from RunningSeries import RunningSeries
+from StepLog import StepLog
+from Trajectory import TrajectoryRecorder, TrajectoryReplay, ReplayControls
+from Profiler import Profiler
+from RenderProcess import RenderProcess, window_profile_path
+import numpy as np
 import random
+import argparse
 import os
-from PIL import Image
 import time
-import matplotlib.pyplot as plt
+
+# Bump whenever a change alters simulation results; it is part of every
+# ResultCache key, so stale cached runs are never returned.
+ENGINE_VERSION = 12
 
 class CleaningBotAgent(ap.Agent):
     def setup(self):
         """Set up the CleaningBot agent."""
-        # Decide spawn corner & direction based on agent ID or any logic you like
-        if self.id < 3:
-            # Put 3 bots in bottom-left corner
-            spawn_position = [-self.p['map_limit'] + 20, 0, -self.p['map_limit'] + 20]
-            direction = 1   # left->right
-        else:
-            # Remaining 2 bots top-right corner
-            spawn_position = [self.p['map_limit'] - 20, 0, self.p['map_limit'] - 20]
-            direction = -1  # right->left
-
-        # Now pass them
+        # Each bot spawns at the start of its own lane (agent ids start at 1)
         self.bot = CleaningBot(
             dim=self.p['dim'],
-            bot_index=self.id,
+            bot_index=self.id - 1,
             total_bots=self.p['n_bots'],
-            face_texture=self.p['face_texture'],
-            map_limit=self.p['map_limit'],
-            toilet=self.p['toilet'],
-            spawn_position=spawn_position,       # <== new
-            lawnmower_direction=direction        # <== new
+            face_texture=self.model.face_texture,
+            map_limit=self.model.map_limit,
+            fleet=self.model.fleet,
+            hopper_capacity=self.p.get('capacity', 1),
         )
-        self.has_delivered_trash = False
 
     def update(self):
         """Update the agent's state."""
-        self.bot.update(self.p['trash_objects'])
-
-        # Check if the bot has delivered trash to the toilet
-        if self.bot.state == 'returning' and self.bot.carrying_trash is None and not self.has_delivered_trash:
-            self.model.collected_trash += 1
-            self.has_delivered_trash = True
-
-        # Reset flag once the bot starts searching again
-        if self.bot.state == 'searching':
-            self.has_delivered_trash = False
+        # Count every burger the bot finishes eating
+        self.model.collected_trash += self.bot.update(self.model.trash_grid)
 
     def draw(self):
         """Draw the bot in the simulation."""
@@ -63,61 +65,262 @@ class CleaningSimulation(ap.Model):
         self.n_bots = self.p['n_bots']
         self.n_trash = self.p['n_trash']
         self.map_limit = self.p['dim']
+        self.headless = self.p.get('headless', False)
+        # 'agents': each bot updates itself; 'fleet': the whole fleet is stepped with NumPy;
+        # 'events': HeadlessEngine jumps from bot event to bot event (see EventScheduler)
+        # and is stepped like 'fleet' when driven one step at a time
+        self.engine = self.p.get('engine', 'agents')
+        self.record_steps = self.p.get('record', False)
+        # 'lawnmower': sweep the board row by row; 'nearest': drive to assigned trash
+        self.search = self.p.get('search', 'lawnmower')
+        # Steps kept for plots; older steps only count towards the aggregates
+        self.history_window = self.p.get('history_window', 1000)
+        # Optional path of a binary per-step log (see StepLog)
+        self.log_path = self.p.get('log')
+        # Optional path of a trajectory file to replay the run from (see Trajectory)
+        self.trajectory_path = self.p.get('trajectory')
+        # Time each phase of step/draw (P toggles it in the window) and
+        # optionally write the breakdown to a .csv/.json file at the end
+        self.profiler = Profiler(enabled=self.p.get('profile', False))
+        self.profile_output = self.p.get('profile_output')
 
         # Initialize metrics
         self.start_time = time.time()
-        self.total_movements = 0
+        self.done = False
+        self.step_movements = 0
         self.collected_trash = 0
-        self.collisions = 0
-        self.movement_history = []  # To store movements over time
-
-        # Initialize visual assets
-        texture_path = os.path.join(os.path.dirname(__file__), 'assets', 'close.jpg')
-        self.face_texture = self.load_texture(texture_path)
-
-        open_texture_path = os.path.join(os.path.dirname(__file__), 'assets', 'open.jpg')
-        self.face_texture_open = self.load_texture(open_texture_path)
-
-        # Create Toilet
-        self.toilet = Toilet()
+        self.step_collisions = 0
+        # Running sum/mean/max plus the last history_window steps, in constant memory
+        self.movement_series = RunningSeries(self.history_window)
+        self.collision_series = RunningSeries(self.history_window, dtype=np.int64)  # colliding pairs
+        self.collision_grid = CollisionGrid()
+        self.step_log = StepLog(self.log_path) if self.log_path else None
+
+        # Initialize visual assets (no GL context when headless)
+        if self.headless:
+            self.face_texture = None
+            self.face_texture_open = None
+        else:
+            texture_path = os.path.join(os.path.dirname(__file__), 'assets', 'close.jpg')
+            self.face_texture = self.load_texture(texture_path)
+
+            open_texture_path = os.path.join(os.path.dirname(__file__), 'assets', 'open.jpg')
+            self.face_texture_open = self.load_texture(open_texture_path)
+
+        # Independent RNG streams derived from the run's seed, so e.g. toilet
+        # particles never shift where trash is placed
+        self.trash_random = random.Random(self.random.getrandbits(64))
+        self.toilet_random = random.Random(self.random.getrandbits(64))
+        self.arrival_random = random.Random(self.random.getrandbits(64))
+
+        # Dump stations: an int spreads that many toilets over the board,
+        # or give a list of (x, z); returning bots go to the 'nearest' one
+        # or the 'least_loaded' one (see StationRegistry)
+        self.stations = StationRegistry.at(
+            station_positions(self.p.get('stations', 1), self.dim),
+            rng=self.toilet_random,
+            routing=self.p.get('station_routing', 'nearest'),
+        )
 
         # Create trash objects
-        self.trash_objects = [Trash(self.dim) for _ in range(self.n_trash)]
+        self.trash_objects = [Trash(self.dim, rng=self.trash_random) for _ in range(self.n_trash)]
+        self.trash_grid = TrashGrid(cell_size=10.0, trash_objects=self.trash_objects)
+        # More trash dropped during the run: Poisson 'arrival_rate' burgers per
+        # step or an 'arrival_trace' (see Workload). The run then lasts until
+        # the arrivals end and the board is clear, or until 'steps'.
+        if self.p.get('arrival_rate') is not None and 'steps' not in self.p:
+            # Poisson arrivals never end, so neither would the run
+            raise ValueError("runs with an 'arrival_rate' need 'steps'")
+        self.arrivals = make_arrivals(
+            self.p.get('arrival_rate'), self.p.get('arrival_trace'), self.arrival_random
+        )
 
-        # Pass shared attributes to parameters
-        self.p['face_texture'] = self.face_texture
-        self.p['toilet'] = self.toilet
-        self.p['trash_objects'] = self.trash_objects
-        self.p['map_limit'] = self.map_limit
+        # Every bot's state lives in one row of the shared fleet arrays.
+        # Agents reach shared objects through self.model, never through
+        # self.p, so parameters stay plain values that pickle cheaply.
+        self.fleet = Fleet(
+            capacity=self.n_bots, search=make_search(self.search), profiler=self.profiler,
+            stations=self.stations,
+            # Bots dump after 'capacity' burgers (the agents pass it on), or
+            # after carrying something for 'hopper_timeout' steps if set
+            hopper_timeout=self.p.get('hopper_timeout'),
+        )
+        if not self.headless:
+            self.fleet_renderer = FleetRenderer(
+                self.fleet, self.face_texture, self.face_texture_open
+            )
 
-        # Create agents
+        # Create agents (AgentList already calls setup() on each one)
         self.agents = ap.AgentList(self, self.n_bots, CleaningBotAgent)
-        for agent in self.agents:
-            agent.setup()
+
+        self.trajectory = None
+        if self.trajectory_path:
+            if self.arrivals is not None:
+                # The recording stores a fixed set of burgers
+                raise ValueError("trajectories can't be recorded with trash arrivals")
+            self.trajectory = TrajectoryRecorder(
+                self.trajectory_path, self.fleet, self.trash_objects, self.stations, self.dim
+            )
+
+    def step(self):
+        """Advance every bot one step."""
+        self.fleet.now = self.t
+        self.spawn_trash()
+        with self.profiler.scope('assign'):
+            self.fleet.assign_targets(self.trash_grid)
+        with self.profiler.scope('bots'):
+            if self.engine in ('fleet', 'events'):
+                self.step_fleet()
+            else:
+                self.step_agents()
+        # Flush and settle the waste dumped so far
+        with self.profiler.scope('toilet'):
+            self.stations.update()
+
+        # Bot bodies that overlap this step
+        with self.profiler.scope('collisions'):
+            self.step_collisions = self.collision_grid.count(self.fleet)
+        self.collision_series.append(self.step_collisions)
+
+        # End simulation if all trash is collected
+        if self.cleared:
+            self.done = True
+            self.stop()
+
+    def spawn_trash(self):
+        """Drop the burgers arriving this step; returns how many."""
+        if self.arrivals is None:
+            return 0
+        spawned = self.arrivals.spawn(self.t, self.dim)
+        for trash in spawned:
+            trash.spawn_step = self.t
+            self.trash_objects.append(trash)
+            self.trash_grid.add(trash)
+        self.n_trash += len(spawned)
+        return len(spawned)
+
+    @property
+    def cleared(self):
+        """True once every burger is collected and no more will arrive.
+
+        Bots with room for more than one burger must also have dumped what
+        they carry, so the last trips to the toilets count towards the run.
+        """
+        if self.collected_trash < self.n_trash:
+            return False
+        if self.arrivals is not None and not self.arrivals.exhausted:
+            return False
+        n = self.fleet.count
+        batched = self.fleet.hopper_capacity[:n] > 1
+        return not self.fleet.load[:n][batched].any()
+
+    @property
+    def total_movements(self):
+        return self.movement_series.total
+
+    @property
+    def collisions(self):
+        """Colliding bot pairs, summed over all steps."""
+        return self.collision_series.total
 
     def update(self):
-        """Update all agents and record metrics."""
+        """Record per-step metrics (called by agentpy after setup and after every step)."""
+        with self.profiler.scope('record'):
+            self.record_step()
+
+    def record_step(self):
+        if self.step_log is not None:
+            n = self.fleet.count
+            self.step_log.append(
+                self.t, self.step_movements, self.collected_trash, self.step_collisions,
+                np.bincount(self.fleet.state[:n], minlength=len(STATE_NAMES)),
+            )
+        if self.trajectory is not None:
+            self.trajectory.record()
+        # Recording every step is opt-in; it costs more than a small fleet's step
+        if not self.record_steps:
+            return
+        self.record('movements', self.step_movements)
+        self.record('collected_trash', self.collected_trash)
+        self.record('collisions', self.step_collisions)
+
+    def end(self):
+        """Report the final metrics of the run."""
+        self.report('steps', self.t)
+        self.report('elapsed_time', time.time() - self.start_time)
+        self.report('collected_trash', self.collected_trash)
+        self.report('total_movements', self.total_movements)
+        metrics = self.get_metrics()
+        self.report('movements_per_item', metrics.movements_per_item)
+        self.report('items_per_step', metrics.items_per_step)
+        self.report('collisions', self.collisions)
+        self.report('done', self.done)
+        for name, latency in (
+            ('pickup', metrics.pickup_latency), ('delivery', metrics.delivery_latency),
+        ):
+            for q in ('p50', 'p95', 'p99'):
+                self.report(f'{name}_latency_{q}', latency[q] if latency else float('nan'))
+        self.report('delivered', metrics.delivered)
+        self.report('distance', metrics.distance)
+        occupancy = metrics.occupancy
+        travel_share = metrics.travel_share
+        for name in STATE_NAMES:
+            self.report(f'occupancy_{name}', occupancy[name])
+            self.report(f'travel_{name}', travel_share[name])
+        self.close_outputs()
+
+    def close_outputs(self):
+        """Finish the per-step log, the trajectory and the profile export, if any."""
+        if self.step_log is not None:
+            self.step_log.close()
+        if self.trajectory is not None:
+            self.trajectory.close()
+        if self.profile_output and self.profiler.phases:
+            self.profiler.export(self.profile_output)
+
+    def step_agents(self):
+        """Step every bot through its own CleaningBot.update."""
         step_movements = 0
         for agent in self.agents:
             # Update agent
             agent.update()
-            # Record movements
-            step_movements += agent.bot.speed
-
-        self.total_movements += step_movements
-        self.movement_history.append(step_movements)
-
-        # Detect collisions (basic example)
-        positions = [tuple(agent.bot.Position) for agent in self.agents]
-        if len(positions) > len(set(positions)):
-            self.collisions += 1
-
-        # End simulation if all trash is collected
-        if self.collected_trash >= self.n_trash:
-            self.stop_simulation()
+            # Record the distance actually moved
+            step_movements += agent.bot.step_distance
+
+        self.step_movements = step_movements
+        self.movement_series.append(step_movements)
+
+    def step_fleet(self):
+        """Step the whole fleet at once with batched array operations."""
+        self.collected_trash += self.fleet.step(self.trash_grid)
+
+        step_movements = self.fleet.step_distance
+        self.step_movements = step_movements
+        self.movement_series.append(step_movements)
+
+    def get_metrics(self):
+        """Snapshot of the metrics collected so far."""
+        state_ticks, state_distance = self.fleet.state_totals()
+        return SimulationMetrics(
+            steps=self.t,
+            elapsed_time=time.time() - self.start_time,
+            collected_trash=self.collected_trash,
+            n_trash=self.n_trash,
+            total_movements=self.total_movements,
+            collisions=self.collisions,
+            max_movements=self.movement_series.max,
+            max_collisions=int(self.collision_series.max),
+            movement_history=self.movement_series.recent().tolist(),
+            collision_history=self.collision_series.recent().tolist(),
+            pickup_latency=latency_percentiles(self.trash_objects, 'picked_step'),
+            delivery_latency=latency_percentiles(self.trash_objects, 'delivered_step'),
+            state_ticks=state_ticks,
+            state_distance=state_distance,
+            delivered=int(self.fleet.delivered[:self.fleet.count].sum()),
+        )
 
     def stop_simulation(self):
-        """Stop the simulation and show results."""
+        """Show the results of a finished simulation."""
         elapsed_time = time.time() - self.start_time
         print(f"\nSimulación completada:")
         print(f"Tiempo total: {elapsed_time:.2f} segundos")
@@ -127,16 +330,17 @@ class CleaningSimulation(ap.Model):
 
         # Display results with graphs
         self.display_results(elapsed_time)
-        pygame.quit()
-        exit()
 
     def display_results(self, elapsed_time):
         """Display simulation results as graphs."""
         plt.figure(figsize=(12, 6))
 
-        # Plot movements over time
+        # Plot movements over the last steps kept
         plt.subplot(1, 2, 1)
-        plt.plot(self.movement_history, label='Movements per Step', color='blue')
+        recent = self.movement_series.recent()
+        steps = np.arange(self.t - len(recent) + 1, self.t + 1)
+        plt.plot(steps, recent, label='Movements per Step', color='blue')
+        plt.axhline(self.movement_series.mean, label='Mean', color='gray', linestyle='--')
         plt.title('Movimientos por Iteración')
         plt.xlabel('Iteración')
         plt.ylabel('Movimientos')
@@ -171,28 +375,30 @@ class CleaningSimulation(ap.Model):
         """Draw all objects in the simulation."""
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
-        # Draw coordinate axes
-        self.draw_axes()
+        with self.profiler.scope('draw.board'):
+            # Draw coordinate axes
+            self.draw_axes()
 
-        # Draw floor
-        glColor3f(0.3, 0.3, 0.3)
-        glBegin(GL_QUADS)
-        glVertex3d(-self.dim, 0, -self.dim)
-        glVertex3d(-self.dim, 0, self.dim)
-        glVertex3d(self.dim, 0, self.dim)
-        glVertex3d(self.dim, 0, -self.dim)
-        glEnd()
+            # Draw floor
+            glColor3f(0.3, 0.3, 0.3)
+            glBegin(GL_QUADS)
+            glVertex3d(-self.dim, 0, -self.dim)
+            glVertex3d(-self.dim, 0, self.dim)
+            glVertex3d(self.dim, 0, self.dim)
+            glVertex3d(self.dim, 0, -self.dim)
+            glEnd()
 
-        # Draw toilet
-        self.toilet.draw()
+        # Draw toilets
+        with self.profiler.scope('draw.toilet'):
+            self.stations.draw()
 
-        # Draw trash objects
-        for trash in self.trash_objects:
-            trash.draw()
+        # Draw trash objects (the grid only holds uncollected ones)
+        with self.profiler.scope('draw.trash'):
+            Trash.draw_many(self.trash_grid)
 
-        # Draw agents
-        for agent in self.agents:
-            agent.draw()
+        # Draw agents (the whole fleet at once)
+        with self.profiler.scope('draw.bots'):
+            self.fleet_renderer.draw()
 
     def draw_axes(self):
         glLineWidth(3.0)
@@ -216,11 +422,11 @@ class CleaningSimulation(ap.Model):
         glEnd()
         glLineWidth(1.0)
 
-    def run_simulation(self):
-        """Run the simulation loop."""
+    def init_window(self, caption):
+        """Open the pygame window and set up the OpenGL camera."""
         pygame.init()
         screen = pygame.display.set_mode((800, 800), DOUBLEBUF | OPENGL)
-        pygame.display.set_caption("Trash Cleaning Simulation with AgentPy")
+        pygame.display.set_caption(caption)
 
         glMatrixMode(GL_PROJECTION)
         glLoadIdentity()
@@ -232,18 +438,88 @@ class CleaningSimulation(ap.Model):
         glClearColor(0, 0, 0, 0)
         glEnable(GL_DEPTH_TEST)
         glEnable(GL_TEXTURE_2D)
+        return screen
+
+    def apply_requests(self, window):
+        """Carry out the F (flush) and T (new trash) presses sent by the window."""
+        flushes, burgers = window.take_requests()
+        for _ in range(flushes):
+            self.stations.flush()
+        for _ in range(burgers):
+            new_trash = Trash(self.dim, rng=self.trash_random)
+            new_trash.spawn_step = self.t
+            self.trash_objects.append(new_trash)
+            self.trash_grid.add(new_trash)
+        self.n_trash += burgers
 
-        # Ensure setup is called before running the simulation
-        self.setup()
+    def run_simulation(self):
+        """Run the simulation loop, drawn by a window in its own process (see RenderProcess)."""
+        # The window process does all the GL work; this one only simulates
+        self.p['headless'] = True
+        self.sim_setup()
+
+        # Keys 1-4 in the window pick the simulation speed: 1x, 10x, 100x, max
+        timestep = FixedTimestep(step_rate=60)
+
+        def step():
+            if not self.running:
+                return False
+            self.sim_step()
+
+        window = RenderProcess(
+            self.fleet, self.trash_grid, self.stations, self.dim,
+            "Trash Cleaning Simulation with AgentPy",
+            profiling=self.profiler.enabled,
+            profile_path=window_profile_path(self.profile_output),
+        )
+        try:
+            window.run(timestep, step, self.profiler, before_step=lambda: self.apply_requests(window))
+        finally:
+            window.close()
+
+        self.end()
+        self.create_output()
+
+        if self.done:
+            self.stop_simulation()
+        return self.output
+
+    def run_replay(self, path):
+        """Play back a trajectory file recorded with the 'trajectory' parameter.
+
+        Nothing is simulated and update() never runs: every frame is read
+        from the memory-mapped recording (see ReplayControls for the keys).
+        """
+        replay = TrajectoryReplay(path)
+        self.init_window("Trash Cleaning Simulation replay")
+
+        self.dim = replay.dim
+        self.profiler = Profiler()
+        self.fleet, self.trash_objects, self.stations = replay.build_scene()
+        texture_dir = os.path.join(os.path.dirname(__file__), 'assets')
+        self.fleet_renderer = FleetRenderer(
+            self.fleet,
+            self.load_texture(os.path.join(texture_dir, 'close.jpg')),
+            self.load_texture(os.path.join(texture_dir, 'open.jpg')),
+        )
 
+        controls = ReplayControls(len(replay), width=800)
         clock = pygame.time.Clock()
+        shown = None
         running = True
         while running:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
-
-            self.update()
+                else:
+                    controls.handle(event)
+
+            step = controls.advance()
+            if step != shown:
+                replay.apply(step, self.fleet, self.trash_objects, self.stations)
+                self.trash_grid = TrashGrid(cell_size=10.0, trash_objects=self.trash_objects)
+                shown = step
+            pygame.display.set_caption(controls.caption)
             self.draw()
             pygame.display.flip()
             clock.tick(60)
@@ -257,5 +533,20 @@ if __name__ == "__main__":
         'n_trash': 20
     }
 
+    parser = argparse.ArgumentParser(description="Trash cleaning simulation with AgentPy")
+    parser.add_argument('--replay', metavar='FILE', help="play back a recorded trajectory file")
+    parser.add_argument(
+        '--profile', metavar='FILE',
+        help="time each phase and write the p50/p95/p99 table (.csv or .json) at the end; "
+             "the window's own phases go next to it as FILE.window.csv/.json",
+    )
+    args = parser.parse_args()
+    if args.profile:
+        parameters['profile'] = True
+        parameters['profile_output'] = args.profile
+
     model = CleaningSimulation(parameters)
-    model.run_simulation()
+    if args.replay:
+        model.run_replay(args.replay)
+    else:
+        model.run_simulation()
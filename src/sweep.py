@@ -0,0 +1,87 @@
+import agentpy as ap
+from model import CleaningSimulation
+from HeadlessEngine import HeadlessEngine
+from Workload import latency_percentiles
+
+
+def run_sweep(parameters, iterations=1, n_jobs=-1, n=None, display=False):
+    """Run CleaningSimulation over a parameter sweep, in parallel, and return one DataFrame.
+
+    `parameters` is an agentpy parameter dict: use ap.Values/ap.IntRange for
+    the swept entries (e.g. n_bots, n_trash, dim) and a constant 'seed' to
+    make the per-run seeds reproducible. `iterations` repeats every
+    combination with a different seed; `n` is the sampling factor for
+    ranges. Runs are headless and spread over `n_jobs` worker processes
+    (-1 uses every core). 'steps' caps runs that never finish.
+
+    Each row of the result holds one run's parameters and reported metrics;
+    sweep 'search' to compare strategies by steps and movements_per_item,
+    or 'stations'/'station_routing' to see how much delivery travel they save.
+    """
+    parameters = dict(parameters)
+    parameters['headless'] = True
+    parameters.setdefault('steps', 20000)
+
+    sample = ap.Sample(parameters, n)
+    experiment = ap.Experiment(CleaningSimulation, sample, iterations=iterations)
+    results = experiment.run(n_jobs=n_jobs, display=display)
+    return results.arrange_reporters()
+
+
+def sustains_rate(parameters, rate, steps=20000, seed=0, slo=None, quantile='p95',
+                  efficiency=0.9):
+    """True if the fleet keeps up with Poisson arrivals of `rate` burgers per step.
+
+    Keeping up means that over the second half of a `steps`-step run
+    (the first half is warm-up) the bots pick up at least `efficiency`
+    of the burgers that arrive, and, with an `slo` in steps, that the
+    `quantile` spawn-to-pickup latency of those burgers stays within it.
+    A burger still waiting at the end counts with its wait so far, so an
+    overloaded fleet can't pass by leaving its slowest burgers behind.
+    """
+    engine = HeadlessEngine(dict(parameters, arrival_rate=rate, steps=steps), seed=seed)
+    engine.run(steps)
+    warm = steps // 2
+    trash = engine.model.trash_objects
+    arrived = sum(t.spawn_step > warm for t in trash)
+    picked = sum(t.picked_step is not None and t.picked_step > warm for t in trash)
+    if picked < efficiency * arrived:
+        return False
+    latency = latency_percentiles(trash, 'picked_step', since=warm, now=engine.model.t)
+    return slo is None or (latency is not None and latency[quantile] <= slo)
+
+
+def max_arrival_rate(parameters, precision=0.05, start=0.01, **criteria):
+    """Highest Poisson arrival rate (burgers per step) a fleet configuration can sustain.
+
+    `parameters` are the run's parameters (fleet size, search, stations...;
+    engine='events' makes the long runs much cheaper); `criteria` are
+    passed on to sustains_rate. The rate is doubled from `start` until
+    the fleet falls behind, then bisected to within `precision` (relative).
+    Returns 0.0 if even `start` is too much.
+    """
+    low, high = 0.0, start
+    while sustains_rate(parameters, high, **criteria):
+        low, high = high, high * 2
+    if low == 0.0:
+        return 0.0
+    while high - low > precision * low:
+        middle = (low + high) / 2
+        if sustains_rate(parameters, middle, **criteria):
+            low = middle
+        else:
+            high = middle
+    return low
+
+
+if __name__ == "__main__":
+    parameters = {
+        'dim': ap.Values(100, 200),
+        'n_bots': ap.Values(5, 10),
+        'search': ap.Values('lawnmower', 'nearest'),
+        'n_trash': 20,
+        'seed': 42,
+    }
+
+    results = run_sweep(parameters, iterations=2)
+    print(results.to_string())